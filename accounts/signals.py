@@ -1,8 +1,12 @@
+import logging
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 from .models import CustomerUser
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=CustomerUser)
 def assign_user_to_group(sender, instance, created, **kwargs):
@@ -17,4 +21,4 @@ def assign_user_to_group(sender, instance, created, **kwargs):
         group_name = f'{instance.role}_group'
         group , group_created = Group.objects.get_or_create(name=group_name)
         instance.groups.add(group)
-        print(f"User {instance.username} added to {group_name} group")
\ No newline at end of file
+        logger.info("User %s added to %s group", instance.username, group_name)
\ No newline at end of file
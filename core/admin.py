@@ -0,0 +1,92 @@
+"""
+Admin helpers shared by the ERP apps for changelists on large tables
+"""
+
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Job
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the planner's row estimate instead of COUNT(*) when a
+    PostgreSQL table is shown unfiltered and is large. COUNT(*) has to read
+    the whole table there; the estimate is a catalog lookup.
+    """
+    estimate_threshold = 100_000 # Below this, an exact count is cheap enough
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [queryset.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= self.estimate_threshold:
+                    return row[0]
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """
+    ModelAdmin mixin for big tables:
+    - `list_only_fields` limits the changelist query to the listed columns
+      (include the FK itself plus the related columns used by __str__)
+    - page counts come from EstimatedCountPaginator, and the extra unfiltered
+      "N total" count is switched off
+    """
+    list_only_fields = None
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        only_fields = self.list_only_fields
+
+        class OnlyFieldsChangeList(ChangeList):
+            def get_queryset(self, request, exclude_parameters=None):
+                queryset = super().get_queryset(request, exclude_parameters)
+                if only_fields:
+                    queryset = queryset.only(*only_fields)
+                return queryset
+
+        return OnlyFieldsChangeList
+
+
+class SearchIndexAdminMixin:
+    """
+    ModelAdmin mixin that answers the search box (and autocomplete) from a
+    core.search.SearchIndex instead of LIKE '%term%' on `search_fields`
+    (which still have to be set for the admin to show the search box)
+    """
+    search_index = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if self.search_index is None or not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return self.search_index.filter(queryset, search_term), False
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Background jobs, mainly to spot and retry failed ones"""
+    list_display = ('id', 'name', 'idempotency_key', 'status', 'attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('idempotency_key', 'group')
+    readonly_fields = ('name', 'payload', 'idempotency_key', 'group', 'attempts', 'started_at', 'finished_at', 'last_error', 'created_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected jobs')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status='done').update(status='pending', attempts=0, run_after=timezone.now())
+        self.message_user(request, f'{count} jobs queued again')
@@ -0,0 +1,122 @@
+"""
+Shared building blocks for the REST API (pagination, sparse fieldsets,
+conditional GET, type-ahead search)
+"""
+
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination on the primary key, so deep pages cost the same as the first"""
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class SparseFieldsSerializerMixin:
+    """Lets clients ask for a subset of fields with ?fields=a,b,c"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = requested_fields(request)
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+def requested_fields(request):
+    """Set of field names from ?fields=, or None when all fields are wanted"""
+    if request is None:
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def id_param(request, name):
+    """?<name>= as an id (None when absent); anything but a whole number is a 400"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    if not value.isdigit():
+        raise ValidationError({name: 'must be an id'})
+    return int(value)
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+class ConditionalGetMixin:
+    """
+    ETag support for read-only viewsets.
+
+    Detail requests are checked against the row's `updated_at` before the
+    object (and its items) are loaded. List responses get an ETag from
+    their content, so pollers receive an empty 304 instead of the payload.
+    """
+    etag_field = 'updated_at'
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        try:
+            stamp = self.filter_queryset(self.get_queryset()).filter(**lookup).values_list(self.etag_field, flat=True).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            # Not a valid value for the lookup field (/products/abc/): no such object
+            raise Http404
+        if stamp is not None:
+            etag = f'"{lookup[self.lookup_field]}-{stamp.timestamp()}-{request.query_params.get("fields", "")}"'
+            if _etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            response = super().retrieve(request, *args, **kwargs)
+            response['ETag'] = etag
+            return response
+        return super().retrieve(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        body = json.dumps(response.data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response['ETag'] = etag
+        return response
+
+
+class TypeAheadMixin:
+    """
+    Adds <list url>/search/?q=...&limit=10 to a viewset: the best matches
+    from `search_index` (core.search), as a short list of `typeahead_fields`.
+    The viewset's own filters (?is_active=...) still apply.
+    """
+    search_index = None
+    typeahead_fields = ('id',)
+    typeahead_limit = 10
+    typeahead_max_limit = 50
+
+    @action(detail=False, url_path='search', pagination_class=None)
+    def typeahead(self, request):
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(int(request.query_params.get('limit', self.typeahead_limit)), self.typeahead_max_limit)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if not query or limit < 1:
+            return Response({'results': []})
+
+        rows = self.search_index.search(query, limit, queryset=self.get_queryset())
+        return Response({'results': list(rows.values(*self.typeahead_fields))})
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+from django.utils.module_loading import autodiscover_modules
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+    verbose_name = 'Core'
+
+    def ready(self):
+        from .search import restore_triggers
+
+        # Each app declares its search indexes in <app>/search.py
+        autodiscover_modules('search')
+        post_migrate.connect(restore_triggers, sender=self)
@@ -0,0 +1,194 @@
+"""
+Load benchmarks for the hot operations
+
+Each benchmark is registered with @benchmark('area.operation') and is
+called with a BenchmarkContext once per run. run_benchmarks() times every
+run and counts its queries, and returns results that can be written as
+JSON (see `manage.py benchmark`) and compared between commits.
+
+Write benchmarks change the data (orders are created, confirmed and
+received), so run them against a freshly seeded database (`manage.py seed_data`).
+"""
+
+import math
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib import admin
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomerUser
+from inventory.models import Product
+from purchasing.models import PurchaseOrder
+from reportin import exports, services as reports
+from sales.models import Customer, SalesOrder
+from sales.services import place_order
+
+BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark when the database has no data for it"""
+
+
+def benchmark(name):
+    """Register a function as the benchmark called `name`"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+class BenchmarkContext:
+    """Shared state for the benchmarks: random ids to work on, a request factory and an admin user"""
+
+    def __init__(self, seed=42, sample_size=500):
+        self.rng = random.Random(seed)
+        self.factory = RequestFactory()
+        # Not saved: a superuser passes every admin permission check without any queries
+        self.user = CustomerUser(username='benchmark', is_active=True, is_staff=True, is_superuser=True)
+        self.customer_ids = list(Customer.objects.filter(is_active=True).values_list('pk', flat=True)[:sample_size])
+        self.product_ids = list(
+            Product.objects.filter(is_active=True, current_stock__gte=50).values_list('pk', flat=True)[:sample_size]
+        )
+
+    def pick(self, ids, count=1):
+        if len(ids) < count:
+            raise SkipBenchmark('not enough seeded rows')
+        return self.rng.sample(ids, count)
+
+    def admin_changelist(self, model, params=None):
+        request = self.factory.get('/', params or {})
+        request.user = self.user
+        response = admin.site._registry[model].changelist_view(request)
+        response.render()
+        return response
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def run_benchmarks(names=None, iterations=20, warmup=2, seed=42):
+    """Run the benchmarks and return {name: stats} (p50/p95/mean/max in ms, median queries per run)"""
+    context = BenchmarkContext(seed=seed)
+    results = {}
+
+    for name, func in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+
+        timings = []
+        queries = []
+        try:
+            for run in range(warmup + iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    func(context)
+                    elapsed = time.perf_counter() - start
+                # Warmup runs fill the caches and aren't counted
+                if run >= warmup:
+                    timings.append(elapsed * 1000)
+                    queries.append(len(captured))
+        except SkipBenchmark as exc:
+            results[name] = {'skipped': str(exc)}
+            continue
+
+        results[name] = {
+            'runs': len(timings),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': statistics.median_low(queries),
+        }
+
+    return results
+
+
+# Orders
+
+@benchmark('sales.create_order')
+def create_order(context):
+    customer_id, = context.pick(context.customer_ids)
+    lines = [{'product': product_id, 'quantity': 1} for product_id in context.pick(context.product_ids, 3)]
+    place_order(customer_id, lines, notes='benchmark')
+
+
+@benchmark('sales.confirm_order')
+def confirm_order(context):
+    # The stock job runs inline as the save commits, so the whole cost of a confirmation is measured
+    order = SalesOrder.objects.filter(status='draft').order_by('-pk').first()
+    if order is None:
+        raise SkipBenchmark('no draft sales orders')
+    order.status = 'confirmed'
+    with override_settings(JOBS_RUN_INLINE=True):
+        order.save()
+
+
+@benchmark('purchasing.receive_order')
+def receive_order(context):
+    order = PurchaseOrder.objects.filter(status='confirmed').order_by('pk').first()
+    if order is None:
+        raise SkipBenchmark('no confirmed purchase orders')
+    order.status = 'received'
+    with override_settings(JOBS_RUN_INLINE=True):
+        order.save()
+
+
+# Admin changelists
+
+@benchmark('admin.sales_order_changelist')
+def sales_order_changelist(context):
+    context.admin_changelist(SalesOrder)
+
+
+@benchmark('admin.sales_order_changelist_filtered')
+def sales_order_changelist_filtered(context):
+    context.admin_changelist(SalesOrder, {'status__exact': 'confirmed'})
+
+
+@benchmark('admin.purchase_order_changelist')
+def purchase_order_changelist(context):
+    context.admin_changelist(PurchaseOrder)
+
+
+@benchmark('admin.product_changelist')
+def product_changelist(context):
+    context.admin_changelist(Product)
+
+
+@benchmark('admin.product_search')
+def product_search(context):
+    context.admin_changelist(Product, {'q': 'Product 1'})
+
+
+# Reports (uncached, so the queries themselves are measured)
+
+@benchmark('reports.inventory_valuation')
+def inventory_valuation(context):
+    reports.compute_inventory_valuation()
+
+
+@benchmark('reports.margin_summary')
+def margin_summary(context):
+    reports.compute_margin_summary()
+
+
+@benchmark('reports.low_stock')
+def low_stock(context):
+    reports.compute_low_stock()
+
+
+@benchmark('reports.sales_export_30_days')
+def sales_export(context):
+    date_from = (timezone.localdate() - timedelta(days=30)).isoformat()
+    for _ in exports.sales_export({'date_from': date_from}):
+        pass
@@ -0,0 +1,161 @@
+"""
+Small database-backed job queue
+
+Handlers are registered by name with @job('app.something'). enqueue()
+stores a Job row in the caller's transaction, so the job only exists if
+the surrounding change commits. `manage.py run_jobs` claims and runs
+them. A handler runs in one transaction together with marking its job
+done, and that only commits while the job is still claimed: a failed or
+requeued attempt leaves nothing behind. Handlers must still be safe to run
+again (a worker can die after committing), e.g. by checking the state they
+act on.
+"""
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class LostClaim(Exception):
+    """The job was taken back (requeue_stale_jobs) before its handler finished"""
+
+
+def job(name):
+    """Register a function as the handler for jobs called `name`"""
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload, idempotency_key, group='', max_attempts=5):
+    """
+    Queue a job; returns the existing one if the key was already used.
+    With JOBS_RUN_INLINE = True the handler runs instead (and None is returned), once
+    the caller's transaction commits: enqueue() is called before the change is written.
+    """
+    if name not in HANDLERS:
+        raise ValueError(f"No job handler registered for {name!r}")
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        transaction.on_commit(lambda: HANDLERS[name](**payload))
+        return None
+    job, created = Job.objects.get_or_create(
+        idempotency_key=idempotency_key,
+        defaults={'name': name, 'payload': payload, 'group': group, 'max_attempts': max_attempts},
+    )
+    return job
+
+
+def enqueue_status_change(name, order, old_status, new_status):
+    """
+    Queue the side effects of an order's status change. Jobs are grouped by
+    order number, so the transitions of one order are applied in order.
+
+    The key is the order's status_version after the change: saving the same
+    change twice from the same loaded row (a retried request, two users on
+    one form) queues one job, while a later identical transition gets its own.
+    """
+    group = order.order_number
+    return enqueue(
+        name,
+        {'order_id': order.pk, 'old_status': old_status, 'new_status': new_status},
+        idempotency_key=f"{group}:{order.status_version}:{old_status}->{new_status}",
+        group=group,
+    )
+
+
+def _ready_jobs(now):
+    # An earlier job of the same group that isn't done yet blocks the later ones
+    blocking = Job.objects.filter(
+        group=OuterRef('group'),
+        id__lt=OuterRef('id'),
+        status__in=['pending', 'running', 'failed'],
+    ).exclude(group='')
+    return (
+        Job.objects.filter(status='pending', run_after__lte=now)
+        .exclude(Exists(blocking))
+        .order_by('id')
+    )
+
+
+def claim_jobs(limit=10):
+    """Mark up to `limit` ready jobs as running for this worker and return them"""
+    now = timezone.now()
+    claimed = []
+    for job_id in _ready_jobs(now).values_list('id', flat=True)[:limit]:
+        # Conditional update: if another worker got there first, nothing changes
+        won = Job.objects.filter(id=job_id, status='pending').update(
+            status='running',
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if won:
+            claimed.append(Job.objects.get(id=job_id))
+    return claimed
+
+
+def _claimed(job):
+    # The job's row while it is still running under this claim (started_at tells claims apart)
+    return Job.objects.filter(id=job.id, status='running', started_at=job.started_at)
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    handler = HANDLERS.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No job handler registered for {job.name!r}")
+        with transaction.atomic():
+            handler(**job.payload)
+            # Requeued as stale meanwhile (another worker may have it now): undo the handler's work
+            finished = _claimed(job).update(status='done', finished_at=timezone.now(), last_error='')
+            if not finished:
+                raise LostClaim(f"Job {job.id} is no longer claimed by this worker")
+        return True
+    except LostClaim:
+        logger.warning("Job %s (%s) was requeued while running, its work was rolled back", job.id, job.name)
+        return False
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.name, job.attempts)
+
+        gave_up = job.attempts >= job.max_attempts
+        _claimed(job).update(
+            status='failed' if gave_up else 'pending',
+            run_after=timezone.now() + timedelta(seconds=min(2 ** job.attempts, 300)),
+            finished_at=timezone.now() if gave_up else None,
+            last_error=error,
+        )
+        return False
+
+
+def requeue_stale_jobs(older_than):
+    """Put back jobs left 'running' by a worker that died"""
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status='running', started_at__lt=cutoff).update(status='pending')
+
+
+def run_pending_jobs(limit=None):
+    """Run ready jobs until none are left (or `limit` were run). Returns (succeeded, failed)."""
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        batch = claim_jobs(limit=10 if limit is None else min(10, limit - succeeded - failed))
+        if not batch:
+            break
+        for claimed in batch:
+            if run_job(claimed):
+                succeeded += 1
+            else:
+                failed += 1
+    return succeeded, failed
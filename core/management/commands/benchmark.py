@@ -0,0 +1,92 @@
+"""
+Run the load benchmarks (core.benchmarks) and print the results as JSON.
+
+    python manage.py seed_data
+    python manage.py benchmark --output before.json
+    ... change something ...
+    python manage.py benchmark --output after.json --compare before.json
+
+Benchmarks that write change the data, so reseed between runs you want to compare.
+"""
+
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarks import BENCHMARKS, run_benchmarks
+from inventory.models import Product, StockMovement
+from sales.models import Customer, SalesOrderItem
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Time order creation, confirmation, PO receipt, admin changelists and reports (p50/p95, queries per run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help='Run only this benchmark (repeatable)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+        parser.add_argument('--compare', help='Earlier JSON results to compare against')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        report = {
+            'commit': _git_commit(),
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'rows': {
+                'products': Product.objects.count(),
+                'customers': Customer.objects.count(),
+                'order_lines': SalesOrderItem.objects.count(),
+                'stock_movements': StockMovement.objects.count(),
+            },
+            'iterations': options['iterations'],
+            'results': run_benchmarks(
+                names=options['only'],
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+            ),
+        }
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+
+        if options['compare']:
+            self.compare(report['results'], options['compare'])
+
+    def compare(self, results, path):
+        with open(path) as f:
+            previous = json.load(f)
+
+        self.stderr.write(f"Compared with {previous.get('commit') or path}:")
+        for name, current in results.items():
+            before = previous.get('results', {}).get(name)
+            if not before or 'p50_ms' not in before or 'p50_ms' not in current:
+                continue
+            change = (current['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            self.stderr.write(
+                f"  {name}: p50 {before['p50_ms']} -> {current['p50_ms']} ms ({change:+.1f}%), "
+                f"p95 {before['p95_ms']} -> {current['p95_ms']} ms, "
+                f"queries {before['queries']} -> {current['queries']}"
+            )
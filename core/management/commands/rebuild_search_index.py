@@ -0,0 +1,22 @@
+"""
+Refill the search indexes (core.search) from their tables.
+
+Writes keep them in sync on their own; this is for a database restored
+without the triggers, or to check that search returns what is expected:
+
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.search import INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product and customer search indexes'
+
+    def handle(self, *args, **options):
+        for index in INDEXES:
+            index.rebuild()
+            self.stdout.write(f'Rebuilt {index.table} search index')
+        self.stdout.write(self.style.SUCCESS(f'{len(INDEXES)} search indexes rebuilt'))
@@ -0,0 +1,39 @@
+"""
+Background worker for the job queue (core.jobs)
+
+    python manage.py run_jobs            # keep polling
+    python manage.py run_jobs --once     # run what is ready, then exit
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (stock updates for order status changes, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no job is ready')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600, help="Seconds after which a 'running' job is considered abandoned")
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+
+        while True:
+            requeued = requeue_stale_jobs(stale_after)
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} abandoned jobs")
+
+            succeeded, failed = run_pending_jobs()
+            if succeeded or failed:
+                self.stdout.write(f"Ran {succeeded + failed} jobs ({failed} failed)")
+
+            if options['once']:
+                break
+            if not (succeeded or failed):
+                time.sleep(options['sleep'])
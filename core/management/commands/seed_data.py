@@ -0,0 +1,303 @@
+"""
+Fill the database with synthetic data for load testing and benchmarks.
+
+Everything is written with bulk inserts, in batches, and dated over the
+last --days days. Run it against an empty (or throwaway) database:
+
+    python manage.py seed_data
+    python manage.py seed_data --products 100000 --customers 50000 --orders 200000 --movements 5000000
+"""
+
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import Category, Product, StockMovement
+from purchasing.models import PurchaseOrder, PurchaseOrderItem, Supplier
+from reportin.services import invalidate_reports
+from sales.models import Customer, SalesOrder, SalesOrderItem
+
+# Roughly what a live system looks like: most orders are finished
+SALES_STATUS_WEIGHTS = {'draft': 10, 'confirmed': 15, 'processing': 10, 'shipped': 10, 'delivered': 45, 'cancelled': 10}
+PURCHASE_STATUS_WEIGHTS = {'draft': 10, 'sent': 15, 'confirmed': 20, 'received': 50, 'cancelled': 5}
+
+
+@contextmanager
+def backdating(*fields):
+    """Let bulk_create keep the dates we set on auto_now_add fields"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _field(model, name):
+    return model._meta.get_field(name)
+
+
+class Command(BaseCommand):
+    help = 'Seed a configurable volume of synthetic products, partners, orders and stock movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--customers', type=int, default=500)
+        parser.add_argument('--suppliers', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=2000, help='Sales orders')
+        parser.add_argument('--purchase-orders', type=int, default=200)
+        parser.add_argument('--lines-per-order', type=int, default=5, help='Average number of lines per order')
+        parser.add_argument('--movements', type=int, default=20000, help='Stock movements')
+        parser.add_argument('--days', type=int, default=365, help='Spread the data over this many days')
+        parser.add_argument('--prefix', default='SEED', help='Prefix for SKUs and names, to seed more than once')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for repeatable data')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = max(options['days'], 1)
+
+        with transaction.atomic():
+            categories = self.seed_categories(options['categories'])
+            products = self.seed_products(options['products'], categories)
+            customers = self.seed_customers(options['customers'])
+            suppliers = self.seed_suppliers(options['suppliers'])
+            self.seed_sales_orders(options['orders'], options['lines_per_order'], customers, products)
+            self.seed_purchase_orders(options['purchase_orders'], options['lines_per_order'], suppliers, products)
+            self.seed_movements(options['movements'], products)
+            invalidate_reports()
+
+        call_command('rebuild_stock_snapshots', batch_size=self.batch_size, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Seeding done'))
+
+    # Helpers
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def random_price(self, low=1, high=500):
+        return Decimal(self.rng.randrange(low * 100, high * 100)) / 100
+
+    def weighted_status(self, weights):
+        return self.rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    def line_count(self, average):
+        return self.rng.randint(1, max(2 * average - 1, 1))
+
+    def bulk_create(self, model, objs):
+        return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def report(self, count, label):
+        self.stdout.write(f'Created {count} {label}')
+
+    # Seeders
+
+    def seed_categories(self, count):
+        categories = self.bulk_create(Category, [
+            Category(name=f'{self.prefix} Category {i}', slug=f'{self.prefix.lower()}-category-{i}')
+            for i in range(count)
+        ])
+        self.report(len(categories), 'categories')
+        return categories
+
+    def seed_products(self, count, categories):
+        # Stock is set at the end from the generated movements
+        products = []
+        with backdating(_field(Product, 'created_at')):
+            for start in range(0, count, self.batch_size):
+                batch = []
+                for i in range(start, min(start + self.batch_size, count)):
+                    cost = self.random_price()
+                    batch.append(Product(
+                        sku=f'{self.prefix}-{i:07d}',
+                        name=f'{self.prefix} Product {i}',
+                        category=self.rng.choice(categories) if categories else None,
+                        cost_price=cost,
+                        selling_price=(cost * Decimal(self.rng.uniform(1.05, 1.8))).quantize(Decimal('0.01')),
+                        is_active=self.rng.random() > 0.05,
+                        created_at=self.random_date(),
+                    ))
+                products.extend(self.bulk_create(Product, batch))
+        self.report(len(products), 'products')
+        return products
+
+    def seed_customers(self, count):
+        customers = []
+        with backdating(_field(Customer, 'created_at')):
+            for start in range(0, count, self.batch_size):
+                customers.extend(self.bulk_create(Customer, [
+                    Customer(
+                        name=f'{self.prefix} Customer {i}',
+                        email=f'customer{i}@{self.prefix.lower()}.example.com',
+                        is_business=self.rng.random() < 0.4,
+                        credit_limit=Decimal(self.rng.choice([5000, 10000, 50000, 250000])),
+                        created_at=self.random_date(),
+                    )
+                    for i in range(start, min(start + self.batch_size, count))
+                ]))
+        self.report(len(customers), 'customers')
+        return customers
+
+    def seed_suppliers(self, count):
+        suppliers = self.bulk_create(Supplier, [
+            Supplier(
+                name=f'{self.prefix} Supplier {i}',
+                email=f'supplier{i}@{self.prefix.lower()}.example.com',
+                lead_time_days=self.rng.randint(2, 30),
+            )
+            for i in range(count)
+        ])
+        self.report(len(suppliers), 'suppliers')
+        return suppliers
+
+    def seed_sales_orders(self, count, lines_per_order, customers, products):
+        if not (customers and products):
+            return
+        exposure = {}
+        created_orders = created_items = 0
+
+        with backdating(_field(SalesOrder, 'order_date'), _field(SalesOrder, 'created_at')):
+            for start in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - start)
+                orders = []
+                lines = []
+                for number in SalesOrder.allocate_order_numbers(size):
+                    when = self.random_date()
+                    order = SalesOrder(
+                        order_number=number,
+                        customer=self.rng.choice(customers),
+                        status=self.weighted_status(SALES_STATUS_WEIGHTS),
+                        order_date=when,
+                        created_at=when,
+                    )
+                    order_lines = []
+                    for product in self.rng.sample(products, min(self.line_count(lines_per_order), len(products))):
+                        quantity = self.rng.randint(1, 10)
+                        order_lines.append(SalesOrderItem(
+                            product=product,
+                            quantity=quantity,
+                            unit_price=product.selling_price,
+                            subtotal=quantity * product.selling_price,
+                        ))
+                    order.subtotal = order.total_amount = sum(line.subtotal for line in order_lines)
+                    if order.status in SalesOrder.OPEN_STATUSES:
+                        exposure[order.customer_id] = exposure.get(order.customer_id, 0) + order.total_amount
+                    orders.append(order)
+                    lines.append(order_lines)
+
+                # Orders first, to get their ids, then all their lines
+                orders = self.bulk_create(SalesOrder, orders)
+                items = []
+                for order, order_lines in zip(orders, lines):
+                    for line in order_lines:
+                        line.order = order
+                        items.append(line)
+                self.bulk_create(SalesOrderItem, items)
+                created_orders += len(orders)
+                created_items += len(items)
+
+        # Keep Customer.open_orders_amount consistent with the open orders
+        for customer in customers:
+            customer.open_orders_amount = exposure.get(customer.pk, 0)
+        Customer.objects.bulk_update(customers, ['open_orders_amount'], batch_size=self.batch_size)
+        self.report(created_orders, f'sales orders with {created_items} lines')
+
+    def seed_purchase_orders(self, count, lines_per_order, suppliers, products):
+        if not (suppliers and products):
+            return
+        created_orders = created_items = 0
+
+        with backdating(_field(PurchaseOrder, 'order_date'), _field(PurchaseOrder, 'created_at')):
+            for start in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - start)
+                orders = []
+                lines = []
+                for number in PurchaseOrder.allocate_order_numbers(size):
+                    supplier = self.rng.choice(suppliers)
+                    when = self.random_date()
+                    order = PurchaseOrder(
+                        order_number=number,
+                        supplier=supplier,
+                        status=self.weighted_status(PURCHASE_STATUS_WEIGHTS),
+                        order_date=when.date(),
+                        expected_delivery=when.date() + timedelta(days=supplier.lead_time_days),
+                        created_at=when,
+                    )
+                    order_lines = []
+                    for product in self.rng.sample(products, min(self.line_count(lines_per_order), len(products))):
+                        quantity = self.rng.randint(10, 200)
+                        order_lines.append(PurchaseOrderItem(
+                            product=product,
+                            quantity=quantity,
+                            unit_cost=product.cost_price,
+                            subtotal=quantity * product.cost_price,
+                        ))
+                    order.subtotal = order.total_amount = sum(line.subtotal for line in order_lines)
+                    orders.append(order)
+                    lines.append(order_lines)
+
+                orders = self.bulk_create(PurchaseOrder, orders)
+                items = []
+                for order, order_lines in zip(orders, lines):
+                    for line in order_lines:
+                        line.order = order
+                        items.append(line)
+                self.bulk_create(PurchaseOrderItem, items)
+                created_orders += len(orders)
+                created_items += len(items)
+
+        self.report(created_orders, f'purchase orders with {created_items} lines')
+
+    def seed_movements(self, count, products):
+        if not products:
+            return
+        # Movements are generated in date order so every product's running stock stays >= 0
+        stock = {product.pk: 0 for product in products}
+        step = self.days * 86400 / max(count, 1)
+        start_time = self.now - timedelta(days=self.days)
+        created = 0
+
+        with backdating(_field(StockMovement, 'created_at')):
+            batch = []
+            for i in range(count):
+                product_id = self.rng.choice(products).pk
+                roll = self.rng.random()
+                if roll < 0.6 and stock[product_id] > 0:
+                    movement_type = 'sale'
+                    quantity = -self.rng.randint(1, min(stock[product_id], 10))
+                elif roll < 0.65 and stock[product_id] > 0:
+                    movement_type = 'adjustment'
+                    quantity = -1
+                else:
+                    movement_type = 'purchase'
+                    quantity = self.rng.randint(10, 100)
+
+                stock[product_id] += quantity
+                batch.append(StockMovement(
+                    product_id=product_id,
+                    movement_type=movement_type,
+                    quantity=quantity,
+                    reference=f'{self.prefix}-MV-{i // 3}',
+                    created_at=start_time + timedelta(seconds=i * step),
+                ))
+                if len(batch) >= self.batch_size:
+                    created += len(self.bulk_create(StockMovement, batch))
+                    batch = []
+            created += len(self.bulk_create(StockMovement, batch))
+
+        # current_stock matches the ledger, like it would after adjust_stock()
+        for product in products:
+            product.current_stock = stock[product.pk]
+        Product.objects.bulk_update(products, ['current_stock'], batch_size=self.batch_size)
+        self.report(created, 'stock movements')
@@ -0,0 +1,149 @@
+"""
+In-process metrics, exposed at /metrics in the Prometheus text format
+
+Counters and histograms live in this process only: with several worker
+processes, each one is scraped (or labelled) separately. Everything here
+is cheap enough to stay on in production; the costly part (recording
+every query of a request) is sampled, see core.middleware.
+"""
+
+import functools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds / queries
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_lock = threading.Lock()
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        with _lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self.values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {} # label values -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, *label_values, value):
+        with _lock:
+            counts = self.values.setdefault(label_values, [0] * (len(self.buckets) + 1) + [0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self):
+        for label_values, counts in sorted(self.values.items()):
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                labels = _format_labels(self.labels + ('le',), label_values + (bound,))
+                yield f'{self.name}_bucket', labels, count
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_count', labels, counts[-2]
+            yield f'{self.name}_sum', labels, counts[-1]
+
+
+REGISTRY = {}
+
+
+def _register(metric):
+    REGISTRY[metric.name] = metric
+    return metric
+
+
+http_requests = _register(Counter(
+    'erp_http_requests_total', 'HTTP requests handled', ['method', 'route', 'status'],
+))
+http_request_duration = _register(Histogram(
+    'erp_http_request_duration_seconds', 'Time to handle a request', ['route'],
+))
+http_request_queries = _register(Histogram(
+    'erp_http_request_db_queries', 'Database queries per sampled request', ['route'], buckets=QUERY_BUCKETS,
+))
+http_request_db_duration = _register(Histogram(
+    'erp_http_request_db_seconds', 'Time spent in the database per sampled request', ['route'],
+))
+signal_receiver_duration = _register(Histogram(
+    'erp_signal_receiver_duration_seconds', 'Time spent in a signal receiver', ['receiver'],
+))
+product_cache_lookups = _register(Counter(
+    'erp_product_cache_lookups_total', 'Products looked up through inventory.cache, by where they were found', ['source'],
+))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    with _lock:
+        for metric in REGISTRY.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget every recorded value (for tests)"""
+    with _lock:
+        for metric in REGISTRY.values():
+            metric.values.clear()
+
+
+def timed_receiver(func):
+    """
+    Record how long a signal receiver takes, labelled with its module and name.
+    Put it under @receiver(...), so the timed function is the one connected.
+    """
+    label = f'{func.__module__}.{func.__name__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            signal_receiver_duration.observe(label, value=elapsed)
+            logger.debug('Signal receiver %s took %.1f ms', label, elapsed * 1000)
+
+    return wrapper
@@ -0,0 +1,113 @@
+"""
+Request instrumentation
+
+Every request is counted and timed (core.metrics). A sample of them,
+METRICS_SAMPLE_RATE, also has every database query recorded: the number
+of queries, the time spent in the database and the slowest statement are
+added to the metrics and written as one JSON log line per request to the
+`core.requests` logger (WARNING when over METRICS_SLOW_REQUEST_MS or
+METRICS_MANY_QUERIES, INFO otherwise).
+"""
+
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger('core.requests')
+
+SLOW_SQL_MAX_LENGTH = 500 # Characters of the slowest statement kept in the log
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() that counts queries and keeps the slowest one"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_sql = ''
+        self.slowest_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slowest_duration:
+                self.slowest_duration = elapsed
+                self.slowest_sql = sql
+
+
+def _route(request):
+    # The URL pattern, not the path, so ids don't explode the number of series
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 0.1)
+        self.slow_request_ms = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 1000)
+        self.many_queries = getattr(settings, 'METRICS_MANY_QUERIES', 100)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder() if random.random() < self.sample_rate else None
+        start = time.perf_counter()
+        if recorder:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        # Async views run their queries in worker threads, on other connections:
+        # only the duration is recorded for them
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, None)
+        return response
+
+    def record(self, request, response, duration, recorder):
+        route = _route(request)
+        metrics.http_requests.inc(request.method, route, response.status_code)
+        metrics.http_request_duration.observe(route, value=duration)
+        if recorder is None:
+            return
+
+        metrics.http_request_queries.observe(route, value=recorder.count)
+        metrics.http_request_db_duration.observe(route, value=recorder.duration)
+
+        duration_ms = duration * 1000
+        slow = duration_ms >= self.slow_request_ms or recorder.count >= self.many_queries
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'slowest_sql_ms': round(recorder.slowest_duration * 1000, 2),
+            'slowest_sql': recorder.slowest_sql[:SLOW_SQL_MAX_LENGTH],
+        }))
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def last_number(Model):
+    # Highest number already used, e.g. 'SO-042' -> 42
+    last = 0
+    for order_number in Model.objects.values_list('order_number', flat=True).iterator():
+        try:
+            last = max(last, int(order_number.split('-')[1]))
+        except (ValueError, IndexError):
+            pass
+    return last
+
+
+def seed_sequences(apps, schema_editor):
+    Sequence = apps.get_model('core', 'Sequence')
+    SalesOrder = apps.get_model('sales', 'SalesOrder')
+    PurchaseOrder = apps.get_model('purchasing', 'PurchaseOrder')
+
+    Sequence.objects.update_or_create(name='sales_order', defaults={'last_value': last_number(SalesOrder)})
+    Sequence.objects.update_or_create(name='purchase_order', defaults={'last_value': last_number(PurchaseOrder)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('sales', '0002_salesorder_salesorderitem'),
+        ('purchasing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
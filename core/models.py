@@ -0,0 +1,130 @@
+from django.db import models, transaction
+from django.utils import timezone
+
+
+class Sequence(models.Model):
+    """Named counter used to hand out document numbers (SO-001, PO-001, ...)"""
+    name = models.CharField(max_length=50, unique=True) # e.g. 'sales_order'
+    last_value = models.BigIntegerField(default=0) # Last number handed out
+
+    def __str__(self):
+        return f'{self.name}: {self.last_value}'
+
+    class Meta:
+        verbose_name = 'Sequence'
+        verbose_name_plural = 'Sequences'
+        ordering = ['name']
+
+
+class TrackedFieldsModel(models.Model):
+    """
+    Remembers the values of `tracked_fields` as they were loaded from the
+    database, so changes can be detected in memory without re-reading the
+    row. When `status` changed, `status_version` is bumped and
+    `core.signals.status_changed` is sent just before the row is written.
+    """
+    tracked_fields = ('status',)
+
+    # Number of status changes saved so far: two saves of the same change from
+    # the same loaded row share a version, see core.jobs.enqueue_status_change
+    status_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.tracked_fields and value is not models.DEFERRED
+        }
+        return instance
+
+    def _snapshot_tracked_fields(self, fields=None):
+        loaded = getattr(self, '_loaded_values', {})
+        for name in self.tracked_fields:
+            if fields is None or name in fields:
+                loaded[name] = getattr(self, name)
+        self._loaded_values = loaded
+
+    def get_loaded_values(self):
+        """Tracked values as stored in the database ({} for unsaved objects)"""
+        if self._state.adding:
+            return {}
+        if not hasattr(self, '_loaded_values'):
+            # Built by hand with a pk instead of loaded: fall back to one query
+            self._loaded_values = (
+                type(self)._base_manager.using(self._state.db or 'default')
+                .filter(pk=self.pk).values(*self.tracked_fields).first()
+            ) or {}
+        return self._loaded_values
+
+    def get_changed_fields(self):
+        """{field: (old_value, new_value)} for tracked fields changed since load"""
+        loaded = self.get_loaded_values()
+        return {
+            name: (loaded[name], getattr(self, name))
+            for name in self.tracked_fields
+            if name in loaded and loaded[name] != getattr(self, name)
+        }
+
+    def has_changed(self, field):
+        return field in self.get_changed_fields()
+
+    def save(self, *args, **kwargs):
+        from .signals import status_changed
+
+        update_fields = kwargs.get('update_fields')
+        changes = self.get_changed_fields()
+
+        # Receivers' writes (queued jobs, balances) commit or roll back together with the row
+        with transaction.atomic():
+            if 'status' in changes and (update_fields is None or 'status' in update_fields):
+                old_status, new_status = changes['status']
+                self.status_version += 1
+                if update_fields is not None:
+                    kwargs['update_fields'] = [*update_fields, 'status_version']
+                status_changed.send(sender=type(self), instance=self, old_status=old_status, new_status=new_status)
+
+            super().save(*args, **kwargs)
+        self._snapshot_tracked_fields(update_fields)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_tracked_fields(fields)
+
+
+class Job(models.Model):
+    """A unit of background work, picked up by `manage.py run_jobs`"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),   # Waiting to run (or to be retried)
+        ('running', 'Running'),   # Claimed by a worker
+        ('done', 'Done'),
+        ('failed', 'Failed'),     # Gave up after max_attempts
+    ]
+
+    name = models.CharField(max_length=100) # Registered handler, see core.jobs
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, unique=True) # Enqueuing the same key twice gives the same job
+    group = models.CharField(max_length=100, blank=True) # Jobs in a group run one at a time, in order (e.g. per order number)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now) # Not picked up before this (retry back-off)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} [{self.idempotency_key}] - {self.status}'
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']), # Worker polling
+            models.Index(fields=['group', 'status']), # "Is an earlier job of this group still open?"
+        ]
@@ -0,0 +1,287 @@
+"""
+Full-text search for big tables (products, customers)
+
+Admin search_fields and icontains filters become LIKE '%term%', which
+reads the whole table. A SearchIndex instead keeps a text index next to
+the table, in the database itself, so every write (save, bulk_create,
+update, raw SQL) keeps it in sync:
+
+    SQLite      an FTS5 table over the columns, filled by triggers
+    PostgreSQL  a trigram GIN index (pg_trgm) on the columns joined together
+
+All the words of the query must match: as whole words, the last one as
+a prefix (SQLite), or as substrings (PostgreSQL); other databases fall
+back to icontains. Matches are ranked by which columns the words are found in
+(per-column weights) and whether they are whole words. Ranking reads the
+matches in the most weighted columns (e.g. the name) first, so those are
+found even when a common word matches many rows elsewhere.
+
+The index is created by a migration of the model's app, with the same
+names as below (<table>_search and its triggers). Django rebuilds a SQLite
+table to alter it, which drops its triggers: they are put back (and the
+index refilled) after every migrate, see restore_triggers().
+`manage.py rebuild_search_index` refills the indexes by hand.
+"""
+
+import re
+import unicodedata
+
+from django.db import connections, router
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+
+WORD = re.compile(r'\w+')
+PREFIX_END = '\U0010ffff' # Sorts after any character, closes the SKU prefix range
+CANDIDATES = 200 # Matches ranked per query (and per pass), see SearchIndex.text_ids
+
+INDEXES = [] # Every SearchIndex, for rebuild_search_index and restore_triggers
+
+
+def _words(query):
+    return WORD.findall(query or '')
+
+
+def _fts_query(words):
+    # Whole words, except the last one, which may still be being typed. A
+    # prefix reads the postings of every word it starts, so it has to be
+    # covered by the prefix indexes (2 characters or more) to be cheap
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) > 1:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _fold(text):
+    # Lower case without accents, like the SQLite tokenizer (remove_diacritics)
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def _index_name(table):
+    return f'{table}_search'
+
+
+def _document(columns):
+    # The expression the migrations build the PostgreSQL index on (queries must repeat it)
+    joined = " || ' ' || ".join(f'coalesce("{column}", \'\')' for column in columns)
+    return f'({joined})'
+
+
+def _sqlite_triggers(table, columns):
+    # The triggers the migrations create, for restore_triggers()
+    fts = _index_name(table)
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def _sqlite_rebuild(table):
+    fts = _index_name(table)
+    return f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+
+
+class SearchIndex:
+    """
+    Search over the `weights` columns (column: weight, in the order the
+    migration created them) of a model's table, best match first. With a
+    `prefix_field` (e.g. the SKU), rows whose value starts with the query
+    come before the text matches.
+    """
+
+    def __init__(self, model, weights, prefix_field=None):
+        self.model = model
+        self.weights = weights
+        self.prefix_field = prefix_field
+        INDEXES.append(self)
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def columns(self):
+        return list(self.weights)
+
+    def _connection(self):
+        return connections[router.db_for_read(self.model)]
+
+    def _prefix_condition(self, start):
+        if self._connection().vendor == 'sqlite':
+            # LIKE is case-insensitive in SQLite and can't use the index; a range can
+            return Q(**{f'{self.prefix_field}__gte': start, f'{self.prefix_field}__lt': start + PREFIX_END})
+        return Q(**{f'{self.prefix_field}__startswith': start})
+
+    def _base(self, queryset):
+        return self.model._default_manager.all() if queryset is None else queryset
+
+    def prefix_ids(self, prefix, limit, queryset=None):
+        """
+        Ids of the rows of `queryset` (all rows by default) whose prefix_field
+        starts with `prefix` (as typed or in upper case), in order
+        """
+        prefix = (prefix or '').strip()
+        if not self.prefix_field or not prefix:
+            return []
+        # One ordered index range per spelling: ORed together they would be read in full and sorted
+        rows = []
+        for start in {prefix, prefix.upper()}:
+            matches = self._base(queryset).filter(self._prefix_condition(start)).order_by(self.prefix_field)
+            rows.extend(matches.values_list(self.prefix_field, 'pk')[:limit])
+        return [pk for value, pk in sorted(rows)[:limit]]
+
+    def _match(self, words, columns=None):
+        """
+        (SQL selecting the ids of the rows matching every word within `columns`
+        (all by default), params), or None without an index
+        """
+        connection = self._connection()
+        if connection.vendor == 'sqlite':
+            fts = _index_name(self.table)
+            query = _fts_query(words)
+            if columns:
+                query = f"{{{' '.join(columns)}}} : ({query})"
+            return f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [query]
+        if connection.vendor == 'postgresql':
+            # The whole document again, so the trigram index is still used
+            documents = [_document(self.columns)] + ([_document(columns)] if columns else [])
+            conditions = ' AND '.join(f'{document} ILIKE %s' for document in documents for word in words)
+            params = [f'%{connection.ops.prep_for_like_query(word)}%' for document in documents for word in words]
+            return f'SELECT id FROM {self.table} WHERE {conditions}', params
+        return None
+
+    def _condition(self, words, limit=None, columns=None):
+        match = self._match(words, columns)
+        if match is None:
+            # Databases without an index: every word in one of the columns
+            condition = Q()
+            for word in words:
+                condition &= Q(*[Q(**{f'{column}__icontains': word}) for column in columns or self.columns], _connector=Q.OR)
+            return condition
+        sql, params = match
+        if limit:
+            sql, params = f'{sql} LIMIT %s', [*params, limit]
+        return Q(pk__in=RawSQL(sql, params))
+
+    def _score(self, words, values):
+        # Whole word beats prefix, and each column counts with its weight
+        score = 0.0
+        for weight, value in zip(self.weights.values(), values):
+            tokens = _words(_fold(value))
+            for word in words:
+                if word in tokens:
+                    score += 2 * weight
+                elif any(token.startswith(word) for token in tokens):
+                    score += weight
+        return score
+
+    def text_ids(self, query, limit, queryset=None):
+        """
+        Ids of the rows of `queryset` (all rows by default) matching every
+        word of `query`, best first.
+
+        Ranking every match (bm25, similarity) reads the whole posting list
+        of common words, so only the first CANDIDATES matches are ranked:
+        those within the most weighted columns, then those anywhere. Exact
+        when there are fewer, and the next word typed narrows them.
+        """
+        words = _words(query)
+        if not words:
+            return []
+        queryset = self._base(queryset)
+        # The index lookup can stop early only when nothing else filters its matches out
+        index_limit = None if queryset.query.has_filters() else CANDIDATES
+
+        top = max(self.weights.values())
+        best_columns = [column for column, weight in self.weights.items() if weight == top]
+        passes = [best_columns, None] if len(best_columns) < len(self.columns) else [None]
+        rows = {}
+        for columns in passes:
+            matches = (
+                queryset
+                .filter(self._condition(words, limit=index_limit, columns=columns))
+                .order_by()
+                .values_list('pk', *self.columns)[:CANDIDATES]
+            )
+            for row in matches:
+                rows.setdefault(row[0], row)
+
+        folded = [_fold(word) for word in words]
+        ranked = sorted(rows.values(), key=lambda row: (-self._score(folded, row[1:]), len(row[1] or ''), row[0]))
+        return [row[0] for row in ranked[:limit]]
+
+    def filter(self, queryset, query):
+        """
+        `queryset` narrowed to the rows matching `query` (text or prefix),
+        unranked and unlimited: the index lookup runs as a subquery of it
+        """
+        words = _words(query)
+        if not words:
+            return queryset
+        condition = self._condition(words)
+        if self.prefix_field:
+            for start in {query.strip(), query.strip().upper()}:
+                condition |= self._prefix_condition(start)
+        return queryset.filter(condition)
+
+    def search_ids(self, query, limit=20, queryset=None):
+        """Prefix matches, then text matches, without duplicates, at most `limit`"""
+        ids = self.prefix_ids(query, limit, queryset)
+        seen = set(ids)
+        for pk in self.text_ids(query, limit, queryset):
+            if len(ids) >= limit:
+                break
+            if pk not in seen:
+                ids.append(pk)
+                seen.add(pk)
+        return ids
+
+    def search(self, query, limit=20, queryset=None):
+        """The matching rows of `queryset` (all rows by default), best first"""
+        queryset = self._base(queryset)
+        # Filtered before the limit, so rows left out by `queryset` don't take the places
+        ids = self.search_ids(query, limit, queryset)
+        if not ids:
+            return queryset.none()
+        rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+        return queryset.filter(pk__in=ids).order_by(rank)
+
+    def rebuild(self):
+        """Put back missing triggers and refill the index from the table"""
+        connection = self._connection()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                for statement in [*_sqlite_triggers(self.table, self.columns), _sqlite_rebuild(self.table)]:
+                    cursor.execute(statement)
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f'REINDEX INDEX {_index_name(self.table)}')
+
+    def needs_triggers(self):
+        """True when the SQLite index exists but its triggers were dropped with a table rebuild"""
+        connection = self._connection()
+        if connection.vendor != 'sqlite':
+            return False
+        fts = _index_name(self.table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT type, count(*) FROM sqlite_master WHERE (type = 'table' AND name = %s) "
+                "OR (type = 'trigger' AND name IN (%s, %s, %s)) GROUP BY type",
+                [fts, f'{fts}_insert', f'{fts}_delete', f'{fts}_update'],
+            )
+            found = dict(cursor.fetchall())
+        return found.get('table') == 1 and found.get('trigger', 0) < 3
+
+
+def restore_triggers(sender, **kwargs):
+    """post_migrate receiver: rebuild the SQLite indexes whose triggers a migration dropped"""
+    for index in INDEXES:
+        if index.needs_triggers():
+            index.rebuild()
@@ -0,0 +1,40 @@
+"""
+Race-free number allocation for documents (sales orders, purchase orders)
+
+Every allocation is a single `UPDATE ... SET last_value = last_value + n`
+on the sequence row. The update takes the row lock, so two workers can
+never get the same number, and a whole block of numbers can be reserved
+at once for bulk creation.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Sequence
+
+
+def next_values(name, count=1):
+    """Reserve `count` consecutive numbers from the sequence and return them as a range"""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    with transaction.atomic():
+        updated = Sequence.objects.filter(name=name).update(last_value=F('last_value') + count)
+        if not updated:
+            # First use of this sequence: create the row, then bump it
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(name=name)
+            except IntegrityError:
+                pass  # Another worker created it first
+            Sequence.objects.filter(name=name).update(last_value=F('last_value') + count)
+
+        # We hold the row lock until the transaction ends, so this is our value
+        last_value = Sequence.objects.filter(name=name).values_list('last_value', flat=True).get()
+
+    return range(last_value - count + 1, last_value + 1)
+
+
+def next_value(name):
+    """Reserve a single number from the sequence"""
+    return next_values(name, 1)[0]
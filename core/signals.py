@@ -0,0 +1,14 @@
+"""
+Custom signals shared by the ERP apps
+"""
+
+from django.dispatch import Signal
+
+# Sent by TrackedFieldsModel.save() when `status` changed, before the row is written.
+# Arguments: instance, old_status, new_status
+status_changed = Signal()
+
+# Sent by the inventory services after a batch of stock changes was written with
+# bulk_update / bulk_create (which don't send post_save).
+# Arguments: product_ids
+stock_changed = Signal()
@@ -0,0 +1,37 @@
+"""
+Test helpers shared by the app test suites
+"""
+
+import re
+import unittest
+
+from django.db import connection
+
+# "SCAN <table>" with no index behind it means SQLite reads every row
+FULL_SCAN_RE = re.compile(r'\bSCAN (\w+)$')
+
+
+def explain(queryset):
+    """Return the EXPLAIN QUERY PLAN detail lines of a queryset."""
+    return [line.split(' ', 3)[-1] for line in queryset.explain().splitlines()]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class QueryPlanTestMixin:
+    """
+    Assertions on query plans for the hot queries of an app.
+    Postgres picks seq scans for small test tables, so plans are only checked on SQLite.
+    """
+
+    def assertNoFullScan(self, queryset):
+        plan = explain(queryset)
+        scanned = [match.group(1) for match in map(FULL_SCAN_RE.search, plan) if match]
+        self.assertFalse(scanned, f"Full table scan on {', '.join(scanned)}:\n" + '\n'.join(plan))
+
+    def assertNoSort(self, queryset):
+        # The ORDER BY should be answered by walking an index, not a temp b-tree
+        plan = explain(queryset)
+        self.assertFalse(
+            [line for line in plan if 'TEMP B-TREE' in line],
+            'Sorted in a temp b-tree:\n' + '\n'.join(plan),
+        )
@@ -0,0 +1,180 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomerUser
+from core import metrics
+from core.benchmarks import BENCHMARKS
+from inventory.models import Product, StockMovement
+from purchasing.models import PurchaseOrder
+from sales.models import Customer, SalesOrder, SalesOrderItem
+
+
+class SeedAndBenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', products=60, customers=10, suppliers=3, orders=40, purchase_orders=10,
+            movements=600, stdout=StringIO(),
+        )
+
+    def test_seeded_stock_matches_the_ledger(self):
+        self.assertEqual(Product.objects.count(), 60)
+        for product in Product.objects.all():
+            ledger = sum(StockMovement.objects.filter(product=product).values_list('quantity', flat=True))
+            self.assertEqual(product.current_stock, ledger)
+            self.assertGreaterEqual(product.current_stock, 0)
+
+    def test_seeded_exposure_matches_open_orders(self):
+        for customer in Customer.objects.all():
+            open_total = sum(
+                customer.orders.filter(status__in=SalesOrder.OPEN_STATUSES).values_list('total_amount', flat=True)
+            )
+            self.assertEqual(customer.open_orders_amount, open_total)
+
+    def test_benchmark_emits_json_for_every_benchmark(self):
+        already_confirmed = list(SalesOrder.objects.filter(status='confirmed').values_list('pk', flat=True))
+        already_received = list(PurchaseOrder.objects.filter(status='received').values_list('pk', flat=True))
+
+        out = StringIO()
+        # The confirm/receive benchmarks run their stock jobs inline, on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('benchmark', iterations=2, warmup=0, stdout=out)
+        report = json.loads(out.getvalue())
+
+        # The benchmarked orders really moved stock
+        confirmed = SalesOrder.objects.filter(status='confirmed').exclude(pk__in=already_confirmed).values_list('order_number', flat=True)
+        received = PurchaseOrder.objects.filter(status='received').exclude(pk__in=already_received).values_list('order_number', flat=True)
+        self.assertEqual(len(confirmed), 2)
+        self.assertEqual(len(received), 2)
+        for number in confirmed:
+            self.assertTrue(StockMovement.objects.filter(reference=number, movement_type='sale').exists(), number)
+        for number in received:
+            self.assertTrue(StockMovement.objects.filter(reference=number, movement_type='purchase').exists(), number)
+
+        self.assertEqual(set(report['results']), set(BENCHMARKS))
+        for name, result in report['results'].items():
+            self.assertNotIn('skipped', result, name)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreater(result['queries'], 0, name)
+
+
+class ApiTest(TestCase):
+    """Conditional GET, sparse fieldsets and cursor pagination, on the sales order endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        customer = Customer.objects.create(name='Customer')
+        product = Product.objects.create(sku='HAM', name='Hammer', selling_price=10)
+        cls.orders = [SalesOrder.objects.create(customer=customer) for _ in range(3)]
+        SalesOrderItem.objects.bulk_create([
+            SalesOrderItem(order=order, product=product, quantity=1, unit_price=10, subtotal=10)
+            for order in cls.orders
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, url, etag=None, **params):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(url, params, headers=headers)
+
+    def test_unchanged_detail_is_not_modified(self):
+        order = self.orders[0]
+        url = reverse('sales-order-detail', args=[order.pk])
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        not_modified = self.get(url, response['ETag'])
+        self.assertEqual((not_modified.status_code, not_modified.content), (304, b''))
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        # Another fieldset is another representation
+        self.assertEqual(self.get(url, response['ETag'], fields='id').status_code, 200)
+
+        order.notes = 'Changed'
+        order.save()
+        self.assertEqual(self.get(url, response['ETag']).status_code, 200)
+
+    def test_unchanged_list_is_not_modified(self):
+        url = reverse('sales-order-list')
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(url, response['ETag']).status_code, 304)
+
+        SalesOrder.objects.create(customer=self.orders[0].customer)
+        self.assertEqual(self.get(url, response['ETag']).status_code, 200)
+
+    def test_sparse_fields_skip_the_items(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(reverse('sales-order-list'), fields='id,order_number')
+        self.assertEqual({tuple(row) for row in response.json()['results']}, {('id', 'order_number')})
+        self.assertFalse([query for query in queries if 'sales_salesorderitem' in query['sql']])
+
+        response = self.get(reverse('sales-order-detail', args=[self.orders[0].pk]))
+        self.assertEqual([item['sku'] for item in response.json()['items']], ['HAM'])
+
+    def test_cursor_pagination(self):
+        first = self.get(reverse('sales-order-list'), page_size=2).json()
+        self.assertEqual([row['id'] for row in first['results']], [self.orders[2].pk, self.orders[1].pk])
+        self.assertIn('cursor=', first['next'])
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], [self.orders[0].pk])
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.customer = Customer.objects.create(name='Customer')
+
+    def setUp(self):
+        metrics.reset()
+        self.client.force_login(self.user)
+
+    def test_sampled_request_is_logged_and_exposed(self):
+        with self.assertLogs('core.requests', level='INFO') as logs:
+            self.client.get(reverse('admin:sales_salesorder_changelist'))
+
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['route'], 'admin/sales/salesorder/')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['queries'], 0)
+        self.assertTrue(entry['slowest_sql'])
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('erp_http_requests_total{method="GET",route="admin/sales/salesorder/",status="200"} 1', body)
+        self.assertIn('erp_http_request_db_queries_count{route="admin/sales/salesorder/"} 1', body)
+
+    def test_signal_receivers_are_timed(self):
+        order = SalesOrder.objects.create(customer=self.customer)
+        order.status = 'confirmed'
+        order.save()
+
+        body = metrics.render()
+        self.assertIn('erp_signal_receiver_duration_seconds_count{receiver="sales.signals.update_order_totals"}', body)
+        self.assertIn('erp_signal_receiver_duration_seconds_count{receiver="sales.signals.queue_inventory_update_on_status_change"} 1', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+
+    def test_metrics_require_staff_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer '}).status_code, 403)
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from . import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, for staff users or scrapers sending
+    `Authorization: Bearer <METRICS_TOKEN>` (when a token is set)
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    has_token = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (has_token or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,31 @@
+"""
+Version 1 of the REST API (read-only)
+
+    /api/v1/products/  (type-ahead: /api/v1/products/search/?q=)
+    /api/v1/customers/ (type-ahead: /api/v1/customers/search/?q=)
+    /api/v1/sales-orders/
+    /api/v1/purchase-orders/
+    /api/v1/atp/?sku=A,B (available to promise)
+    /api/v1/token/ and /api/v1/token/refresh/ (JWT for integrations)
+"""
+
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from inventory.api import AvailableToPromiseView, ProductViewSet
+from purchasing.api import PurchaseOrderViewSet
+from sales.api import CustomerViewSet, SalesOrderViewSet
+
+router = DefaultRouter()
+router.register('products', ProductViewSet, basename='product')
+router.register('customers', CustomerViewSet, basename='customer')
+router.register('sales-orders', SalesOrderViewSet, basename='sales-order')
+router.register('purchase-orders', PurchaseOrderViewSet, basename='purchase-order')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('atp/', AvailableToPromiseView.as_view(), name='available_to_promise'),
+    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+]
@@ -3,6 +3,10 @@ ASGI config for erp_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve with an ASGI server (e.g. `uvicorn erp_system.asgi:application`) so
+async views such as the order intake endpoint (sales.views.create_order)
+run on the event loop instead of holding a thread per request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,94 @@
+"""
+Database profiles, picked with the ERP_DATABASE environment variable
+
+    ERP_DATABASE=sqlite (default)
+        ERP_SQLITE_PATH          database file (default: BASE_DIR/db.sqlite3)
+        ERP_SQLITE_BUSY_TIMEOUT  seconds a writer waits for the lock (default 20)
+        ERP_SQLITE_WAL=1         switch the file to WAL (readers don't wait for writers); the
+                                 mode is stored in the file, so leave it off for the sample
+                                 db.sqlite3 kept in the repository
+        ERP_SQLITE_TEST_PATH     test database file (default: in the system temp directory)
+
+    ERP_DATABASE=postgres  (needs psycopg 3; psycopg[pool] for ERP_DB_POOL)
+        POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT
+        ERP_DB_POOL=1            use Django's connection pool instead of persistent connections
+        ERP_DB_POOL_MIN_SIZE, ERP_DB_POOL_MAX_SIZE, ERP_DB_POOL_TIMEOUT
+        ERP_DB_CONN_MAX_AGE      seconds to keep a connection without the pool (default 60)
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite(base_dir):
+    """
+    SQLite tuned for several users at once: transactions take the write
+    lock when they start (BEGIN IMMEDIATE), so two writers queue on
+    busy_timeout instead of failing with "database is locked" when both try
+    to upgrade a read lock. With ERP_SQLITE_WAL=1 (deployments), readers
+    also keep working while someone writes.
+    """
+    options = {
+        'timeout': _env_int('ERP_SQLITE_BUSY_TIMEOUT', 20), # busy_timeout, in seconds
+        'transaction_mode': 'IMMEDIATE',
+    }
+    if _env_flag('ERP_SQLITE_WAL'):
+        options['init_command'] = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL'
+
+    test_path = os.environ.get('ERP_SQLITE_TEST_PATH') or Path(tempfile.gettempdir()) / 'erp_test_db.sqlite3'
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('ERP_SQLITE_PATH', base_dir / 'db.sqlite3'),
+        'OPTIONS': options,
+        # A file, not an in-memory database, so threads in the tests can share it
+        'TEST': {'NAME': test_path},
+    }
+
+
+def postgres(base_dir):
+    """PostgreSQL with pooled (ERP_DB_POOL=1) or persistent connections"""
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'erp'),
+        'USER': os.environ.get('POSTGRES_USER', 'erp'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if _env_flag('ERP_DB_POOL'):
+        # The pool keeps the connections; Django requires CONN_MAX_AGE = 0 with it
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': _env_int('ERP_DB_POOL_MIN_SIZE', 2),
+            'max_size': _env_int('ERP_DB_POOL_MAX_SIZE', 10),
+            'timeout': _env_int('ERP_DB_POOL_TIMEOUT', 10),
+        }
+    else:
+        database['CONN_MAX_AGE'] = _env_int('ERP_DB_CONN_MAX_AGE', 60)
+    return database
+
+
+PROFILES = {
+    'sqlite': sqlite,
+    'postgres': postgres,
+}
+
+
+def database_from_env(base_dir):
+    """The default database settings for the ERP_DATABASE profile"""
+    profile = os.environ.get('ERP_DATABASE', 'sqlite')
+    try:
+        return PROFILES[profile](base_dir)
+    except KeyError:
+        raise ValueError(f"Unknown ERP_DATABASE {profile!r}, expected one of {', '.join(PROFILES)}") from None
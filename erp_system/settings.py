@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from .database import database_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +39,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
+    'core',
     'inventory',
     'accounts',
     'purchasing',
@@ -46,6 +50,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,11 +83,9 @@ WSGI_APPLICATION = 'erp_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Picked with ERP_DATABASE=sqlite|postgres, see erp_system/database.py
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_env(BASE_DIR),
 }
 
 
@@ -138,4 +141,62 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 # Login and logout urls
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGIN_URL = '/accounts/login/'
-LOGOUT_REDIRECT_URL = '/accounts/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+# REST API: read-only, for logged in staff (session) or integrations (JWT)
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAdminUser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'core.api.IdCursorPagination',
+}
+
+# Async order intake (sales.views.create_order): threads doing the writes,
+# and how many orders may wait for them before new ones get a 503.
+# SQLite allows one writer at a time, so extra threads there only fight over the lock.
+ORDER_INTAKE_WORKERS = 1 if DATABASES['default']['ENGINE'].endswith('sqlite3') else 4
+ORDER_INTAKE_MAX_PENDING = 64
+
+# Background jobs (core.jobs): stock updates for order status changes are queued
+# and run by `manage.py run_jobs`. Set to True to run them as soon as the save commits instead.
+JOBS_RUN_INLINE = False
+
+# Stock reserved for draft orders is released by `manage.py expire_reservations`
+# when the order isn't confirmed within this many minutes
+STOCK_RESERVATION_TTL_MINUTES = 24 * 60
+
+# Reports (dashboard) are cached for this many seconds, and dropped early when stock changes
+REPORT_CACHE_TIMEOUT = 300
+
+# Product lookups (inventory.cache): a per-process LRU cache of this many entries, each kept
+# for this many seconds, in front of the shared cache named here (an alias in CACHES, e.g.
+# 'default' with Redis or Memcached), if any, and the database
+PRODUCT_CACHE_SIZE = 10000
+PRODUCT_CACHE_TIMEOUT = 300
+PRODUCT_CACHE_SHARED = ''
+
+# Request metrics (core.middleware, served at /metrics): every request is counted and timed,
+# this share of them also has its queries recorded and logged to `core.requests`
+METRICS_SAMPLE_RATE = 0.1
+METRICS_SLOW_REQUEST_MS = 1000 # Logged as a warning above this...
+METRICS_MANY_QUERIES = 100 # ...or this many queries
+METRICS_TOKEN = '' # /metrics is for staff users, and for scrapers sending "Authorization: Bearer <token>" when set
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        app: {'handlers': ['console'], 'level': 'INFO'}
+        for app in ['core', 'accounts', 'inventory', 'purchasing', 'reportin', 'sales']
+    },
+}
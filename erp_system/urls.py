@@ -15,8 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from core.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('', include('reportin.urls')),
+    path('inventory/', include('inventory.urls')),
+    path('api/v1/', include('erp_system.api')),
+    path('api/v1/intake/', include('sales.urls')),
 ]
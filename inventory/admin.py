@@ -1,6 +1,22 @@
 from django.contrib import admin
+from core.admin import LargeTableAdminMixin, SearchIndexAdminMixin
 from .models import Category
 from .models import Product
+from .search import products as product_search
+
+
+class ActiveCategoryFilter(admin.SimpleListFilter):
+    """Category filter that only lists active categories, reading just id and name"""
+    title = 'category'
+    parameter_name = 'category__id__exact'
+
+    def lookups(self, request, model_admin):
+        return Category.objects.filter(is_active=True).values_list('id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(category_id=self.value())
+        return queryset
 
 @admin.register(Category)
 
@@ -13,10 +29,16 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(SearchIndexAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'sku', 'category', 'current_stock', 'selling_price', 'is_active')
-    search_fields = ('name', 'sku', 'description')
-    list_filter = ('category', 'is_active')
+    search_fields = ('name', 'sku', 'description') # Answered from the search index, see core.search
+    search_index = product_search
+    list_filter = (ActiveCategoryFilter, 'is_active')
+
+    # Load the category in the same query, and only the columns shown in the list
+    list_select_related = ('category',)
+    list_only_fields = ('name', 'sku', 'category', 'category__name', 'current_stock', 'selling_price', 'is_active')
+    autocomplete_fields = ('category',)
 
     # Fields to show in edit form
     fieldsets = (
@@ -29,8 +51,17 @@ class ProductAdmin(admin.ModelAdmin):
         }),
      
         ('Inventory', {
-            'fields': ('current_stock', 'is_active')
+            'fields': ('current_stock', 'reserved_stock', 'is_active')
         }),
     
     )
+    readonly_fields = ('reserved_stock',)
+
+    def save_model(self, request, obj, form, change):
+        # Only write the columns edited in the form, so stock and reservation
+        # counters changed by orders in the meantime aren't overwritten
+        if change and form.changed_data:
+            obj.save(update_fields=[*form.changed_data, 'updated_at'])
+        elif not change:
+            obj.save()
     
\ No newline at end of file
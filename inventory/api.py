@@ -0,0 +1,65 @@
+from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.api import ConditionalGetMixin, IdCursorPagination, TypeAheadMixin, id_param
+from .models import Product
+from .reservations import available_to_promise
+from .search import products as product_search
+from .serializers import ProductSerializer
+
+
+class ProductViewSet(TypeAheadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Products, newest first. Filter with ?sku=, ?category=<id>, ?is_active=true|false.
+    Type-ahead: /products/search/?q=
+    """
+    serializer_class = ProductSerializer
+    pagination_class = IdCursorPagination
+    search_index = product_search
+    typeahead_fields = ('id', 'sku', 'name', 'selling_price', 'is_active')
+
+    def get_queryset(self):
+        products = Product.objects.select_related('category')
+        params = self.request.query_params
+
+        if params.get('sku'):
+            products = products.filter(sku=params['sku'])
+        category_id = id_param(self.request, 'category')
+        if category_id is not None:
+            products = products.filter(category_id=category_id)
+        if params.get('is_active') in ('true', 'false'):
+            products = products.filter(is_active=params['is_active'] == 'true')
+        return products
+
+
+class AvailableToPromiseView(APIView):
+    """
+    Available stock (on hand minus reserved) for many products in one query:
+    ?sku=A,B,C or ?product=1,2,3 (up to MAX_ITEMS)
+    """
+    MAX_ITEMS = 1000
+
+    def get(self, request):
+        skus = [sku for sku in request.query_params.get('sku', '').split(',') if sku]
+        ids = [value for value in request.query_params.get('product', '').split(',') if value]
+
+        if not skus and not ids:
+            return Response({'error': 'Pass ?sku= or ?product= (comma separated)'}, status=400)
+        if len(skus) + len(ids) > self.MAX_ITEMS:
+            return Response({'error': f'At most {self.MAX_ITEMS} products per request'}, status=400)
+        if not all(value.isdigit() for value in ids):
+            return Response({'error': 'product must be a list of ids'}, status=400)
+
+        found = {}
+        if skus:
+            found.update(available_to_promise(skus=skus))
+        if ids:
+            found.update(available_to_promise(product_ids=[int(value) for value in ids]))
+
+        return Response({
+            'results': [
+                {'product': product_id, 'sku': sku, 'available': available}
+                for product_id, (sku, available) in sorted(found.items())
+            ],
+        })
@@ -0,0 +1,208 @@
+"""
+Product lookup cache
+
+Order entry looks up the same products again and again, mostly for their
+name and prices. get_many() resolves all the products of an order (by id
+or SKU) from a process-local LRU cache, then from the shared cache when
+PRODUCT_CACHE_SHARED names one of CACHES, and reads only the rest from
+the database, in one query.
+
+Entries expire after PRODUCT_CACHE_TIMEOUT seconds and are dropped as
+soon as a product is saved or deleted, or its stock changes (stock_changed,
+sent after bulk updates), see inventory.signals. Other processes only see
+that through the shared cache, so their local copy can be up to the
+timeout old: check stock against the database (inventory.reservations),
+never against a cached product.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core import metrics
+
+from .models import Product
+
+KEY_PREFIX = 'inventory:product'
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps the `size` most recently used keys, each for `timeout` seconds"""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, values):
+        if self.size <= 0:
+            return
+        expires = time.monotonic() + self.timeout
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_local = None
+_local_lock = threading.Lock()
+
+
+def _timeout():
+    return getattr(settings, 'PRODUCT_CACHE_TIMEOUT', 300)
+
+
+def _local_cache():
+    global _local
+    if _local is None:
+        with _local_lock:
+            if _local is None:
+                _local = LRUCache(size=getattr(settings, 'PRODUCT_CACHE_SIZE', 10000), timeout=_timeout())
+    return _local
+
+
+def _shared_cache():
+    alias = getattr(settings, 'PRODUCT_CACHE_SHARED', '')
+    return caches[alias] if alias else None
+
+
+def _id_key(product_id):
+    return f'{KEY_PREFIX}:{product_id}'
+
+
+def _sku_key(sku):
+    return f'{KEY_PREFIX}:sku:{sku}'
+
+
+def _store(products):
+    # Each product is stored under its id; the SKU entry points to the id
+    values = {}
+    for product in products:
+        values[_id_key(product.pk)] = product
+        values[_sku_key(product.sku)] = product.pk
+    _local_cache().set_many(values)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set_many(values, _timeout())
+
+
+def _lookup(keys):
+    """Values of `keys` from the local cache, then the shared one"""
+    found = _local_cache().get_many(keys)
+    metrics.product_cache_lookups.inc('local', amount=len(found))
+
+    missing = [key for key in keys if key not in found]
+    shared = _shared_cache()
+    if missing and shared is not None:
+        from_shared = shared.get_many(missing)
+        metrics.product_cache_lookups.inc('shared', amount=len(from_shared))
+        _local_cache().set_many(from_shared)
+        found.update(from_shared)
+    return found
+
+
+def get_many(ids=(), skus=()):
+    """
+    {id: Product} for the ids, and {sku: Product} for the SKUs, as a pair
+    of dicts, with at most one database query. Unknown ids and SKUs are
+    left out. The products are copies, safe to change.
+    """
+    ids = set(ids)
+    sku_keys = {_sku_key(sku): sku for sku in skus}
+
+    # SKUs resolve to ids first, so a product is stored (and invalidated) once
+    sku_ids = {sku_keys[key]: product_id for key, product_id in _lookup(list(sku_keys)).items()}
+    wanted = ids | set(sku_ids.values())
+    cached = {product.pk: product for product in _lookup([_id_key(product_id) for product_id in wanted]).values()}
+
+    def resolved(sku):
+        # The SKU entry outlives a change of SKU, so check it still matches
+        product = cached.get(sku_ids.get(sku))
+        return product is not None and product.sku == sku
+
+    missing_ids = wanted - set(cached)
+    missing_skus = [sku for sku in sku_keys.values() if not resolved(sku)]
+    if missing_ids or missing_skus:
+        loaded = list(Product.objects.filter(pk__in=missing_ids) | Product.objects.filter(sku__in=missing_skus))
+        metrics.product_cache_lookups.inc('database', amount=len(loaded))
+        _store(loaded)
+        for product in loaded:
+            cached[product.pk] = product
+            sku_ids[product.sku] = product.pk
+
+    by_id = {product_id: copy.copy(cached[product_id]) for product_id in ids if product_id in cached}
+    by_sku = {sku: copy.copy(cached[sku_ids[sku]]) for sku in sku_keys.values() if resolved(sku)}
+    return by_id, by_sku
+
+
+def get_product(product_id):
+    """One product by id (None when it doesn't exist)"""
+    return get_many(ids=[product_id])[0].get(product_id)
+
+
+def get_product_by_sku(sku):
+    """One product by SKU (None when it doesn't exist)"""
+    return get_many(skus=[sku])[1].get(sku)
+
+
+def _forget(product_ids):
+    # The SKU entries are left: get_many() checks them against the product
+    keys = [_id_key(product_id) for product_id in product_ids]
+    _local_cache().delete_many(keys)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete_many(keys)
+
+
+def invalidate(product_ids):
+    """
+    Drop products from the caches, now and again once the transaction
+    commits (a lookup in between may have cached the uncommitted row's
+    old version).
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    _forget(product_ids)
+    transaction.on_commit(lambda: _forget(product_ids))
+
+
+def clear():
+    """Empty the local cache (the shared one expires on its own)"""
+    _local_cache().clear()
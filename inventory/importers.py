@@ -0,0 +1,233 @@
+"""
+Bulk product catalog import (CSV or JSON Lines)
+
+Rows are read as a stream and written in chunks with a single
+INSERT ... ON CONFLICT (sku) DO UPDATE per chunk (one per set of columns
+when the rows don't all have the same ones). Invalid rows are reported and
+skipped; they don't stop the rest of the file.
+
+A stock level in the file is written to the product and, for the
+difference with the stock it replaces, to the stock ledger as an
+'adjustment' movement, so the ledger still adds up to current_stock.
+"""
+
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from core.signals import stock_changed
+
+from .models import Category, Product, StockMovement
+from .services import update_stock_snapshots
+
+# Columns understood by the importer; `sku` and `name` are required
+COLUMNS = ('sku', 'name', 'description', 'category', 'cost_price', 'selling_price', 'current_stock', 'is_active')
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'f', '')
+
+
+def read_csv(file):
+    """Yield one dict per CSV row (first line is the header)"""
+    yield from csv.DictReader(file)
+
+
+def read_jsonl(file):
+    """Yield one dict per non-empty JSON Lines row (unreadable lines become error rows)"""
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as error:
+            row = {'_error': f"invalid JSON: {error}"}
+        if not isinstance(row, dict):
+            row = {'_error': "each line must be a JSON object"}
+        yield row
+
+
+def _clean_price(field, value):
+    try:
+        price = Decimal(str(value or '0'))
+    except InvalidOperation:
+        raise ValueError(f"{field} is not a number: {value!r}")
+    if not price.is_finite():
+        raise ValueError(f"{field} is not a number: {value!r}")
+    if price < 0:
+        raise ValueError(f"{field} can't be negative")
+
+    # What the column can hold, e.g. up to 99999999.99 for max_digits=10, decimal_places=2
+    column = Product._meta.get_field(field)
+    whole_digits = column.max_digits - column.decimal_places
+    if price.adjusted() >= whole_digits:
+        raise ValueError(f"{field} is too large: {value!r}")
+    price = price.quantize(Decimal(1).scaleb(-column.decimal_places))
+    if price.adjusted() >= whole_digits: # Rounded up to one digit more
+        raise ValueError(f"{field} is too large: {value!r}")
+    return price
+
+
+def _clean_row(row, categories):
+    """Turn a raw row into Product field values, raising ValueError when invalid"""
+    if '_error' in row:
+        raise ValueError(row['_error'])
+
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku:
+        raise ValueError("sku is required")
+    if len(sku) > 50:
+        raise ValueError("sku is longer than 50 characters")
+    if not name:
+        raise ValueError("name is required")
+    if len(name) > 200:
+        raise ValueError("name is longer than 200 characters")
+
+    values = {'sku': sku, 'name': name}
+
+    if 'description' in row:
+        values['description'] = row['description'] or ''
+
+    if 'category' in row:
+        category_name = str(row['category'] or '').strip()
+        values['category_id'] = categories.get(category_name) if category_name else None
+
+    for field in ('cost_price', 'selling_price'):
+        if field in row:
+            values[field] = _clean_price(field, row[field])
+
+    if 'current_stock' in row:
+        try:
+            values['current_stock'] = int(row['current_stock'] or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"current_stock is not a whole number: {row['current_stock']!r}")
+
+    if 'is_active' in row:
+        flag = row['is_active']
+        if not isinstance(flag, bool):
+            flag = str(flag).strip().lower()
+            if flag not in TRUE_VALUES + FALSE_VALUES:
+                raise ValueError(f"is_active is not true/false: {row['is_active']!r}")
+            flag = flag in TRUE_VALUES
+        values['is_active'] = flag
+
+    return values
+
+
+def _resolve_categories(rows, categories, create_categories):
+    """Add any category names used in the chunk to the name -> id map"""
+    names = {str(row.get('category') or '').strip() for row in rows} - {''}
+    missing = names - categories.keys()
+    if not missing:
+        return
+
+    # Names may have been created by someone else since the map was loaded
+    categories.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+    if create_categories:
+        for name in missing - categories.keys():
+            slug = slugify(name)
+            if not slug:
+                continue # Rows using it are reported as unknown category
+            # A name with the slug of an existing category ('Power tools' / 'Power Tools') joins it
+            category, _ = Category.objects.get_or_create(slug=slug, defaults={'name': name})
+            categories[name] = category.id
+
+
+def _update_fields(row):
+    # Only the columns the row provides: the others keep their current values
+    return tuple(column for column in COLUMNS if column in row and column != 'sku') + ('updated_at',)
+
+
+def _record_stock_changes(stock, previous):
+    """Adjustment movements (and snapshots) for the stock levels `stock` {sku: quantity} set over `previous`"""
+    changed = {sku: quantity - previous.get(sku, 0) for sku, quantity in stock.items() if quantity != previous.get(sku, 0)}
+    if not changed:
+        return
+    product_ids = dict(Product.objects.filter(sku__in=list(changed)).values_list('sku', 'pk'))
+    movements = StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=product_ids[sku],
+            movement_type='adjustment',
+            quantity=difference,
+            reference='IMPORT',
+            notes='Stock level from a catalog import',
+        )
+        for sku, difference in changed.items()
+    ])
+    update_stock_snapshots(movements)
+
+
+def import_products(rows, chunk_size=1000, create_categories=True):
+    """
+    Upsert products on SKU from an iterable of dicts.
+
+    The fields updated for existing SKUs are the columns present in each
+    row (for a CSV, the header). Returns a report dict with counts, timing
+    and per-row errors as (row_number, sku, message).
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    started = time.monotonic()
+    categories = dict(Category.objects.values_list('name', 'id'))
+    rows = iter(rows)
+
+    report = {'rows': 0, 'imported': 0, 'errors': []}
+    row_number = 0
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        _resolve_categories(chunk, categories, create_categories)
+
+        products = {}  # sku -> (update fields, Product); a SKU repeated in the chunk keeps its last row
+        for row in chunk:
+            row_number += 1
+            try:
+                values = _clean_row(row, categories)
+                category_name = str(row.get('category') or '').strip()
+                if category_name and values.get('category_id') is None:
+                    raise ValueError(f"unknown category {category_name!r}")
+            except ValueError as error:
+                report['errors'].append((row_number, row.get('sku'), str(error)))
+                continue
+            products[values['sku']] = (_update_fields(row), Product(**values))
+
+        report['rows'] = row_number
+        if not products:
+            continue
+
+        by_fields = {}
+        for update_fields, product in products.values():
+            by_fields.setdefault(update_fields, []).append(product)
+
+        stock = {
+            product.sku: product.current_stock
+            for update_fields, product in products.values() if 'current_stock' in update_fields
+        }
+        saved = []
+        with transaction.atomic():
+            # Stock before the upsert, locked until the ledger catches up
+            previous = dict(Product.objects.select_for_update().filter(sku__in=list(stock)).values_list('sku', 'current_stock'))
+            for update_fields, group in by_fields.items():
+                saved += Product.objects.bulk_create(
+                    group,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=list(update_fields),
+                )
+            _record_stock_changes(stock, previous)
+        report['imported'] += len(saved)
+        stock_changed.send(sender=Product, product_ids=[product.pk for product in saved if product.pk])
+
+    elapsed = time.monotonic() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows'] / elapsed, 1) if elapsed > 0 else None
+    return report
@@ -0,0 +1,21 @@
+"""
+Sweeper for stale stock reservations (draft orders nobody confirmed).
+Run it every few minutes, e.g. from cron:
+
+    python manage.py expire_reservations
+"""
+
+from django.core.management.base import BaseCommand
+
+from inventory.reservations import expire_stale
+
+
+class Command(BaseCommand):
+    help = 'Release stock reservations that are past their expiry time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expired = expire_stale(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} reservations'))
@@ -0,0 +1,51 @@
+"""
+Import or update products from a CSV or JSON Lines file, upserting on SKU.
+
+    python manage.py import_products catalog.csv
+    python manage.py import_products catalog.jsonl --chunk-size 5000 --no-create-categories
+"""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importers import import_products, read_csv, read_jsonl
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products from a CSV or JSON Lines file (upsert on SKU)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or .jsonl file to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--no-create-categories', action='store_true', help='Reject rows with unknown categories instead of creating them')
+        parser.add_argument('--max-errors', type=int, default=50, help='How many row errors to print')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        file_format = options['format'] or ('jsonl' if path.suffix in ('.jsonl', '.ndjson') else 'csv')
+        reader = read_jsonl if file_format == 'jsonl' else read_csv
+
+        with path.open(newline='', encoding='utf-8-sig') as file:
+            report = import_products(
+                reader(file),
+                chunk_size=options['chunk_size'],
+                create_categories=not options['no_create_categories'],
+            )
+
+        for row_number, sku, message in report['errors'][:options['max_errors']]:
+            self.stderr.write(f"Row {row_number} ({sku or 'no sku'}): {message}")
+        if len(report['errors']) > options['max_errors']:
+            self.stderr.write(f"... and {len(report['errors']) - options['max_errors']} more errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} of {report['rows']} rows "
+            f"in {report['seconds']}s ({report['rows_per_second']} rows/sec), "
+            f"{len(report['errors'])} errors"
+        ))
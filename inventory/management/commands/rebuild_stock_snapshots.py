@@ -0,0 +1,68 @@
+"""
+Rebuild the daily stock snapshots from the full movement history.
+
+Normally snapshots are maintained as movements are written; run this once
+after deploying them, or whenever the table needs to be regenerated.
+
+    python manage.py rebuild_stock_snapshots
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from inventory.models import Product, StockMovement, StockSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Recompute StockSnapshot rows (daily closing stock per product) from StockMovement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cost_prices = dict(Product.objects.values_list('pk', 'cost_price'))
+
+        # One grouped aggregate: net movement per product per day, in order
+        daily = (
+            StockMovement.objects
+            .annotate(day=TruncDate('created_at'))
+            .values('product_id', 'day')
+            .annotate(quantity=Sum('quantity'))
+            .order_by('product_id', 'day')
+            .values_list('product_id', 'day', 'quantity')
+        )
+
+        with transaction.atomic():
+            StockSnapshot.objects.all().delete()
+
+            rows = []
+            created = 0
+            current_product = None
+            closing = 0
+
+            for product_id, day, quantity in daily.iterator(chunk_size=batch_size):
+                if product_id != current_product:
+                    current_product = product_id
+                    closing = 0
+
+                # Historical costs are not stored, so value uses today's cost price
+                closing += quantity
+                rows.append(StockSnapshot(
+                    product_id=product_id,
+                    date=day,
+                    quantity=closing,
+                    value=closing * cost_prices.get(product_id, 0),
+                ))
+
+                if len(rows) >= batch_size:
+                    StockSnapshot.objects.bulk_create(rows)
+                    created += len(rows)
+                    rows = []
+
+            StockSnapshot.objects.bulk_create(rows)
+            created += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} stock snapshots'))
@@ -0,0 +1,68 @@
+"""
+Compare every product's current_stock with its movement ledger.
+
+Discrepancies are written to stdout as CSV while they are found; the
+summary goes to stderr. Fast enough to run nightly:
+
+    python manage.py reconcile_stock > discrepancies.csv
+    python manage.py reconcile_stock --repair stock     # trust the ledger
+    python manage.py reconcile_stock --repair ledger    # trust current_stock, add 'reconciliation' movements
+    python manage.py reconcile_stock --as-of 2025-12-31T23:59:59   # stock of every product at that time
+"""
+
+import csv
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from inventory.reconciliation import repair_ledger, repair_stock, stock_as_of, stock_discrepancies
+
+
+def _parse_as_of(value):
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"--as-of {value!r} is not a date or datetime")
+        when = datetime.combine(day, time.max)
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+class Command(BaseCommand):
+    help = 'Find (and optionally repair) products whose current_stock differs from the movement ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', choices=['stock', 'ledger'], help='Fix current_stock from the ledger, or the ledger from current_stock')
+        parser.add_argument('--as-of', help='Instead, print the stock of every product at this date/datetime')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        writer = csv.writer(self.stdout, lineterminator='\n')
+
+        if options['as_of']:
+            if options['repair']:
+                raise CommandError('--as-of only reports, it cannot be combined with --repair')
+            writer.writerow(['product_id', 'sku', 'stock'])
+            for row in stock_as_of(_parse_as_of(options['as_of']), chunk_size=options['batch_size']):
+                writer.writerow(row)
+            return
+
+        writer.writerow(['product_id', 'sku', 'current_stock', 'ledger_stock', 'difference'])
+        discrepancies = []
+        for product_id, sku, current, ledger in stock_discrepancies(chunk_size=options['batch_size']):
+            writer.writerow([product_id, sku, current, ledger, current - ledger])
+            discrepancies.append((product_id, sku, current, ledger))
+
+        if not options['repair']:
+            self.stderr.write(f'Found {len(discrepancies)} products out of line with the ledger')
+        elif options['repair'] == 'stock':
+            repaired = repair_stock(discrepancies)
+            self.stderr.write(self.style.SUCCESS(f'Reset current_stock of {repaired} products from the ledger'))
+        else:
+            reference = f"RECONCILE-{timezone.localdate().isoformat()}"
+            repaired = repair_ledger(discrepancies, reference=reference)
+            self.stderr.write(self.style.SUCCESS(f'Recorded {repaired} reconciliation movements ({reference})'))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_snapshots_and_movement_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'current_stock'], name='inventory_p_is_acti_6787ef_idx'),
+        ),
+    ]
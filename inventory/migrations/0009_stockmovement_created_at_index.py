@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_at'], name='inventory_s_created_05ebf5_idx'),
+        ),
+    ]
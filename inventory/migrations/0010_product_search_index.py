@@ -0,0 +1,67 @@
+from django.db import migrations
+
+# Full-text index of inventory_product for core.search (the SQL is frozen here, so
+# later changes to core.search don't change what this migration did)
+CREATE = {
+    # FTS5 table over the columns, kept in sync by triggers, then filled from the table
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS inventory_product_search USING fts5("
+        "name, sku, description, content='inventory_product', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6')",
+
+        "CREATE TRIGGER IF NOT EXISTS inventory_product_search_insert AFTER INSERT ON inventory_product BEGIN "
+        "INSERT INTO inventory_product_search(rowid, name, sku, description) "
+        "VALUES (new.id, new.name, new.sku, new.description); END",
+
+        "CREATE TRIGGER IF NOT EXISTS inventory_product_search_delete AFTER DELETE ON inventory_product BEGIN "
+        "INSERT INTO inventory_product_search(inventory_product_search, rowid, name, sku, description) "
+        "VALUES ('delete', old.id, old.name, old.sku, old.description); END",
+
+        "CREATE TRIGGER IF NOT EXISTS inventory_product_search_update "
+        "AFTER UPDATE OF name, sku, description ON inventory_product BEGIN "
+        "INSERT INTO inventory_product_search(inventory_product_search, rowid, name, sku, description) "
+        "VALUES ('delete', old.id, old.name, old.sku, old.description); "
+        "INSERT INTO inventory_product_search(rowid, name, sku, description) "
+        "VALUES (new.id, new.name, new.sku, new.description); END",
+
+        "INSERT INTO inventory_product_search(inventory_product_search) VALUES ('rebuild')",
+    ],
+    # Trigram index on the columns joined together
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS inventory_product_search ON inventory_product USING gin (("
+        "coalesce(\"name\", '') || ' ' || coalesce(\"sku\", '') || ' ' || coalesce(\"description\", '')"
+        ") gin_trgm_ops)",
+    ],
+}
+
+DROP = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS inventory_product_search_insert",
+        "DROP TRIGGER IF EXISTS inventory_product_search_delete",
+        "DROP TRIGGER IF EXISTS inventory_product_search_update",
+        "DROP TABLE IF EXISTS inventory_product_search",
+    ],
+    'postgresql': [
+        "DROP INDEX IF EXISTS inventory_product_search",
+    ],
+}
+
+
+def run_for_vendor(statements):
+    # Other databases have no index: core.search falls back to icontains
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stockmovement_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_for_vendor(CREATE), run_for_vendor(DROP)),
+    ]
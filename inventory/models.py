@@ -1,4 +1,8 @@
+from datetime import datetime, time
+
 from django.db import models
+from django.db.models import Sum
+from django.utils import timezone
 
 # Category class to organize products
 class Category(models.Model):
@@ -34,6 +38,7 @@ class Product(models.Model):
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     selling_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     current_stock = models.IntegerField(default=0)
+    reserved_stock = models.IntegerField(default=0, editable=False) # Held for open orders, see inventory.reservations
     is_active = models.BooleanField(default=True) # True or False
     created_at = models.DateTimeField(auto_now_add=True) # Set on creation
     updated_at = models.DateTimeField(auto_now=True) # Update on every save
@@ -45,6 +50,9 @@ class Product(models.Model):
         verbose_name = 'Product'
         verbose_name_plural = "Products"
         ordering = ['name'] # Sort by name
+        indexes = [
+            models.Index(fields=['is_active', 'current_stock']), # Low stock lists on the dashboard
+        ]
 
     def profit_margin(self):
         if self.cost_price > 0:
@@ -58,11 +66,38 @@ class Product(models.Model):
     def total_stock_value(self):
         return self.current_stock * self.cost_price
     
+    def available_stock(self):
+        # Available to promise: on hand minus what is reserved for open orders
+        return self.current_stock - self.reserved_stock
+
     def is_low_stock(self, threshold=10):
         return self.current_stock < threshold
     
     def get_stock_movements(self):
-        return self.stock_movement_set.all()
+        return self.stockmovement_set.order_by('created_at')
+
+    def stock_as_of(self, when):
+        """
+        Stock according to the movement ledger at a given datetime.
+
+        Uses the closing quantity of the last daily snapshot before that day,
+        then only scans the movements of the day itself.
+        """
+        day = timezone.localdate(when)
+        previous = (
+            self.stock_snapshots.filter(date__lt=day)
+            .order_by('-date')
+            .values_list('quantity', flat=True)
+            .first()
+        ) or 0
+
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        same_day = self.stockmovement_set.filter(
+            created_at__gte=day_start,
+            created_at__lte=when,
+        ).aggregate(total=Sum('quantity'))['total'] or 0
+
+        return previous + same_day
 
 class StockMovement(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -74,4 +109,57 @@ class StockMovement(models.Model):
 
     def __str__(self):
         return f'{self.product.name} - {self.movement_type}'
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at']), # Per-product history / stock on date
+            models.Index(fields=['reference']), # All movements of one order
+            models.Index(fields=['created_at']), # Date range exports across all products
+        ]
+
+
+class StockSnapshot(models.Model):
+    """Closing stock of a product at the end of a day, kept up to date as movements are written"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    date = models.DateField()
+    quantity = models.IntegerField(default=0) # Closing quantity (sum of all movements up to this day)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0.00) # quantity * cost price at the time
+
+    def __str__(self):
+        return f'{self.product_id} @ {self.date}: {self.quantity}'
+
+    class Meta:
+        verbose_name = 'Stock Snapshot'
+        verbose_name_plural = 'Stock Snapshots'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_stock_snapshot_per_day'),
+        ]
+
+
+class StockReservation(models.Model):
+    """Stock held for an order (by reference, e.g. 'SO-001') until it is confirmed, released or expires"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),     # Counted in Product.reserved_stock
+        ('consumed', 'Consumed'), # Order confirmed, stock taken out
+        ('released', 'Released'), # Order cancelled
+        ('expired', 'Expired'),   # Removed by the sweeper (expire_reservations)
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    reference = models.CharField(max_length=100)
+    quantity = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    expires_at = models.DateTimeField(null=True, blank=True) # Empty = never expires
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.reference}: {self.product_id} x{self.quantity} ({self.status})'
+
+    class Meta:
+        verbose_name = 'Stock Reservation'
+        verbose_name_plural = 'Stock Reservations'
+        indexes = [
+            models.Index(fields=['reference', 'status']), # Reservations of one order
+            models.Index(fields=['status', 'expires_at']), # Sweeper
+        ]
@@ -0,0 +1,100 @@
+"""
+Stock reconciliation: Product.current_stock against the movement ledger
+
+The ledger (StockMovement) is the history of every change, so the stock
+of a product at any moment is the sum of its movements up to then. Both
+the comparison and the point-in-time reconstruction are one grouped
+aggregate over the ledger, streamed in product order.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.signals import stock_changed
+
+from .models import Product, StockMovement
+from .services import update_stock_snapshots
+
+BATCH_SIZE = 500 # Products per UPDATE statement
+
+
+def _with_ledger_stock(as_of=None):
+    movements = Q(stockmovement__created_at__lte=as_of) if as_of else None
+    # values() first, so the GROUP BY is only these columns
+    return Product.objects.values('pk', 'sku', 'current_stock').annotate(
+        ledger_stock=Coalesce(Sum('stockmovement__quantity', filter=movements), Value(0)),
+    ).order_by('pk')
+
+
+def stock_as_of(as_of, chunk_size=2000):
+    """Yield (product_id, sku, quantity) for every product, from the movements up to `as_of`"""
+    rows = _with_ledger_stock(as_of).values_list('pk', 'sku', 'ledger_stock')
+    yield from rows.iterator(chunk_size=chunk_size)
+
+
+def stock_discrepancies(chunk_size=2000):
+    """Yield (product_id, sku, current_stock, ledger_stock) for products whose stock doesn't match the ledger"""
+    rows = (
+        _with_ledger_stock()
+        .filter(~Q(current_stock=F('ledger_stock')))
+        .values_list('pk', 'sku', 'current_stock', 'ledger_stock')
+    )
+    yield from rows.iterator(chunk_size=chunk_size)
+
+
+def _difference_case(differences):
+    return Case(
+        *[When(pk=product_id, then=Value(difference)) for product_id, difference in differences.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _batches(discrepancies):
+    for start in range(0, len(discrepancies), BATCH_SIZE):
+        yield discrepancies[start:start + BATCH_SIZE]
+
+
+def repair_stock(discrepancies):
+    """
+    Set current_stock back to the ledger figure.
+
+    The difference is added (current_stock = current_stock + n) rather than
+    the value overwritten, so stock changes written since the discrepancies
+    were read (which move stock and ledger together) are kept.
+    """
+    repaired = 0
+    with transaction.atomic():
+        for batch in _batches(discrepancies):
+            differences = {product_id: ledger - current for product_id, sku, current, ledger in batch}
+            repaired += Product.objects.filter(pk__in=list(differences)).update(
+                current_stock=F('current_stock') + _difference_case(differences),
+                updated_at=timezone.now(),
+            )
+
+    stock_changed.send(sender=Product, product_ids=[row[0] for row in discrepancies])
+    return repaired
+
+
+def repair_ledger(discrepancies, reference='', batch_size=1000):
+    """
+    Record the differences as 'reconciliation' movements, so the ledger
+    matches current_stock (e.g. opening stock entered without a movement).
+    """
+    movements = [
+        StockMovement(
+            product_id=product_id,
+            movement_type='reconciliation',
+            quantity=current - ledger,
+            reference=reference,
+            notes=f'Ledger {ledger}, stock {current}',
+        )
+        for product_id, sku, current, ledger in discrepancies
+    ]
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+        update_stock_snapshots(movements, batch_size=batch_size)
+
+    stock_changed.send(sender=Product, product_ids=[movement.product_id for movement in movements])
+    return len(movements)
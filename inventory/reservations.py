@@ -0,0 +1,158 @@
+"""
+Stock reservations: stock promised to open orders
+
+Product.reserved_stock holds the total of active reservations, so
+available-to-promise is current_stock - reserved_stock, read straight
+from the product row. All the lines of an order are reserved with one
+conditional UPDATE per batch of products: either everything fits, or
+nothing is reserved.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from core.signals import stock_changed
+
+from .models import Product, StockReservation
+
+BATCH_SIZE = 500 # Products per UPDATE statement
+
+
+class ReservationFailed(Exception):
+    def __init__(self, failed):
+        super().__init__(f"Not enough available stock for {len(failed)} products")
+        self.failed = failed
+
+
+def _merge(lines):
+    wanted = defaultdict(int)
+    for product_id, quantity in lines:
+        wanted[product_id] += quantity
+    return wanted
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), BATCH_SIZE):
+        yield dict(items[start:start + BATCH_SIZE])
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def available_to_promise(product_ids=None, skus=None):
+    """{product_id: (sku, available)} for the given products, in one query"""
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    if skus is not None:
+        products = products.filter(sku__in=list(skus))
+    rows = products.annotate(available=F('current_stock') - F('reserved_stock')).values_list('pk', 'sku', 'available')
+    return {product_id: (sku, available) for product_id, sku, available in rows}
+
+
+def reserve(lines, reference, ttl=None):
+    """
+    Reserve stock for all `lines` ((product_id, quantity) pairs) of an order.
+
+    All or nothing: if any product doesn't have enough available stock,
+    nothing is reserved and ReservationFailed lists those products as
+    (product_id, requested, available). Active reservations already held
+    by `reference` are replaced (kept if the new ones fail). `ttl` is a
+    timedelta; by default STOCK_RESERVATION_TTL_MINUTES from the settings.
+    """
+    wanted = _merge(lines)
+    if not wanted:
+        return []
+
+    if ttl is None:
+        ttl = timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_TTL_MINUTES', 24 * 60))
+    expires_at = timezone.now() + ttl
+
+    try:
+        with transaction.atomic():
+            # Reserving an order again (e.g. from the admin) must not hold its stock twice
+            _finish(StockReservation.objects.filter(reference=reference), 'released')
+
+            now = timezone.now()
+            for quantities in _batches(wanted.items()):
+                quantity = _quantity_case(quantities)
+                updated = (
+                    Product.objects
+                    .filter(pk__in=list(quantities), current_stock__gte=F('reserved_stock') + quantity)
+                    .update(reserved_stock=F('reserved_stock') + quantity, updated_at=now)
+                )
+                if updated != len(quantities):
+                    raise ReservationFailed([])  # Rolls back every batch
+
+            reservations = StockReservation.objects.bulk_create([
+                StockReservation(product_id=product_id, reference=reference, quantity=quantity, expires_at=expires_at)
+                for product_id, quantity in wanted.items()
+            ])
+    except ReservationFailed:
+        available = available_to_promise(product_ids=wanted)
+        failed = [
+            (product_id, quantity, available.get(product_id, (None, 0))[1])
+            for product_id, quantity in wanted.items()
+            if available.get(product_id, (None, 0))[1] < quantity
+        ]
+        raise ReservationFailed(failed)
+
+    stock_changed.send(sender=Product, product_ids=list(wanted))
+    return reservations
+
+
+def _finish(reservations, status):
+    """Give the reserved quantities back and mark the reservations with `status`"""
+    with transaction.atomic():
+        rows = list(reservations.select_for_update().filter(status='active').values_list('id', 'product_id', 'quantity'))
+        if not rows:
+            return 0
+
+        held = _merge((product_id, quantity) for reservation_id, product_id, quantity in rows)
+        now = timezone.now()
+        for quantities in _batches(held.items()):
+            Product.objects.filter(pk__in=list(quantities)).update(
+                reserved_stock=F('reserved_stock') - _quantity_case(quantities),
+                updated_at=now, # Changes the product's ETag
+            )
+        StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(status=status)
+
+    stock_changed.send(sender=Product, product_ids=list(held))
+    return len(rows)
+
+
+def release(reference):
+    """Release the active reservations of an order (cancelled)"""
+    return _finish(StockReservation.objects.filter(reference=reference), 'released')
+
+
+def consume(reference):
+    """
+    Drop the active reservations of an order that is being confirmed; the
+    stock itself is then taken out by the stock ledger in the same transaction.
+    """
+    return _finish(StockReservation.objects.filter(reference=reference), 'consumed')
+
+
+def expire_stale(now=None, batch_size=1000):
+    """Expire active reservations past their expiry time. Returns how many were expired."""
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(status='active', expires_at__lt=now)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return expired
+        expired += _finish(StockReservation.objects.filter(id__in=ids), 'expired')
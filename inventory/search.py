@@ -0,0 +1,10 @@
+"""
+Search index of the products (see core.search): name, SKU and description,
+with SKU prefix matches first
+"""
+
+from core.search import SearchIndex
+from .models import Product
+
+# Same columns, in the same order, as migration 0010_product_search_index
+products = SearchIndex(Product, {'name': 10.0, 'sku': 5.0, 'description': 1.0}, prefix_field='sku')
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+from core.api import SparseFieldsSerializerMixin
+from .models import Product
+
+
+class ProductSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    category = serializers.CharField(source='category.name', default=None, read_only=True)
+
+    class Meta:
+        model = Product
+        fields = (
+            'id', 'sku', 'name', 'description', 'category',
+            'cost_price', 'selling_price', 'current_stock', 'reserved_stock', 'is_active',
+            'created_at', 'updated_at',
+        )
@@ -0,0 +1,110 @@
+"""
+Services for Inventory app
+Stock ledger: the one place where current_stock is changed
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+from django.utils import timezone
+
+from core.signals import stock_changed
+
+from .models import Product, StockMovement, StockSnapshot
+
+
+def adjust_stock(lines, movement_type, reference='', notes='', batch_size=1000):
+    """
+    Apply stock changes and record them as StockMovement rows.
+
+    `lines` is an iterable of (product_id, quantity) pairs; a negative
+    quantity takes stock out. Every change is a single atomic UPDATE
+    (current_stock = current_stock + n), and removals only go through when
+    there is enough unreserved stock (WHERE current_stock >= reserved_stock + n),
+    so concurrent confirmations can't lose updates, oversell, or take
+    stock reserved for another order.
+
+    Lines without enough stock are skipped and returned to the caller as
+    a list of (product_id, quantity) pairs. Stock updates and movements
+    for the other lines are written in the same transaction.
+    """
+    failed = []
+    movements = []
+
+    with transaction.atomic():
+        now = timezone.now()
+
+        for product_id, quantity in lines:
+            products = Product.objects.filter(pk=product_id)
+            if quantity < 0:
+                products = products.filter(current_stock__gte=F('reserved_stock') - quantity)
+
+            updated = products.update(current_stock=F('current_stock') + quantity, updated_at=now)
+            if not updated:
+                failed.append((product_id, quantity))
+                continue
+
+            movements.append(StockMovement(
+                product_id=product_id,
+                movement_type=movement_type,
+                quantity=quantity,
+                reference=reference,
+                notes=notes,
+            ))
+
+        StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+        update_stock_snapshots(movements, batch_size=batch_size)
+
+    stock_changed.send(sender=Product, product_ids=[movement.product_id for movement in movements])
+    return failed
+
+
+def update_stock_snapshots(movements, batch_size=1000):
+    """
+    Roll newly written movements into the daily StockSnapshot rows.
+
+    Existing snapshots for the day are incremented in the database; missing
+    ones start from the product's previous closing quantity. Call this in the
+    same transaction that changed the stock, so the product row locks keep
+    concurrent writers for the same product apart.
+    """
+    deltas = defaultdict(int)  # (product_id, day) -> quantity
+    for movement in movements:
+        deltas[(movement.product_id, timezone.localdate(movement.created_at))] += movement.quantity
+    if not deltas:
+        return
+
+    by_day = defaultdict(dict)
+    for (product_id, day), quantity in deltas.items():
+        by_day[day][product_id] = quantity
+
+    with transaction.atomic():
+        for day, changes in by_day.items():
+            existing = {
+                snapshot.product_id: snapshot
+                for snapshot in StockSnapshot.objects.filter(date=day, product_id__in=list(changes)).only('id', 'product_id')
+            }
+
+            # Previous closing quantity and current cost for the products without a row yet
+            previous = StockSnapshot.objects.filter(product=OuterRef('pk'), date__lt=day).order_by('-date')
+            products = Product.objects.filter(pk__in=list(changes)).annotate(
+                previous_quantity=Subquery(previous.values('quantity')[:1]),
+            ).values_list('pk', 'cost_price', 'previous_quantity')
+
+            new_rows = []
+            for product_id, cost_price, previous_quantity in products:
+                quantity = changes[product_id]
+                if product_id in existing:
+                    snapshot = existing[product_id]
+                    snapshot.quantity = F('quantity') + quantity
+                    snapshot.value = ExpressionWrapper(
+                        (F('quantity') + quantity) * cost_price,
+                        output_field=DecimalField(max_digits=14, decimal_places=2),
+                    )
+                else:
+                    closing = (previous_quantity or 0) + quantity
+                    new_rows.append(StockSnapshot(product_id=product_id, date=day, quantity=closing, value=closing * cost_price))
+
+            StockSnapshot.objects.bulk_update(existing.values(), ['quantity', 'value'], batch_size=batch_size)
+            StockSnapshot.objects.bulk_create(new_rows, batch_size=batch_size)
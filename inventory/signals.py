@@ -0,0 +1,27 @@
+"""
+SIGNALS for Inventory app
+Keep the daily stock snapshots in step with single StockMovement writes
+(bulk writes go through inventory.services, which updates them directly),
+and the product cache in step with product changes
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.signals import stock_changed
+from . import cache
+from .models import Product, StockMovement
+from .services import update_stock_snapshots
+
+@receiver(post_save, sender=StockMovement)
+def update_snapshot_on_movement(sender, instance, created, **kwargs):
+    if created:
+        update_stock_snapshots([instance])
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_cached_product(sender, instance, **kwargs):
+    cache.invalidate([instance.pk])
+
+@receiver(stock_changed)
+def invalidate_cached_products_on_stock_change(sender, product_ids, **kwargs):
+    cache.invalidate(product_ids)
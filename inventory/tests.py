@@ -1,3 +1,470 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomerUser
+from core.search import restore_triggers
+from core.signals import stock_changed
+from core.testing import QueryPlanTestMixin
+from . import cache as product_cache, reservations
+from .importers import import_products
+from .search import products as product_search
+from .models import Category, Product, StockMovement, StockReservation, StockSnapshot
+from .services import adjust_stock, update_stock_snapshots
+
+# Session, user, count, page of rows, category filter
+PRODUCT_CHANGELIST_QUERY_BUDGET = 6
+
+
+class ProductAdminQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        categories = Category.objects.bulk_create([
+            Category(name=f'Category {i}', slug=f'category-{i}') for i in range(5)
+        ])
+        Product.objects.bulk_create([
+            Product(sku=f'SKU-{i:04d}', name=f'Product {i}', category=categories[i % 5], current_stock=i)
+            for i in range(150)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_changelist_stays_within_query_budget(self):
+        url = reverse('admin:inventory_product_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), PRODUCT_CHANGELIST_QUERY_BUDGET, [q['sql'] for q in queries])
+
+    def test_filtered_changelist_stays_within_query_budget(self):
+        url = reverse('admin:inventory_product_changelist')
+        category = Category.objects.first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'category__id__exact': category.id, 'q': 'Product'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), PRODUCT_CHANGELIST_QUERY_BUDGET, [q['sql'] for q in queries])
+
+
+class StockMovementQueryPlanTest(QueryPlanTestMixin, TestCase):
+    """Ledger lookups must stay on an index as the movement table grows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create([
+            Product(sku=f'SKU-{i:04d}', name=f'Product {i}') for i in range(20)
+        ])
+        StockMovement.objects.bulk_create([
+            StockMovement(product=products[i % 20], movement_type='sale', quantity=-1, reference=f'SO-{i // 3:03d}')
+            for i in range(500)
+        ])
+        cls.product = products[0]
+        cls.now = timezone.now()
+
+    def test_product_history(self):
+        queryset = StockMovement.objects.filter(product=self.product).order_by('created_at')
+        self.assertNoFullScan(queryset)
+        self.assertNoSort(queryset)
+
+    def test_movements_of_reference(self):
+        self.assertNoFullScan(StockMovement.objects.filter(reference='SO-001'))
+
+    def test_date_range_export(self):
+        queryset = StockMovement.objects.filter(created_at__gte=self.now - timedelta(days=30), created_at__lt=self.now)
+        self.assertNoFullScan(queryset.order_by('created_at'))
+
+    def test_active_reservations_of_reference(self):
+        self.assertNoFullScan(StockReservation.objects.filter(reference='SO-001', status='active'))
+
+    def test_product_by_sku(self):
+        self.assertNoFullScan(Product.objects.filter(sku='SKU-0001'))
+
+
+class AdjustStockTest(TestCase):
+    def setUp(self):
+        self.bolts = Product.objects.create(sku='BOLT', name='Bolt', current_stock=10, reserved_stock=4)
+        self.nuts = Product.objects.create(sku='NUT', name='Nut', current_stock=3)
+
+    def stock(self):
+        return list(Product.objects.filter(pk__in=[self.bolts.pk, self.nuts.pk]).order_by('pk').values_list('current_stock', flat=True))
+
+    def test_lines_without_enough_stock_are_returned(self):
+        failed = adjust_stock([(self.bolts.pk, -2), (self.nuts.pk, -5), (self.nuts.pk, 1)], movement_type='sale', reference='SO-1')
+
+        self.assertEqual(failed, [(self.nuts.pk, -5)])
+        self.assertEqual(self.stock(), [8, 4])
+        # Only the applied lines are in the ledger
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(reference='SO-1').values_list('product_id', 'quantity')),
+            [(self.bolts.pk, -2), (self.nuts.pk, 1)],
+        )
+
+    def test_reserved_stock_cannot_be_taken(self):
+        # 10 in stock but 4 reserved: 6 can go, 7 can't
+        self.assertEqual(adjust_stock([(self.bolts.pk, -7)], movement_type='sale'), [(self.bolts.pk, -7)])
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual(adjust_stock([(self.bolts.pk, -6)], movement_type='sale'), [])
+        self.assertEqual(self.stock(), [4, 3])
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        product_cache.clear()
+        self.bolts = Product.objects.create(sku='BOLT', name='Bolt', current_stock=5)
+        self.nuts = Product.objects.create(sku='NUT', name='Nut', current_stock=1)
+
+    def reserved(self):
+        return list(Product.objects.filter(pk__in=[self.bolts.pk, self.nuts.pk]).order_by('pk').values_list('reserved_stock', flat=True))
+
+    def test_all_or_nothing(self):
+        with self.assertRaises(reservations.ReservationFailed) as failure:
+            reservations.reserve([(self.bolts.pk, 3), (self.nuts.pk, 2)], reference='SO-1')
+
+        self.assertEqual(failure.exception.failed, [(self.nuts.pk, 2, 1)])
+        self.assertEqual(self.reserved(), [0, 0])
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_reserving_again_replaces(self):
+        reservations.reserve([(self.bolts.pk, 3)], reference='SO-1')
+        reservations.reserve([(self.bolts.pk, 2), (self.bolts.pk, 2), (self.nuts.pk, 1)], reference='SO-1')
+        self.assertEqual(self.reserved(), [4, 1])
+        self.assertEqual(StockReservation.objects.filter(reference='SO-1', status='active').count(), 2)
+
+        # A failed new reservation keeps the old ones
+        with self.assertRaises(reservations.ReservationFailed):
+            reservations.reserve([(self.bolts.pk, 6)], reference='SO-1')
+        self.assertEqual(self.reserved(), [4, 1])
+
+    def test_release_and_touch_updated_at(self):
+        before = self.bolts.updated_at
+        reservations.reserve([(self.bolts.pk, 3), (self.nuts.pk, 1)], reference='SO-1')
+        self.assertGreater(Product.objects.get(pk=self.bolts.pk).updated_at, before)
+
+        self.assertEqual(reservations.release('SO-1'), 2)
+        self.assertEqual(reservations.release('SO-1'), 0)
+        self.assertEqual(self.reserved(), [0, 0])
+        self.assertEqual(set(StockReservation.objects.values_list('status', flat=True)), {'released'})
+
+    def test_expire_stale(self):
+        reservations.reserve([(self.bolts.pk, 3)], reference='SO-1', ttl=timedelta(minutes=-1))
+        reservations.reserve([(self.nuts.pk, 1)], reference='SO-2')
+
+        self.assertEqual(reservations.expire_stale(), 1)
+        self.assertEqual(self.reserved(), [0, 1])
+        self.assertEqual(StockReservation.objects.get(reference='SO-1').status, 'expired')
+
+    def test_available_to_promise_api(self):
+        reservations.reserve([(self.bolts.pk, 3)], reference='SO-1')
+        self.client.force_login(CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        response = self.client.get('/api/v1/atp/', {'sku': 'BOLT,NUT'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'product': self.bolts.pk, 'sku': 'BOLT', 'available': 2},
+            {'product': self.nuts.pk, 'sku': 'NUT', 'available': 1},
+        ])
+        self.assertEqual(self.client.get('/api/v1/atp/', {'product': f'{self.nuts.pk}'}).json()['results'][0]['available'], 1)
+        self.assertEqual(self.client.get('/api/v1/atp/', {'product': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/atp/').status_code, 400)
+
+
+class ReconcileStockCommandTest(TestCase):
+    def setUp(self):
+        self.in_line = Product.objects.create(sku='SKU-A', name='In line')
+        self.drifted = Product.objects.create(sku='SKU-B', name='Drifted')
+        adjust_stock([(self.in_line.pk, 10), (self.drifted.pk, 10)], movement_type='purchase')
+        # Changed behind the ledger's back
+        Product.objects.filter(pk=self.drifted.pk).update(current_stock=25)
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_stock', *args, stdout=out, stderr=StringIO())
+        return out.getvalue().splitlines()
+
+    def test_reports_discrepancies_as_csv(self):
+        self.assertEqual(self.reconcile(), [
+            'product_id,sku,current_stock,ledger_stock,difference',
+            f'{self.drifted.pk},SKU-B,25,10,15',
+        ])
+
+    def test_repair_stock_from_ledger(self):
+        self.reconcile('--repair', 'stock')
+        self.drifted.refresh_from_db()
+        self.assertEqual(self.drifted.current_stock, 10)
+        self.assertEqual(len(self.reconcile()), 1)
+
+    def test_repair_ledger_from_stock(self):
+        self.reconcile('--repair', 'ledger')
+        movement = StockMovement.objects.get(product=self.drifted, movement_type='reconciliation')
+        self.assertEqual(movement.quantity, 15)
+        self.assertEqual(self.drifted.stock_as_of(timezone.now()), 25)
+        self.assertEqual(len(self.reconcile()), 1)
+
+    def test_stock_as_of(self):
+        adjust_stock([(self.in_line.pk, -4)], movement_type='sale')
+        before = StockMovement.objects.filter(movement_type='purchase').latest('created_at').created_at
+        self.assertIn(f'{self.in_line.pk},SKU-A,10', self.reconcile('--as-of', before.isoformat()))
+        self.assertIn(f'{self.in_line.pk},SKU-A,6', self.reconcile('--as-of', timezone.now().isoformat()))
+
+
+class StockSnapshotTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(sku='SKU-S', name='Snapshot', cost_price=Decimal('2.00'))
+        self.today = timezone.localdate()
+
+    def move(self, quantity, days_ago=0):
+        # bulk_create sends no post_save, so the snapshot is only updated by the call below
+        movement = StockMovement(product=self.product, movement_type='adjustment', quantity=quantity)
+        StockMovement.objects.bulk_create([movement])
+        if days_ago:
+            movement.created_at -= timedelta(days=days_ago)
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=movement.created_at)
+        update_stock_snapshots([movement])
+
+    def snapshots(self):
+        return {
+            (self.today - day).days: (quantity, value)
+            for day, quantity, value in StockSnapshot.objects.filter(product=self.product).values_list('date', 'quantity', 'value')
+        }
+
+    def test_existing_snapshot_is_incremented(self):
+        self.move(10)
+        self.move(-3)
+        self.assertEqual(self.snapshots(), {0: (7, Decimal('14.00'))})
+
+    def test_new_day_starts_from_the_previous_close(self):
+        self.move(10, days_ago=3)
+        self.move(5, days_ago=1)
+        self.move(-2)
+        self.assertEqual(self.snapshots(), {
+            3: (10, Decimal('20.00')),
+            1: (15, Decimal('30.00')),
+            0: (13, Decimal('26.00')),
+        })
+
+    def test_stock_as_of(self):
+        self.move(10, days_ago=3)
+        self.move(5, days_ago=1)
+        self.move(-2)
+        now = timezone.now()
+
+        # Last snapshot before the day, plus that day's movements
+        with self.assertNumQueries(2):
+            self.assertEqual(self.product.stock_as_of(now), 13)
+        self.assertEqual(self.product.stock_as_of(now - timedelta(days=1)), 15)
+        self.assertEqual(self.product.stock_as_of(now - timedelta(days=2)), 10)
+        self.assertEqual(self.product.stock_as_of(now - timedelta(days=5)), 0)
+
+
+class ProductCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = Product.objects.bulk_create([
+            Product(sku=f'CACHE-{i}', name=f'Cached {i}', selling_price=Decimal('10.00')) for i in range(3)
+        ])
+
+    def setUp(self):
+        product_cache.clear()
+        self.ids = [product.pk for product in self.products]
+
+    def test_get_many_reads_the_database_once(self):
+        with self.assertNumQueries(1):
+            by_id, by_sku = product_cache.get_many(ids=self.ids, skus=['CACHE-0', 'MISSING'])
+        self.assertEqual(sorted(by_id), sorted(self.ids))
+        self.assertEqual(list(by_sku), ['CACHE-0'])
+
+        with self.assertNumQueries(0):
+            by_id, by_sku = product_cache.get_many(ids=self.ids, skus=['CACHE-1', 'CACHE-2'])
+        self.assertEqual(by_sku['CACHE-1'].pk, self.ids[1])
+
+    def test_returns_copies(self):
+        product_cache.get_product(self.ids[0]).name = 'Changed'
+        self.assertEqual(product_cache.get_product(self.ids[0]).name, 'Cached 0')
+
+    def test_save_invalidates(self):
+        product_cache.get_many(ids=self.ids)
+        product = Product.objects.get(pk=self.ids[0])
+        product.selling_price = Decimal('12.50')
+        product.sku = 'CACHE-NEW'
+        product.save()
+
+        self.assertEqual(product_cache.get_product(self.ids[0]).selling_price, Decimal('12.50'))
+        self.assertIsNone(product_cache.get_product_by_sku('CACHE-0'))
+        self.assertEqual(product_cache.get_product_by_sku('CACHE-NEW').pk, self.ids[0])
+
+    def test_bulk_stock_change_invalidates(self):
+        product_cache.get_many(ids=self.ids)
+        Product.objects.filter(pk=self.ids[1]).update(current_stock=7)
+        stock_changed.send(sender=Product, product_ids=[self.ids[1]])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(product_cache.get_product(self.ids[1]).current_stock, 7)
+
+    @override_settings(PRODUCT_CACHE_SHARED='default')
+    def test_shared_cache_fills_other_processes(self):
+        product_cache.get_many(ids=self.ids)
+        product_cache.clear() # As if this were another process
+        with self.assertNumQueries(0):
+            self.assertEqual(product_cache.get_product_by_sku('CACHE-2').pk, self.ids[2])
+
+    def test_lru_evicts_oldest_and_expires(self):
+        lru = product_cache.LRUCache(size=2, timeout=60)
+        lru.set_many({'a': 1, 'b': 2})
+        lru.get_many(['a'])
+        lru.set_many({'c': 3})
+        self.assertEqual(lru.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+        lru.timeout = 0
+        lru.set_many({'d': 4})
+        time.sleep(0.001)
+        self.assertEqual(lru.get_many(['d']), {})
+
+
+class ProductSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.drill = Product.objects.create(sku='DR-100', name='Cordless Drill', description='18V with two batteries')
+        cls.bits = Product.objects.create(sku='BIT-200', name='Drill bit set', description='For the cordless drill')
+        Product.objects.bulk_create([
+            Product(sku=f'SCR-{i:03d}', name=f'Screw {i}', description='Wood screw') for i in range(20)
+        ])
+
+    def search(self, query, limit=20):
+        return list(product_search.search(query, limit).values_list('sku', flat=True))
+
+    def test_ranks_name_matches_first(self):
+        self.assertEqual(self.search('cordless'), ['DR-100', 'BIT-200'])
+        self.assertEqual(self.search('cordless dri'), ['DR-100', 'BIT-200']) # The last word as a prefix
+        self.assertEqual(self.search('cordl drill'), [])
+        self.assertEqual(self.search('drill set'), ['BIT-200'])
+
+    def test_name_matches_found_among_many(self):
+        # More description matches than are ranked, all before the one named after the word
+        Product.objects.bulk_create([
+            Product(sku=f'ACC-{i:03d}', name=f'Accessory {i}', description='Fits any drill') for i in range(300)
+        ])
+        impact = Product.objects.create(sku='IMP-1', name='Impact Drill')
+        ids = product_search.text_ids('drill', 5)
+        self.assertEqual(set(ids[:3]), {self.drill.pk, self.bits.pk, impact.pk})
+
+    def test_sku_prefix_comes_first(self):
+        self.assertEqual(self.search('scr-01', limit=3), ['SCR-010', 'SCR-011', 'SCR-012'])
+        self.assertEqual(self.search('BIT')[0], 'BIT-200')
+
+    def test_index_follows_writes(self):
+        self.drill.name = 'Hammer drill'
+        self.drill.save()
+        Product.objects.filter(pk=self.bits.pk).update(name='Bit set', description='')
+        Product.objects.filter(sku='SCR-000').delete()
+
+        self.assertEqual(self.search('hammer'), ['DR-100'])
+        self.assertEqual(self.search('drill'), ['DR-100'])
+        self.assertEqual(self.search('screw', limit=50), [f'SCR-{i:03d}' for i in range(1, 20)])
+
+    def test_triggers_restored_after_table_rebuild(self):
+        # Django drops the triggers when it rebuilds the table to alter it
+        with connection.cursor() as cursor:
+            for name in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER inventory_product_search_{name}')
+        Product.objects.create(sku='CS-1', name='Circular saw')
+        self.assertEqual(self.search('saw'), [])
+
+        restore_triggers(sender=None)
+        self.assertEqual(self.search('saw'), ['CS-1'])
+        Product.objects.create(sku='JS-1', name='Jig saw')
+        self.assertEqual(sorted(self.search('saw')), ['CS-1', 'JS-1'])
+
+    def test_admin_search_and_typeahead(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:inventory_product_changelist'), {'q': 'cordless'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+        response = self.client.get('/api/v1/products/search/', {'q': 'dr-1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['sku'] for row in response.json()['results']], ['DR-100'])
+
+    def test_malformed_ids_are_client_errors(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/v1/products/abc/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/products/', {'category': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/products/search/', {'q': 'drill', 'category': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/v1/products/{self.drill.pk}/').status_code, 200)
+
+    def test_typeahead_filters_before_limit(self):
+        # The inactive products sort (and match) first, the filter must not leave the page empty
+        Product.objects.bulk_create(
+            [Product(sku=f'HAM-{i:02d}', name=f'Hammer {i}', is_active=False) for i in range(10)]
+            + [Product(sku=f'HAM-{i:02d}', name=f'Hammer {i}') for i in range(10, 20)]
+        )
+        self.client.force_login(self.user)
+        for query in ('HAM', 'hammer'):
+            response = self.client.get('/api/v1/products/search/', {'q': query, 'is_active': 'true', 'limit': 5})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 5)
+            self.assertTrue(all(row['sku'] >= 'HAM-10' for row in response.json()['results']))
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        Product.objects.create(sku='A-1', name='Anvil', cost_price=4, selling_price=9, current_stock=7)
+
+    def test_updates_only_the_columns_each_row_has(self):
+        report = import_products([
+            {'sku': '', 'name': 'No SKU'}, # An error row first must not decide the columns
+            {'sku': 'A-1', 'name': 'Anvil', 'selling_price': '12'},
+            {'sku': 'B-1', 'name': 'Bolt', 'current_stock': '3'},
+        ])
+
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual([error[0] for error in report['errors']], [1])
+        anvil = Product.objects.get(sku='A-1')
+        self.assertEqual((anvil.cost_price, anvil.selling_price, anvil.current_stock), (Decimal('4.00'), Decimal('12.00'), 7))
+        self.assertEqual(Product.objects.get(sku='B-1').current_stock, 3)
+
+    def test_bad_prices_are_row_errors(self):
+        report = import_products([
+            {'sku': 'N-1', 'name': 'Nan', 'cost_price': 'NaN'},
+            {'sku': 'N-2', 'name': 'Infinite', 'selling_price': 'Infinity'},
+            {'sku': 'N-3', 'name': 'Too big', 'cost_price': '123456789012'},
+            {'sku': 'N-4', 'name': 'Rounds up', 'selling_price': '99999999.999'},
+            {'sku': 'N-5', 'name': 'Largest', 'selling_price': '99999999.99'},
+        ])
+
+        self.assertEqual([error[0] for error in report['errors']], [1, 2, 3, 4])
+        self.assertEqual(Product.objects.get(sku='N-5').selling_price, Decimal('99999999.99'))
+
+    def test_stock_levels_go_through_the_ledger(self):
+        import_products([{'sku': 'A-1', 'name': 'Anvil', 'current_stock': '10'}, {'sku': 'C-1', 'name': 'Chisel', 'current_stock': '4'}])
+        import_products([{'sku': 'A-1', 'name': 'Anvil', 'current_stock': '10'}]) # Unchanged: no movement
+
+        # A-1 had 7 before: only the difference is recorded
+        movements = StockMovement.objects.filter(reference='IMPORT').order_by('product__sku')
+        self.assertEqual(list(movements.values_list('product__sku', 'movement_type', 'quantity')), [
+            ('A-1', 'adjustment', 3), ('C-1', 'adjustment', 4),
+        ])
+        self.assertEqual(Product.objects.get(sku='C-1').current_stock, 4)
+
+    def test_category_with_an_existing_slug(self):
+        tools = Category.objects.create(name='Power Tools')
+        report = import_products([{'sku': 'D-1', 'name': 'Drill', 'category': 'power tools'}])
+
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(Product.objects.get(sku='D-1').category, tools)
+
+    def test_rejects_chunk_size_below_one(self):
+        with self.assertRaises(ValueError):
+            import_products([], chunk_size=0)
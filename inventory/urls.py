@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'inventory'
+
+urlpatterns = [
+    path('products/import/', views.import_products_view, name='import_products'),
+]
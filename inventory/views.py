@@ -1,3 +1,41 @@
-from django.shortcuts import render
+import io
 
-# Create your views here.
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+
+from .importers import import_products, read_csv, read_jsonl
+
+
+@staff_member_required
+@require_POST
+def import_products_view(request):
+    """
+    Upload a catalog file as `file` (CSV or .jsonl) and upsert it on SKU.
+    Responds with the import report as JSON.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': "No file uploaded (expected field 'file')"}, status=400)
+
+    is_jsonl = request.POST.get('format') == 'jsonl' or upload.name.endswith(('.jsonl', '.ndjson'))
+    reader = read_jsonl if is_jsonl else read_csv
+
+    try:
+        chunk_size = int(request.POST.get('chunk_size', 1000))
+    except ValueError:
+        return JsonResponse({'error': 'chunk_size must be a number'}, status=400)
+    if chunk_size < 1:
+        return JsonResponse({'error': 'chunk_size must be at least 1'}, status=400)
+
+    text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        report = import_products(reader(text), chunk_size=chunk_size)
+    except UnicodeDecodeError as error:
+        return JsonResponse({'error': f'Could not read file: {error}'}, status=400)
+
+    report['errors'] = [
+        {'row': row_number, 'sku': sku, 'message': message}
+        for row_number, sku, message in report['errors']
+    ]
+    return JsonResponse(report)
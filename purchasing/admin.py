@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.admin import LargeTableAdminMixin
 from .models import Supplier, PurchaseOrder, PurchaseOrderItem
 
 @admin.register(Supplier)
@@ -35,14 +36,24 @@ class PurchaseOrderItemInline(admin.TabularInline):
     extra = 1
     fields = ('product', 'quantity', 'unit_cost', 'subtotal')
     readonly_fields = ('subtotal',)
+    autocomplete_fields = ('product',) # Search box instead of a <select> with every product
+
+    def get_queryset(self, request):
+        # Each row's title shows the product name
+        return super().get_queryset(request).select_related('product')
 
 @admin.register(PurchaseOrder)
-class PurchaseOrderAdmin(admin.ModelAdmin):
+class PurchaseOrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin for Purchase Orders"""
     
     list_display = ('order_number', 'supplier', 'order_date', 'status', 'total_amount')
     search_fields = ('order_number', 'supplier__name')
     list_filter = ('status', 'order_date')
+
+    # Load the supplier in the same query, and only the columns shown in the list
+    list_select_related = ('supplier',)
+    list_only_fields = ('order_number', 'supplier', 'supplier__name', 'order_date', 'status', 'total_amount')
+    autocomplete_fields = ('supplier',)
     
     readonly_fields = ('order_number', 'subtotal', 'total_amount', 'created_at', 'updated_at','created_by', 'order_date')
     
@@ -0,0 +1,30 @@
+from django.db.models import Prefetch
+from rest_framework import viewsets
+
+from core.api import ConditionalGetMixin, IdCursorPagination, id_param, requested_fields
+from .models import PurchaseOrder, PurchaseOrderItem
+from .serializers import PurchaseOrderSerializer
+
+
+class PurchaseOrderViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Purchase orders with their items, newest first. Filter with ?supplier=<id>, ?status="""
+    serializer_class = PurchaseOrderSerializer
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        orders = PurchaseOrder.objects.select_related('supplier')
+        params = self.request.query_params
+
+        supplier_id = id_param(self.request, 'supplier')
+        if supplier_id is not None:
+            orders = orders.filter(supplier_id=supplier_id)
+        if params.get('status'):
+            orders = orders.filter(status=params['status'])
+
+        # Items (and their SKUs) in one extra query per page, and only when asked for
+        fields = requested_fields(self.request)
+        if fields is None or 'items' in fields:
+            orders = orders.prefetch_related(
+                Prefetch('items', queryset=PurchaseOrderItem.objects.select_related('product').order_by('id'))
+            )
+        return orders
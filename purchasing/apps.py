@@ -7,4 +7,5 @@ class PurchasingConfig(AppConfig):
     
     def ready(self):
         """Import signals when app is ready"""
-        import purchasing.signals  # Connect our signals
\ No newline at end of file
+        import purchasing.signals  # Connect our signals
+        import purchasing.services  # Register the background job handlers
@@ -0,0 +1,52 @@
+"""
+Suggest purchases from recent demand and supplier lead times.
+
+The plan is written to stdout as CSV and a summary to stderr; with
+--create it is also saved as draft purchase orders, one per supplier,
+for purchasing to review and send:
+
+    python manage.py replenish > plan.csv
+    python manage.py replenish --service-level 0.98 --review-days 30 --create
+"""
+
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from purchasing.replenishment import (
+    HISTORY_DAYS, PLAN_COLUMNS, REVIEW_DAYS, SERVICE_LEVEL, create_purchase_orders, plan_replenishment,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compute reorder points from sales history and lead times, and optionally create draft purchase orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=HISTORY_DAYS, help='Days of sales used for the demand rate')
+        parser.add_argument('--service-level', type=float, default=SERVICE_LEVEL, help='Target chance of not running out, e.g. 0.95')
+        parser.add_argument('--review-days', type=int, default=REVIEW_DAYS, help='Days of demand each order covers beyond the lead time')
+        parser.add_argument('--create', action='store_true', help='Create draft purchase orders from the plan')
+
+    def handle(self, *args, **options):
+        if options['history_days'] < 1:
+            raise CommandError('--history-days must be at least 1')
+        try:
+            plan = plan_replenishment(
+                history_days=options['history_days'],
+                service_level=options['service_level'],
+                review_days=options['review_days'],
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        writer = csv.writer(self.stdout, lineterminator='\n')
+        writer.writerow(PLAN_COLUMNS)
+        writer.writerows(plan.round(3).itertuples(index=False))
+
+        suppliers = plan['supplier_id'].nunique()
+        if not options['create']:
+            self.stderr.write(f'{len(plan)} products to reorder from {suppliers} suppliers')
+            return
+
+        orders = create_purchase_orders(plan)
+        self.stderr.write(self.style.SUCCESS(f'Created {len(orders)} draft purchase orders for {len(plan)} products'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchasing', '0003_purchase_order_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='status_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import Sum
+from django.utils import timezone
 from django.core.validators import MinValueValidator, EmailValidator
 from decimal import Decimal
+from core.models import TrackedFieldsModel
+from core.sequences import next_value, next_values
 # Create your models here.
 
 class Supplier(models.Model):
@@ -44,7 +48,7 @@ class Supplier(models.Model):
         ordering = ['name']
 
 
-class PurchaseOrder(models.Model):
+class PurchaseOrder(TrackedFieldsModel):
     STATUS_CHOICES = [
         ('draft', 'Draft'),          # Just created
         ('sent', 'Sent to Supplier'), # Emailed/faxed to supplier
@@ -52,6 +56,9 @@ class PurchaseOrder(models.Model):
         ('received', 'Received'),     # Goods received
         ('cancelled', 'Cancelled'),   # Order cancelled
     ]
+    NUMBER_SEQUENCE = 'purchase_order' # Name of the core.Sequence row used for PO numbers
+    PLACED_STATUSES = ('sent', 'confirmed', 'received') # Count as purchases in reports
+    OPEN_STATUSES = ('draft', 'sent', 'confirmed') # Ordered (or about to be) but not received: stock on order
     
 
     order_number = models.CharField( max_length=20,  unique=True, editable=False, verbose_name="PO Number")
@@ -71,43 +78,52 @@ class PurchaseOrder(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
    
     def __str__(self):
-        return f"PO-{self.order_number} - {self.supplier.name}"
+        return f"{self.order_number} - {self.supplier.name}"
     
     def save(self, *args, **kwargs):
         
         if not self.order_number:
-            last_po = PurchaseOrder.objects.order_by('id').last()
-            
-            if last_po:
-                try:
-                    last_num = int(last_po.order_number.split('-')[1])
-                    new_num = last_num + 1
-                except:
-                    new_num = 1
-            else:
-                new_num = 1
-            
-            self.order_number = f"PO-{new_num:03d}"
+            self.order_number = self.format_order_number(next_value(self.NUMBER_SEQUENCE))
         
         # Auto-set expected delivery if not set
         if not self.expected_delivery and self.supplier:
-            from django.utils import timezone
             from datetime import timedelta
             self.expected_delivery = timezone.now().date() + timedelta(days=self.supplier.lead_time_days)
         
         super().save(*args, **kwargs)
     
+    @classmethod
+    def format_order_number(cls, number):
+        return f"PO-{number:03d}"
+
+    @classmethod
+    def allocate_order_numbers(cls, count):
+        """Reserve `count` PO numbers at once (for bulk creation)"""
+        return [cls.format_order_number(number) for number in next_values(cls.NUMBER_SEQUENCE, count)]
+
     def calculate_totals(self):
-        
-        items = self.items.all()
-        self.subtotal = sum(item.subtotal for item in items)
-        self.total_amount = self.subtotal + self.tax_amount + self.shipping_cost
-        self.save()
+        # Sum the lines in the database and write only the total columns,
+        # so the header save signals don't run again for every line
+        self.subtotal = self.items.aggregate(total=Sum('subtotal'))['total'] or Decimal('0.00')
+        self.total_amount = self.subtotal + Decimal(str(self.tax_amount)) + Decimal(str(self.shipping_cost))
+        self.updated_at = timezone.now()
+
+        PurchaseOrder.objects.filter(pk=self.pk).update(
+            subtotal=self.subtotal,
+            total_amount=self.total_amount,
+            updated_at=self.updated_at,
+        )
     
     class Meta:
         verbose_name = "Purchase Order"
         verbose_name_plural = "Purchase Orders"
         ordering = ['-order_date']
+        indexes = [
+            models.Index(fields=['order_date']), # Default ordering / date hierarchy
+            models.Index(fields=['status', 'order_date']), # Admin status filter, open orders
+            models.Index(fields=['supplier', 'order_date']), # Per-supplier order history
+            models.Index(fields=['updated_at']), # Orders changed since the rollups last ran
+        ]
 
 
 class PurchaseOrderItem(models.Model):
@@ -0,0 +1,200 @@
+"""
+Replenishment: what to buy, from whom, and how much
+
+Demand is read from the stock ledger: the 'sale' (less 'return')
+movements of the last `history_days`, summed per product and day by the
+database. From there everything is computed with pandas for all products
+at once:
+
+    daily demand     mean and standard deviation of units sold per day
+                     (days without sales count as 0)
+    safety stock     z * std * sqrt(lead time), z from the service level
+    reorder point    daily demand * lead time + safety stock
+    order up to      reorder point + daily demand * review_days
+
+A product is reordered when its stock position (on hand, less reserved,
+plus open purchase orders) is at or below its reorder point. Each product
+is bought from the supplier of its latest purchase order line, at that
+line's unit cost, with that supplier's lead_time_days.
+
+create_purchase_orders() writes the plan as draft purchase orders, one
+per supplier, with bulk inserts.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import Product, StockMovement
+from .models import PurchaseOrder, PurchaseOrderItem
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 90
+SERVICE_LEVEL = 0.95 # Chance of not running out before the order arrives
+REVIEW_DAYS = 14 # Demand each order should cover beyond the lead time
+DEMAND_MOVEMENTS = ('sale', 'return') # Returns are positive, so they net off sales
+
+PLAN_COLUMNS = [
+    'product_id', 'sku', 'supplier_id', 'lead_time_days', 'unit_cost',
+    'daily_demand', 'demand_std', 'safety_stock', 'reorder_point', 'position', 'order_quantity',
+]
+
+
+def _frame(queryset, columns, chunk_size=20000):
+    rows = queryset.values_list(*columns.values()).iterator(chunk_size=chunk_size)
+    return pd.DataFrame.from_records(list(rows), columns=list(columns))
+
+
+def demand_rates(history_days=HISTORY_DAYS, as_of=None):
+    """daily_demand and demand_std per product id, over the `history_days` before `as_of`"""
+    as_of = as_of or timezone.now()
+    movements = (
+        StockMovement.objects
+        .filter(
+            movement_type__in=DEMAND_MOVEMENTS,
+            created_at__gte=as_of - timedelta(days=history_days),
+            created_at__lt=as_of,
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values('product_id', 'day')
+        .annotate(net=Sum('quantity'))
+        .order_by()
+    )
+    daily = _frame(movements, {'product_id': 'product_id', 'units': 'net'})
+    # Sales are negative movements
+    daily['units'] = (-daily['units']).clip(lower=0).astype('float64')
+
+    # Sum and sum of squares are enough for the mean and variance, zero days included
+    totals = daily.assign(squares=daily['units'] ** 2).groupby('product_id')[['units', 'squares']].sum()
+    mean = totals['units'] / history_days
+    variance = (totals['squares'] / history_days - mean ** 2).clip(lower=0)
+    return pd.DataFrame({'daily_demand': mean, 'demand_std': np.sqrt(variance)})
+
+
+def product_sources():
+    """supplier_id, lead_time_days and unit_cost per product id, from its latest purchase order line"""
+    latest_lines = (
+        PurchaseOrderItem.objects
+        .exclude(order__status='cancelled')
+        .values('product_id')
+        .annotate(last_line=Max('pk'))
+        .values('last_line')
+    )
+    lines = PurchaseOrderItem.objects.filter(pk__in=latest_lines, order__supplier__is_active=True)
+    return _frame(lines, {
+        'product_id': 'product_id',
+        'supplier_id': 'order__supplier_id',
+        'lead_time_days': 'order__supplier__lead_time_days',
+        'unit_cost': 'unit_cost',
+    }).set_index('product_id')
+
+
+def stock_positions():
+    """sku and stock position (on hand - reserved + on order) per active product id"""
+    products = _frame(Product.objects.filter(is_active=True), {
+        'product_id': 'pk',
+        'sku': 'sku',
+        'current_stock': 'current_stock',
+        'reserved_stock': 'reserved_stock',
+    }).set_index('product_id')
+
+    on_order = (
+        PurchaseOrderItem.objects
+        .filter(order__status__in=PurchaseOrder.OPEN_STATUSES)
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    on_order = pd.Series(dict(on_order), dtype='int64')
+
+    products['position'] = (
+        products['current_stock'] - products['reserved_stock'] + on_order.reindex(products.index, fill_value=0)
+    )
+    return products[['sku', 'position']]
+
+
+def plan_replenishment(history_days=HISTORY_DAYS, service_level=SERVICE_LEVEL, review_days=REVIEW_DAYS, as_of=None):
+    """
+    The products to reorder now, one row each (PLAN_COLUMNS), by supplier.
+    Products with no sales in the period or never bought from an active
+    supplier are left out.
+    """
+    if not 0 < service_level < 1:
+        raise ValueError('service_level must be between 0 and 1')
+    z = NormalDist().inv_cdf(service_level)
+
+    plan = (
+        stock_positions()
+        .join(demand_rates(history_days, as_of), how='inner')
+        .join(product_sources(), how='inner')
+    )
+    plan = plan[plan['daily_demand'] > 0]
+
+    lead_time = plan['lead_time_days'].astype('float64')
+    plan['safety_stock'] = np.ceil(z * plan['demand_std'] * np.sqrt(lead_time)).astype('int64')
+    plan['reorder_point'] = np.ceil(plan['daily_demand'] * lead_time).astype('int64') + plan['safety_stock']
+    order_up_to = plan['reorder_point'] + np.ceil(plan['daily_demand'] * review_days).astype('int64')
+    plan['order_quantity'] = (order_up_to - plan['position']).clip(lower=1)
+
+    plan = plan[plan['position'] <= plan['reorder_point']]
+    plan = plan.reset_index().rename(columns={'index': 'product_id'})
+    return plan[PLAN_COLUMNS].sort_values(['supplier_id', 'sku'], ignore_index=True)
+
+
+def create_purchase_orders(plan, user=None, batch_size=1000):
+    """
+    One draft purchase order per supplier in the plan, all written with
+    bulk_create (numbers reserved in one go). Returns the orders.
+    """
+    lines_by_supplier = defaultdict(list)
+    lead_times = {}
+    for row in plan.itertuples(index=False):
+        lines_by_supplier[int(row.supplier_id)].append((int(row.product_id), int(row.order_quantity), row.unit_cost))
+        lead_times[int(row.supplier_id)] = int(row.lead_time_days)
+    if not lines_by_supplier:
+        return []
+
+    today = timezone.localdate()
+    numbers = PurchaseOrder.allocate_order_numbers(len(lines_by_supplier))
+    orders = []
+    items = []
+    for number, (supplier_id, lines) in zip(numbers, lines_by_supplier.items()):
+        order_items = [
+            PurchaseOrderItem(product_id=product_id, quantity=quantity, unit_cost=unit_cost, subtotal=quantity * unit_cost)
+            for product_id, quantity, unit_cost in lines
+        ]
+        subtotal = sum((item.subtotal for item in order_items), Decimal('0.00'))
+        # bulk_create skips save(), so the fields it would fill are set here
+        order = PurchaseOrder(
+            order_number=number,
+            supplier_id=supplier_id,
+            status='draft',
+            expected_delivery=today + timedelta(days=lead_times[supplier_id]),
+            subtotal=subtotal,
+            total_amount=subtotal,
+            notes='Suggested by replenishment',
+            created_by=user,
+        )
+        for item in order_items:
+            item.order = order
+        orders.append(order)
+        items.extend(order_items)
+
+    with transaction.atomic():
+        PurchaseOrder.objects.bulk_create(orders, batch_size=batch_size)
+        for item in items:
+            item.order_id = item.order.pk
+        PurchaseOrderItem.objects.bulk_create(items, batch_size=batch_size)
+
+    logger.info("Replenishment: %d draft purchase orders, %d lines", len(orders), len(items))
+    return orders
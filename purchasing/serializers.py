@@ -0,0 +1,25 @@
+from rest_framework import serializers
+
+from core.api import SparseFieldsSerializerMixin
+from .models import PurchaseOrder, PurchaseOrderItem
+
+
+class PurchaseOrderItemSerializer(serializers.ModelSerializer):
+    sku = serializers.CharField(source='product.sku', read_only=True)
+
+    class Meta:
+        model = PurchaseOrderItem
+        fields = ('id', 'product', 'sku', 'quantity', 'unit_cost', 'subtotal')
+
+
+class PurchaseOrderSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    items = PurchaseOrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = (
+            'id', 'order_number', 'supplier', 'supplier_name', 'order_date', 'expected_delivery',
+            'status', 'subtotal', 'tax_amount', 'shipping_cost', 'total_amount', 'notes',
+            'created_at', 'updated_at', 'items',
+        )
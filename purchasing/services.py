@@ -0,0 +1,116 @@
+"""
+Services for Purchasing app
+Batch operations that are too heavy to run one line at a time
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.jobs import job
+from core.signals import stock_changed
+from inventory.models import Product, StockMovement
+from inventory.services import adjust_stock, update_stock_snapshots
+from .models import PurchaseOrder
+
+logger = logging.getLogger(__name__)
+
+
+def receive_purchase_order(order, batch_size=1000):
+    """
+    Add the items of a received purchase order to stock in one pass.
+
+    The affected products are locked and loaded once, the new stock and
+    weighted average cost are computed for all lines together (lines for
+    the same product are merged first), then everything is written with
+    bulk_update / bulk_create. Returns the number of products updated.
+    """
+    lines = list(order.items.values_list('product_id', 'quantity', 'unit_cost'))
+    if not lines:
+        return 0
+
+    # Merge duplicate products: qty and value received per product
+    received = {}
+    for product_id, quantity, unit_cost in lines:
+        qty, value = received.get(product_id, (0, Decimal('0.00')))
+        received[product_id] = (qty + quantity, value + unit_cost * quantity)
+
+    with transaction.atomic():
+        products = Product.objects.select_for_update().in_bulk(list(received))
+        now = timezone.now()
+
+        for product_id, (qty, value) in received.items():
+            product = products[product_id]
+            old_stock = product.current_stock
+
+            # Formula: New average = (old_total_value + new_total_value) / total_quantity
+            total_quantity = old_stock + qty
+            if total_quantity > 0:
+                old_total_value = product.cost_price * old_stock
+                product.cost_price = ((old_total_value + value) / total_quantity).quantize(Decimal('0.01'))
+
+            product.current_stock = total_quantity
+            product.updated_at = now
+
+        Product.objects.bulk_update(
+            products.values(),
+            ['current_stock', 'cost_price', 'updated_at'],
+            batch_size=batch_size,
+        )
+
+        movements = StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product_id=product_id,
+                    movement_type='purchase',
+                    quantity=quantity,
+                    reference=order.order_number,
+                    notes=f"Purchase Order {order.order_number}",
+                )
+                for product_id, quantity, unit_cost in lines
+            ],
+            batch_size=batch_size,
+        )
+        update_stock_snapshots(movements, batch_size=batch_size)
+
+    stock_changed.send(sender=Product, product_ids=list(products))
+    return len(products)
+
+
+@job('purchasing.order_status_changed')
+def apply_order_status_change(order_id, old_status, new_status):
+    """Adjust stock for a purchase order status change (runs as a background job)"""
+    with transaction.atomic():
+        # Re-read under lock: if the order has moved on since, the later job applies its own change
+        order = PurchaseOrder.objects.select_for_update().get(pk=order_id)
+        if order.status != new_status:
+            logger.info("Purchase order %s: skipping %s -> %s, the order is now %s", order.order_number, old_status, new_status, order.status)
+            return
+
+        if new_status == 'received' and old_status != 'received':
+            updated = receive_purchase_order(order)
+            logger.info("Purchase order %s: %d products restocked", order.order_number, updated)
+
+        elif old_status == 'received' and new_status == 'cancelled':
+            logger.info("Purchase order %s: decreasing stock (cancelling received order)", order.order_number)
+
+            # Only take back what was received (a receipt skipped as stale added nothing)
+            received = (
+                StockMovement.objects
+                .filter(reference=order.order_number, movement_type__in=['purchase', 'return_to_supplier'])
+                .values('product_id')
+                .annotate(net=Sum('quantity'))
+                .filter(net__gt=0)
+                .values_list('product_id', 'net')
+            )
+            failed = adjust_stock(
+                [(product_id, -net) for product_id, net in received],
+                movement_type='return_to_supplier',
+                reference=order.order_number,
+                notes=f"Cancelled PO: {order.order_number}",
+            )
+            if failed:
+                logger.warning("Purchase order %s: not enough stock to return %d items", order.order_number, len(failed))
@@ -1,3 +1,174 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomerUser
+from core.testing import QueryPlanTestMixin
+from inventory.models import Product, StockMovement
+from .models import PurchaseOrder, PurchaseOrderItem, Supplier
+from .services import receive_purchase_order
+from .replenishment import create_purchase_orders, demand_rates, plan_replenishment
+
+# Session, user, count, page of rows
+PURCHASE_ORDER_CHANGELIST_QUERY_BUDGET = 5
+
+
+class PurchaseOrderAdminQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        suppliers = Supplier.objects.bulk_create([Supplier(name=f'Supplier {i}') for i in range(10)])
+        numbers = PurchaseOrder.allocate_order_numbers(120)
+        PurchaseOrder.objects.bulk_create([
+            PurchaseOrder(order_number=number, supplier=suppliers[i % 10])
+            for i, number in enumerate(numbers)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_changelist_stays_within_query_budget(self):
+        url = reverse('admin:purchasing_purchaseorder_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), PURCHASE_ORDER_CHANGELIST_QUERY_BUDGET, [q['sql'] for q in queries])
+
+
+class PurchaseOrderQueryPlanTest(QueryPlanTestMixin, TestCase):
+    """The hot purchase order queries must stay on an index as the table grows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        suppliers = Supplier.objects.bulk_create([Supplier(name=f'Supplier {i}') for i in range(20)])
+        statuses = [status for status, _ in PurchaseOrder.STATUS_CHOICES]
+        numbers = PurchaseOrder.allocate_order_numbers(500)
+        PurchaseOrder.objects.bulk_create([
+            PurchaseOrder(order_number=number, supplier=suppliers[i % 20], status=statuses[i % len(statuses)])
+            for i, number in enumerate(numbers)
+        ])
+        cls.supplier = suppliers[0]
+        cls.today = timezone.localdate()
+
+    def test_changelist_page(self):
+        queryset = PurchaseOrder.objects.order_by('-order_date', '-pk')[:100]
+        self.assertNoFullScan(queryset)
+        self.assertNoSort(queryset)
+
+    def test_status_filter(self):
+        queryset = PurchaseOrder.objects.filter(status='sent').order_by('-order_date', '-pk')[:100]
+        self.assertNoFullScan(queryset)
+        self.assertNoSort(queryset)
+
+    def test_date_range_filter(self):
+        queryset = PurchaseOrder.objects.filter(order_date__gte=self.today - timedelta(days=30), order_date__lte=self.today)
+        self.assertNoFullScan(queryset)
+
+    def test_supplier_history(self):
+        queryset = PurchaseOrder.objects.filter(supplier=self.supplier).order_by('-order_date', '-pk')
+        self.assertNoFullScan(queryset)
+        self.assertNoSort(queryset)
+
+
+class ReplenishmentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.supplier = Supplier.objects.create(name='Acme', lead_time_days=7)
+        cls.low = Product.objects.create(sku='LOW', name='Low', current_stock=10)
+        cls.plenty = Product.objects.create(sku='PLENTY', name='Plenty', current_stock=100)
+        cls.unsourced = Product.objects.create(sku='NOSUP', name='No supplier', current_stock=0)
+
+        # Where each product was bought last time
+        order = PurchaseOrder.objects.create(supplier=cls.supplier, status='received')
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(order=order, product=product, quantity=50, unit_cost=Decimal('5.00'), subtotal=Decimal('250.00'))
+            for product in (cls.low, cls.plenty)
+        ])
+
+        # Two units a day of each product over the last 30 days
+        now = timezone.now()
+        for days_ago in range(30):
+            movements = StockMovement.objects.bulk_create([
+                StockMovement(product=product, movement_type='sale', quantity=-2)
+                for product in (cls.low, cls.plenty, cls.unsourced)
+            ])
+            StockMovement.objects.filter(pk__in=[m.pk for m in movements]).update(created_at=now - timedelta(days=days_ago, minutes=1))
+
+    def plan(self):
+        return plan_replenishment(history_days=30, service_level=0.95, review_days=14)
+
+    def test_demand_rate_includes_days_without_sales(self):
+        StockMovement.objects.filter(product=self.low, created_at__gte=timezone.now() - timedelta(days=15)).delete()
+        rates = demand_rates(history_days=30)
+        self.assertAlmostEqual(rates.loc[self.low.pk, 'daily_demand'], 1.0)
+        self.assertAlmostEqual(rates.loc[self.low.pk, 'demand_std'], 1.0)
+        self.assertAlmostEqual(rates.loc[self.plenty.pk, 'demand_std'], 0.0)
+
+    def test_plan_orders_products_below_reorder_point(self):
+        plan = self.plan()
+
+        self.assertEqual(list(plan['sku']), ['LOW'])
+        row = plan.iloc[0]
+        self.assertEqual(row['supplier_id'], self.supplier.pk)
+        self.assertEqual(row['reorder_point'], 14) # 2 a day for 7 days, no variation
+        self.assertEqual(row['order_quantity'], 32) # Up to 14 + 2 * 14 days, from 10
+
+    def test_open_purchase_orders_count_as_stock(self):
+        draft = PurchaseOrder.objects.create(supplier=self.supplier)
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(order=draft, product=self.low, quantity=40, unit_cost=Decimal('5.00'), subtotal=Decimal('200.00')),
+        ])
+        self.assertTrue(self.plan().empty)
+
+    def test_create_purchase_orders_per_supplier(self):
+        orders = create_purchase_orders(self.plan())
+
+        self.assertEqual(len(orders), 1)
+        order = PurchaseOrder.objects.get(pk=orders[0].pk)
+        self.assertEqual(order.status, 'draft')
+        self.assertEqual(order.supplier, self.supplier)
+        self.assertEqual(order.total_amount, Decimal('160.00'))
+        self.assertEqual(order.expected_delivery, timezone.localdate() + timedelta(days=7))
+        self.assertEqual(list(order.items.values_list('product__sku', 'quantity')), [('LOW', 32)])
+
+        # Now on order, so the next run suggests nothing
+        self.assertTrue(self.plan().empty)
+
+
+class ReceivePurchaseOrderTest(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Acme')
+        self.bolts = Product.objects.create(sku='BOLT', name='Bolt', cost_price=Decimal('0.00'))
+        self.nuts = Product.objects.create(sku='NUT', name='Nut', cost_price=Decimal('1.00'), current_stock=10)
+        self.order = PurchaseOrder.objects.create(supplier=self.supplier, status='confirmed')
+
+    def receive(self, lines):
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(order=self.order, product=product, quantity=quantity, unit_cost=Decimal(unit_cost), subtotal=quantity * Decimal(unit_cost))
+            for product, quantity, unit_cost in lines
+        ])
+        return receive_purchase_order(self.order)
+
+    def test_duplicate_lines_are_merged_at_weighted_average_cost(self):
+        updated = self.receive([(self.bolts, 10, '2.00'), (self.bolts, 10, '4.00'), (self.bolts, 20, '6.00')])
+
+        self.assertEqual(updated, 1)
+        self.bolts.refresh_from_db()
+        self.assertEqual((self.bolts.current_stock, self.bolts.cost_price), (40, Decimal('4.50')))
+        # One movement per line, all on the order's reference
+        movements = StockMovement.objects.filter(product=self.bolts, reference=self.order.order_number)
+        self.assertEqual(sorted(movements.values_list('quantity', flat=True)), [10, 10, 20])
+        self.assertEqual(self.bolts.stock_as_of(timezone.now()), 40)
+
+    def test_existing_stock_counts_towards_the_average(self):
+        self.receive([(self.nuts, 30, '3.00'), (self.bolts, 5, '2.00')])
 
-# Create your tests here.
+        self.nuts.refresh_from_db()
+        # (10 * 1.00 + 30 * 3.00) / 40
+        self.assertEqual((self.nuts.current_stock, self.nuts.cost_price), (40, Decimal('2.50')))
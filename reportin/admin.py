@@ -1,3 +1,36 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DailyCustomerSales, DailyProductSales, DailySupplierPurchases
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Rollups are written by `manage.py refresh_rollups` only"""
+    date_hierarchy = 'date'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(RollupAdmin):
+    list_display = ['date', 'product', 'quantity', 'revenue', 'cost', 'order_count']
+    list_select_related = ['product']
+    autocomplete_fields = ['product']
+
+
+@admin.register(DailyCustomerSales)
+class DailyCustomerSalesAdmin(RollupAdmin):
+    list_display = ['date', 'customer', 'quantity', 'revenue', 'cost', 'order_count']
+    list_select_related = ['customer']
+    autocomplete_fields = ['customer']
+
+
+@admin.register(DailySupplierPurchases)
+class DailySupplierPurchasesAdmin(RollupAdmin):
+    list_display = ['date', 'supplier', 'quantity', 'cost', 'order_count']
+    list_select_related = ['supplier']
+    autocomplete_fields = ['supplier']
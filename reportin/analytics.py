@@ -0,0 +1,210 @@
+"""
+Sales analytics computed with pandas
+
+Order and purchase lines are read as plain columns (values_list in
+chunks, money cast to float by the database), and everything after that
+is vectorized: revenue and gross margin by product, category, customer
+or period, ABC classification and sell-through. No model instances are
+created, so a few million lines take seconds.
+
+Cost of goods uses each product's current cost price (historical costs
+are not stored).
+"""
+
+from datetime import datetime, time
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import FloatField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from inventory.models import Product, StockMovement
+from purchasing.models import PurchaseOrderItem
+from sales.models import SalesOrder, SalesOrderItem
+
+from .exports import _date_range_filter, _parse_day
+
+CHUNK_SIZE = 50000
+
+DIMENSIONS = ('product', 'category', 'customer', 'period')
+PERIODS = {'day': 'D', 'week': 'W', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+
+ABC_A = 0.80 # Products making up the first 80% of revenue
+ABC_B = 0.95 # ... the next 15%; the rest are C
+
+
+def _read_frame(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Read values_list rows chunk by chunk into one DataFrame"""
+    rows = queryset.values_list(*columns.values()).iterator(chunk_size=chunk_size)
+    frames = []
+    while chunk := list(islice(rows, chunk_size)):
+        frames.append(pd.DataFrame.from_records(chunk, columns=list(columns)))
+    if not frames:
+        return pd.DataFrame(columns=list(columns))
+    return pd.concat(frames, ignore_index=True)
+
+
+def sales_lines(params=None, chunk_size=CHUNK_SIZE):
+    """
+    One row per sold order line: order_date, customer_id, product_id, quantity, revenue.
+    `params` may hold date_from / date_to (YYYY-MM-DD, inclusive).
+    """
+    items = (
+        SalesOrderItem.objects
+        .filter(order__status__in=SalesOrder.SOLD_STATUSES, **_date_range_filter('order__order_date', params or {}, is_datetime=True))
+        .annotate(revenue=Cast('subtotal', FloatField()))
+    )
+    lines = _read_frame(items, {
+        'order_date': 'order__order_date',
+        'customer_id': 'order__customer_id',
+        'product_id': 'product_id',
+        'quantity': 'quantity',
+        'revenue': 'revenue',
+    }, chunk_size)
+
+    lines['order_date'] = pd.to_datetime(lines['order_date'], utc=True).dt.tz_convert(settings.TIME_ZONE)
+    return lines.astype({'customer_id': 'int64', 'product_id': 'int64', 'quantity': 'int64', 'revenue': 'float64'})
+
+
+def products_frame():
+    """Product dimension: sku, name, category, cost price and stock, indexed by product id"""
+    products = Product.objects.annotate(cost=Cast('cost_price', FloatField()))
+    frame = _read_frame(products, {
+        'product_id': 'pk',
+        'sku': 'sku',
+        'name': 'name',
+        'category': 'category__name',
+        'cost_price': 'cost',
+        'current_stock': 'current_stock',
+    })
+    frame['category'] = frame['category'].fillna('Uncategorized')
+    return frame.set_index('product_id')
+
+
+def with_costs(lines, products):
+    """Add category, cost and gross margin columns to the sales lines"""
+    lines = lines.join(products[['category', 'cost_price']], on='product_id')
+    lines['cost'] = lines['quantity'] * lines['cost_price'].fillna(0)
+    lines['margin'] = lines['revenue'] - lines['cost']
+    return lines
+
+
+def revenue_by(lines, by='product', period='month'):
+    """Quantity, revenue, cost and gross margin (amount and %) per `by`, largest revenue first"""
+    if by not in DIMENSIONS:
+        raise ValueError(f"by must be one of {', '.join(DIMENSIONS)}")
+
+    if by == 'period':
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        key = lines['order_date'].dt.tz_localize(None).dt.to_period(PERIODS[period]).astype(str).rename('period')
+    else:
+        key = {'product': 'product_id', 'category': 'category', 'customer': 'customer_id'}[by]
+
+    totals = lines.groupby(key)[['quantity', 'revenue', 'cost', 'margin']].sum()
+    totals['margin_pct'] = np.where(totals['revenue'] > 0, totals['margin'] / totals['revenue'] * 100, np.nan)
+    if by == 'period':
+        return totals.sort_index()
+    return totals.sort_values('revenue', ascending=False)
+
+
+def abc_classification(lines, a=ABC_A, b=ABC_B):
+    """Rank products by revenue and class them A/B/C by cumulative share of the total"""
+    revenue = lines.groupby('product_id')['revenue'].sum().sort_values(ascending=False)
+    total = revenue.sum()
+    share = revenue / total if total else revenue * 0
+    # Cumulative share *before* the product, so the product that crosses 80% is still an A
+    before = share.cumsum() - share
+    classes = np.select([before < a, before < b], ['A', 'B'], default='C')
+    return pd.DataFrame({
+        'revenue': revenue,
+        'share': share,
+        'cumulative_share': share.cumsum(),
+        'class': classes,
+    })
+
+
+def _opening_stock(params):
+    date_from = _parse_day((params or {}).get('date_from'), 'date_from')
+    if not date_from:
+        return pd.Series(dtype='int64')
+    movements = (
+        StockMovement.objects
+        .filter(created_at__lt=timezone.make_aware(datetime.combine(date_from, time.min)))
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    return pd.Series(dict(movements), dtype='int64')
+
+
+def sell_through(lines, params=None, chunk_size=CHUNK_SIZE):
+    """
+    Units sold / units available (stock at the start of the period plus units
+    received during it), per product.
+    """
+    received = PurchaseOrderItem.objects.filter(
+        order__status='received',
+        **_date_range_filter('order__order_date', params or {}, is_datetime=False),
+    )
+    received = _read_frame(received, {'product_id': 'product_id', 'quantity': 'quantity'}, chunk_size)
+    received = received.astype('int64').groupby('product_id')['quantity'].sum()
+    sold = lines.groupby('product_id')['quantity'].sum()
+    opening = _opening_stock(params)
+
+    frame = pd.DataFrame({'opening': opening, 'received': received, 'sold': sold}).fillna(0).astype('int64')
+    available = frame['opening'] + frame['received']
+    frame['sell_through'] = np.where(available > 0, frame['sold'] / available.where(available > 0, 1), np.nan)
+    return frame.sort_values('sell_through', ascending=False)
+
+
+def _records(frame, index_name, limit=None):
+    frame = frame.reset_index().rename(columns={'index': index_name})
+    if limit:
+        frame = frame.head(limit)
+    # NaN isn't valid JSON
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def _with_product_details(frame, products):
+    details = frame.join(products[['sku', 'name']])
+    return details[['sku', 'name', *frame.columns]]
+
+
+def analytics_report(report, params=None, by='product', period='month', limit=100):
+    """One analytics report as JSON-ready data: 'revenue', 'abc' or 'sell_through'"""
+    params = params or {}
+    products = products_frame()
+    lines = with_costs(sales_lines(params), products)
+
+    if report == 'revenue':
+        frame = revenue_by(lines, by=by, period=period)
+        if by == 'product':
+            frame = _with_product_details(frame, products)
+        return {
+            'by': by,
+            'totals': {
+                'lines': int(len(lines)),
+                'quantity': int(lines['quantity'].sum()),
+                'revenue': round(float(lines['revenue'].sum()), 2),
+                'margin': round(float(lines['margin'].sum()), 2),
+            },
+            'rows': _records(frame.round(2), by, limit),
+        }
+
+    if report == 'abc':
+        frame = abc_classification(lines)
+        summary = frame.groupby('class').agg(products=('revenue', 'size'), revenue=('revenue', 'sum'))
+        return {
+            'summary': _records(summary.round(2), 'class'),
+            'rows': _records(_with_product_details(frame, products).round(4), 'product_id', limit),
+        }
+
+    if report == 'sell_through':
+        frame = sell_through(lines, params)
+        return {'rows': _records(_with_product_details(frame, products).round(4), 'product_id', limit)}
+
+    raise ValueError("report must be 'revenue', 'abc' or 'sell_through'")
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReportinConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reportin'
+    verbose_name = 'Reporting'
+
+    def ready(self):
+        import reportin.signals
@@ -0,0 +1,132 @@
+"""
+Streaming CSV exports for sales, purchases and stock movements
+
+Rows are read with values_list().iterator(), so only one chunk of rows is
+in memory at a time no matter how large the export is.
+"""
+
+import csv
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from inventory.models import StockMovement
+from purchasing.models import PurchaseOrderItem
+from sales.models import SalesOrderItem
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+class ExportFilterError(ValueError):
+    pass
+
+
+def _parse_day(value, name):
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        # Well formed but not a real date, e.g. 2020-13-01
+        day = None
+    if day is None:
+        raise ExportFilterError(f"{name} must be a date in YYYY-MM-DD format")
+    return day
+
+
+def _date_range_filter(field, params, is_datetime):
+    """Build ?date_from=&date_to= (inclusive) filters that can use an index on `field`"""
+    date_from = _parse_day(params.get('date_from'), 'date_from')
+    date_to = _parse_day(params.get('date_to'), 'date_to')
+
+    filters = {}
+    if is_datetime:
+        if date_from:
+            filters[f'{field}__gte'] = timezone.make_aware(datetime.combine(date_from, time.min))
+        if date_to:
+            filters[f'{field}__lt'] = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    else:
+        if date_from:
+            filters[f'{field}__gte'] = date_from
+        if date_to:
+            filters[f'{field}__lte'] = date_to
+    return filters
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+SALES_COLUMNS = [
+    ('order__order_number', 'Order Number'),
+    ('order__order_date', 'Order Date'),
+    ('order__status', 'Status'),
+    ('order__customer__name', 'Customer'),
+    ('product__sku', 'SKU'),
+    ('product__name', 'Product'),
+    ('quantity', 'Quantity'),
+    ('unit_price', 'Unit Price'),
+    ('subtotal', 'Line Total'),
+    ('order__total_amount', 'Order Total'),
+]
+
+PURCHASE_COLUMNS = [
+    ('order__order_number', 'PO Number'),
+    ('order__order_date', 'Order Date'),
+    ('order__status', 'Status'),
+    ('order__supplier__name', 'Supplier'),
+    ('product__sku', 'SKU'),
+    ('product__name', 'Product'),
+    ('quantity', 'Quantity'),
+    ('unit_cost', 'Unit Cost'),
+    ('subtotal', 'Line Total'),
+    ('order__total_amount', 'Order Total'),
+]
+
+MOVEMENT_COLUMNS = [
+    ('created_at', 'Date'),
+    ('product__sku', 'SKU'),
+    ('product__name', 'Product'),
+    ('movement_type', 'Type'),
+    ('quantity', 'Quantity'),
+    ('reference', 'Reference'),
+    ('notes', 'Notes'),
+]
+
+
+def _export(queryset, columns):
+    fields = [field for field, label in columns]
+    rows = queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+    return stream_csv([label for field, label in columns], rows)
+
+
+def sales_export(params):
+    items = SalesOrderItem.objects.filter(**_date_range_filter('order__order_date', params, is_datetime=True))
+    if params.get('status'):
+        items = items.filter(order__status=params['status'])
+    return _export(items.order_by('order_id', 'id'), SALES_COLUMNS)
+
+
+def purchases_export(params):
+    items = PurchaseOrderItem.objects.filter(**_date_range_filter('order__order_date', params, is_datetime=False))
+    if params.get('status'):
+        items = items.filter(order__status=params['status'])
+    return _export(items.order_by('order_id', 'id'), PURCHASE_COLUMNS)
+
+
+def stock_movements_export(params):
+    movements = StockMovement.objects.filter(**_date_range_filter('created_at', params, is_datetime=True))
+    if params.get('movement_type'):
+        movements = movements.filter(movement_type=params['movement_type'])
+    return _export(movements.order_by('id'), MOVEMENT_COLUMNS)
@@ -0,0 +1,22 @@
+"""
+Update the daily sales / purchase rollups (reportin.rollups) with the
+orders changed since the last run. Run it from cron every few minutes:
+
+    python manage.py refresh_rollups
+    python manage.py refresh_rollups --full    # rebuild every day
+"""
+
+from django.core.management.base import BaseCommand
+
+from reportin.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily rollup rows of the days with orders changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every day, not only the changed ones')
+
+    def handle(self, *args, **options):
+        days, rows = refresh_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {days} days ({rows} rollup rows)'))
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('inventory', '0009_stockmovement_created_at_index'),
+        ('purchasing', '0003_purchase_order_updated_at_index'),
+        ('sales', '0005_sales_order_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyCustomerSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('order_count', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='sales.customer')),
+            ],
+            options={
+                'verbose_name': 'Daily Customer Sales',
+                'verbose_name_plural': 'Daily Customer Sales',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['customer', 'date'], name='reportin_da_custome_76fe34_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'customer'), name='unique_daily_customer_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('order_count', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Daily Product Sales',
+                'verbose_name_plural': 'Daily Product Sales',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['product', 'date'], name='reportin_da_product_018393_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_daily_product_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySupplierPurchases',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('cost', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('order_count', models.IntegerField(default=0)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_purchases', to='purchasing.supplier')),
+            ],
+            options={
+                'verbose_name': 'Daily Supplier Purchases',
+                'verbose_name_plural': 'Daily Supplier Purchases',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['supplier', 'date'], name='reportin_da_supplie_4d28ed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'supplier'), name='unique_daily_supplier_purchases')],
+            },
+        ),
+    ]
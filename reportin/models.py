@@ -1,3 +1,81 @@
 from django.db import models
 
-# Create your models here.
+
+class DailyProductSales(models.Model):
+    """Sales of one product on one day (orders in SalesOrder.SOLD_STATUSES), see reportin.rollups"""
+    date = models.DateField()
+    product = models.ForeignKey('inventory.Product', on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0.00) # quantity * current cost price
+    order_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.date} {self.product_id}: {self.quantity}'
+
+    class Meta:
+        verbose_name = 'Daily Product Sales'
+        verbose_name_plural = 'Daily Product Sales'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_product_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'date']), # One product's history
+        ]
+
+
+class DailyCustomerSales(models.Model):
+    """Sales to one customer on one day"""
+    date = models.DateField()
+    customer = models.ForeignKey('sales.Customer', on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    order_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.date} {self.customer_id}: {self.revenue}'
+
+    class Meta:
+        verbose_name = 'Daily Customer Sales'
+        verbose_name_plural = 'Daily Customer Sales'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'customer'], name='unique_daily_customer_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', 'date']),
+        ]
+
+
+class DailySupplierPurchases(models.Model):
+    """Purchases from one supplier on one day (orders in PurchaseOrder.PLACED_STATUSES)"""
+    date = models.DateField()
+    supplier = models.ForeignKey('purchasing.Supplier', on_delete=models.CASCADE, related_name='daily_purchases')
+    quantity = models.IntegerField(default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    order_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.date} {self.supplier_id}: {self.cost}'
+
+    class Meta:
+        verbose_name = 'Daily Supplier Purchases'
+        verbose_name_plural = 'Daily Supplier Purchases'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'supplier'], name='unique_daily_supplier_purchases'),
+        ]
+        indexes = [
+            models.Index(fields=['supplier', 'date']),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """How far the rollups have been brought up to date (orders updated after this get reprocessed)"""
+    name = models.CharField(max_length=50, unique=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.updated_at}'
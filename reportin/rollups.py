@@ -0,0 +1,154 @@
+"""
+Daily rollups of sales and purchases
+
+DailyProductSales, DailyCustomerSales and DailySupplierPurchases hold one
+row per day and product / customer / supplier. refresh_rollups() looks at
+the orders updated since the last run (the watermark) and rebuilds only
+the days those orders fall on, each with a grouped aggregate, so reports
+read a few thousand summary rows instead of every order line.
+
+Run `manage.py refresh_rollups` from cron, e.g. every few minutes.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from purchasing.models import PurchaseOrder, PurchaseOrderItem
+from sales.models import SalesOrder, SalesOrderItem
+
+from .models import DailyCustomerSales, DailyProductSales, DailySupplierPurchases, RollupWatermark
+from .services import invalidate_reports
+
+WATERMARK = 'daily_rollups'
+# Orders saved in a transaction that was still open at the last run have an
+# updated_at just before the watermark, so look back a little further
+OVERLAP = timedelta(minutes=5)
+DAYS_PER_BATCH = 31
+BATCH_SIZE = 1000
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _batches(days):
+    days = sorted(days)
+    for start in range(0, len(days), DAYS_PER_BATCH):
+        yield days[start:start + DAYS_PER_BATCH]
+
+
+def _on_days(field, days):
+    # One index range per day, rather than TruncDate(field) IN (...), which can't use an index
+    condition = Q()
+    for day in days:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        condition |= Q(**{f'{field}__gte': start, f'{field}__lt': start + timedelta(days=1)})
+    return condition
+
+
+def _sales_totals(items, key):
+    rows = items.values('day', key).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('subtotal'),
+        total_cost=Sum(ExpressionWrapper(F('quantity') * F('product__cost_price'), output_field=MONEY)),
+        orders=Count('order_id', distinct=True),
+    ).order_by()
+    for row in rows:
+        yield row['day'], row[key], {
+            'quantity': row['total_quantity'],
+            'revenue': row['total_revenue'],
+            'cost': row['total_cost'],
+            'order_count': row['orders'],
+        }
+
+
+def rebuild_sales_days(days):
+    """Recompute the product and customer sales rollups of the given days"""
+    created = 0
+    for batch in _batches(days):
+        items = (
+            SalesOrderItem.objects
+            .filter(_on_days('order__order_date', batch), order__status__in=SalesOrder.SOLD_STATUSES)
+            .annotate(day=TruncDate('order__order_date'))
+        )
+        DailyProductSales.objects.filter(date__in=batch).delete()
+        DailyCustomerSales.objects.filter(date__in=batch).delete()
+
+        product_rows = [
+            DailyProductSales(date=day, product_id=product_id, **totals)
+            for day, product_id, totals in _sales_totals(items, 'product_id')
+        ]
+        customer_rows = [
+            DailyCustomerSales(date=day, customer_id=customer_id, **totals)
+            for day, customer_id, totals in _sales_totals(items, 'order__customer_id')
+        ]
+        DailyProductSales.objects.bulk_create(product_rows, batch_size=BATCH_SIZE)
+        DailyCustomerSales.objects.bulk_create(customer_rows, batch_size=BATCH_SIZE)
+        created += len(product_rows) + len(customer_rows)
+    return created
+
+
+def rebuild_purchase_days(days):
+    """Recompute the supplier purchase rollups of the given days"""
+    created = 0
+    for batch in _batches(days):
+        rows = (
+            PurchaseOrderItem.objects
+            .filter(order__order_date__in=batch, order__status__in=PurchaseOrder.PLACED_STATUSES)
+            .values('order__order_date', 'order__supplier_id')
+            .annotate(total_quantity=Sum('quantity'), total_cost=Sum('subtotal'), orders=Count('order_id', distinct=True))
+            .order_by()
+        )
+
+        DailySupplierPurchases.objects.filter(date__in=batch).delete()
+        supplier_rows = [
+            DailySupplierPurchases(
+                date=row['order__order_date'],
+                supplier_id=row['order__supplier_id'],
+                quantity=row['total_quantity'],
+                cost=row['total_cost'],
+                order_count=row['orders'],
+            )
+            for row in rows
+        ]
+        DailySupplierPurchases.objects.bulk_create(supplier_rows, batch_size=BATCH_SIZE)
+        created += len(supplier_rows)
+    return created
+
+
+def refresh_rollups(full=False):
+    """
+    Bring the rollups up to date; returns (days rebuilt, rows written).
+    With full=True every day is rebuilt (after deleting orders, or data fixes
+    that didn't touch updated_at).
+    """
+    RollupWatermark.objects.get_or_create(name=WATERMARK)
+
+    with transaction.atomic():
+        # Locked, so two runs don't rebuild the same days at once
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+        started = timezone.now()
+
+        sales = SalesOrder.objects.all()
+        purchases = PurchaseOrder.objects.all()
+        if full:
+            DailyProductSales.objects.all().delete()
+            DailyCustomerSales.objects.all().delete()
+            DailySupplierPurchases.objects.all().delete()
+        elif watermark.updated_at:
+            sales = sales.filter(updated_at__gt=watermark.updated_at - OVERLAP)
+            purchases = purchases.filter(updated_at__gt=watermark.updated_at - OVERLAP)
+
+        sales_days = set(sales.annotate(day=TruncDate('order_date')).values_list('day', flat=True).distinct())
+        purchase_days = set(purchases.values_list('order_date', flat=True).distinct())
+
+        rows = rebuild_sales_days(sales_days) + rebuild_purchase_days(purchase_days)
+
+        watermark.updated_at = started
+        watermark.save(update_fields=['updated_at'])
+        if sales_days or purchase_days:
+            invalidate_reports()
+
+    return len(sales_days | purchase_days), rows
@@ -0,0 +1,175 @@
+"""
+Services for Reporting app
+Inventory valuation, margins and low stock, computed in the database
+and cached until stock or products change
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.models import Product
+from .models import DailyCustomerSales
+
+GENERATION_KEY = 'reportin:generation'
+
+MONEY = DecimalField(max_digits=20, decimal_places=2)
+
+
+def _timeout():
+    return getattr(settings, 'REPORT_CACHE_TIMEOUT', 300)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(GENERATION_KEY, generation, None)
+    return generation
+
+
+def cached_report(name, compute, *args):
+    """Return a report from the cache, computing it on a miss"""
+    key = ':'.join(['reportin', str(_generation()), name, *map(str, args)])
+    result = cache.get(key)
+    if result is None:
+        result = compute(*args)
+        cache.set(key, result, _timeout())
+    return result
+
+
+def invalidate_reports():
+    """Drop every cached report (bumps the generation once the transaction commits)"""
+    def bump():
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, 2, None)
+
+    transaction.on_commit(bump)
+
+
+def _stock_value():
+    return ExpressionWrapper(F('current_stock') * F('cost_price'), output_field=MONEY)
+
+
+def _retail_value():
+    return ExpressionWrapper(F('current_stock') * F('selling_price'), output_field=MONEY)
+
+
+def compute_inventory_valuation():
+    products = Product.objects.filter(is_active=True)
+    zero = Decimal('0.00')
+
+    totals = products.aggregate(
+        products=Count('id'),
+        units=Coalesce(Sum('current_stock'), 0),
+        stock_value=Coalesce(Sum(_stock_value()), zero, output_field=MONEY),
+        retail_value=Coalesce(Sum(_retail_value()), zero, output_field=MONEY),
+    )
+
+    by_category = list(
+        products.values('category__name')
+        .annotate(
+            products=Count('id'),
+            units=Coalesce(Sum('current_stock'), 0),
+            stock_value=Coalesce(Sum(_stock_value()), zero, output_field=MONEY),
+        )
+        .order_by('-stock_value')
+    )
+
+    return {'totals': totals, 'by_category': by_category}
+
+
+def compute_margin_summary(limit=20):
+    # Same formula as Product.profit_margin(), done by the database
+    margin = ExpressionWrapper(
+        (F('selling_price') - F('cost_price')) * 100 / F('cost_price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    products = Product.objects.filter(is_active=True, cost_price__gt=0).annotate(margin=margin)
+    fields = ('id', 'sku', 'name', 'cost_price', 'selling_price', 'margin')
+
+    return {
+        'average_margin': products.aggregate(average=Avg('margin'))['average'],
+        'negative_margin_count': products.filter(selling_price__lt=F('cost_price')).count(),
+        'lowest': list(products.order_by('margin').values(*fields)[:limit]),
+        'highest': list(products.order_by('-margin').values(*fields)[:limit]),
+    }
+
+
+def compute_low_stock(threshold=10, limit=100):
+    # Same rule as Product.is_low_stock(), for the whole catalog at once
+    products = Product.objects.filter(is_active=True, current_stock__lt=threshold)
+    return {
+        'threshold': threshold,
+        'count': products.count(),
+        'out_of_stock': products.filter(current_stock__lte=0).count(),
+        'products': list(
+            products.order_by('current_stock', 'name')
+            .values('id', 'sku', 'name', 'current_stock', 'category__name')[:limit]
+        ),
+    }
+
+
+def compute_sales_trend(days=30):
+    # Read from the daily rollups (reportin.rollups): one row per customer and day
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    previous_start = start - timedelta(days=days)
+    zero = Decimal('0.00')
+
+    rollups = DailyCustomerSales.objects.filter(date__gte=previous_start, date__lte=today)
+    current = Q(date__gte=start)
+    previous = Q(date__lt=start)
+    margin = ExpressionWrapper(F('revenue') - F('cost'), output_field=MONEY)
+    comparison = rollups.aggregate(
+        current_revenue=Coalesce(Sum('revenue', filter=current), zero, output_field=MONEY),
+        previous_revenue=Coalesce(Sum('revenue', filter=previous), zero, output_field=MONEY),
+        current_margin=Coalesce(Sum(margin, filter=current), zero, output_field=MONEY),
+        previous_margin=Coalesce(Sum(margin, filter=previous), zero, output_field=MONEY),
+        current_orders=Coalesce(Sum('order_count', filter=current), 0),
+        previous_orders=Coalesce(Sum('order_count', filter=previous), 0),
+    )
+
+    by_day = list(
+        rollups.filter(current)
+        .values('date')
+        .annotate(total_revenue=Sum('revenue'), total_quantity=Sum('quantity'), orders=Sum('order_count'))
+        .order_by('date')
+    )
+    return {'days': days, 'comparison': comparison, 'by_day': by_day}
+
+
+def inventory_valuation():
+    return cached_report('valuation', compute_inventory_valuation)
+
+
+def margin_summary(limit=20):
+    return cached_report('margins', compute_margin_summary, limit)
+
+
+def low_stock(threshold=10, limit=100):
+    return cached_report('low_stock', compute_low_stock, threshold, limit)
+
+
+def sales_trend(days=30):
+    return cached_report('sales_trend', compute_sales_trend, days)
+
+
+def _compute_sales_analytics(report, date_from, date_to, by, period, limit):
+    # pandas is only loaded when an analytics report is asked for
+    from .analytics import analytics_report
+    params = {'date_from': date_from, 'date_to': date_to}
+    return analytics_report(report, params, by=by, period=period, limit=limit)
+
+
+def sales_analytics(report, date_from='', date_to='', by='product', period='month', limit=100):
+    """Revenue / ABC / sell-through report from reportin.analytics (raises ValueError on bad parameters)"""
+    return cached_report('analytics', _compute_sales_analytics, report, date_from, date_to, by, period, limit)
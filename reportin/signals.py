@@ -0,0 +1,20 @@
+"""
+SIGNALS for Reporting app
+Throw away cached reports whenever products or stock change
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.signals import stock_changed
+from inventory.models import Product, StockMovement
+from .services import invalidate_reports
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=StockMovement)
+def invalidate_reports_on_save(sender, **kwargs):
+    invalidate_reports()
+
+@receiver(stock_changed)
+def invalidate_reports_on_stock_change(sender, **kwargs):
+    invalidate_reports()
@@ -1,3 +1,270 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomerUser
+from inventory.models import Category, Product
+from inventory.services import adjust_stock
+from purchasing.models import PurchaseOrder, PurchaseOrderItem, Supplier
+from sales.models import Customer, SalesOrder, SalesOrderItem
+from . import analytics, services
+from .models import DailyCustomerSales, DailyProductSales, DailySupplierPurchases
+from .rollups import refresh_rollups
+
+
+class SalesAnalyticsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tools = Category.objects.create(name='Tools')
+        cls.hammer = Product.objects.create(sku='HAM', name='Hammer', category=tools, cost_price=6, selling_price=10)
+        cls.saw = Product.objects.create(sku='SAW', name='Saw', category=tools, cost_price=15, selling_price=20)
+        cls.nail = Product.objects.create(sku='NAIL', name='Nail', cost_price=0.5, selling_price=1)
+        adjust_stock([(cls.hammer.pk, 20), (cls.saw.pk, 10), (cls.nail.pk, 100)], movement_type='purchase')
+
+        customer = Customer.objects.create(name='Customer')
+        orders = SalesOrder.objects.bulk_create([
+            SalesOrder(order_number='SO-T1', customer=customer, status='delivered'),
+            SalesOrder(order_number='SO-T2', customer=customer, status='confirmed'),
+            SalesOrder(order_number='SO-T3', customer=customer, status='cancelled'), # Not a sale
+        ])
+        SalesOrderItem.objects.bulk_create([
+            SalesOrderItem(order=orders[0], product=cls.hammer, quantity=8, unit_price=10, subtotal=80),
+            SalesOrderItem(order=orders[1], product=cls.saw, quantity=1, unit_price=20, subtotal=20),
+            SalesOrderItem(order=orders[1], product=cls.nail, quantity=10, unit_price=1, subtotal=10),
+            SalesOrderItem(order=orders[2], product=cls.hammer, quantity=5, unit_price=10, subtotal=50),
+        ])
+
+        supplier = Supplier.objects.create(name='Supplier')
+        received = PurchaseOrder.objects.create(supplier=supplier, status='received')
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(order=received, product=cls.hammer, quantity=20, unit_cost=6, subtotal=120),
+        ])
+
+    def setUp(self):
+        self.products = analytics.products_frame()
+        self.lines = analytics.with_costs(analytics.sales_lines(), self.products)
+
+    def test_only_sold_orders_are_counted(self):
+        self.assertEqual(len(self.lines), 3)
+        self.assertEqual(self.lines['revenue'].sum(), 110)
+
+    def test_revenue_and_margin_by_category(self):
+        totals = analytics.revenue_by(self.lines, by='category')
+        self.assertEqual(list(totals.index), ['Tools', 'Uncategorized'])
+        self.assertEqual(totals.loc['Tools', 'revenue'], 100)
+        self.assertEqual(totals.loc['Tools', 'margin'], 100 - 8 * 6 - 15)
+        self.assertAlmostEqual(totals.loc['Uncategorized', 'margin_pct'], 50)
+
+    def test_revenue_by_period(self):
+        totals = analytics.revenue_by(self.lines, by='period', period='year')
+        self.assertEqual(len(totals), 1)
+        self.assertEqual(totals['quantity'].iloc[0], 19)
+
+    def test_abc_classification(self):
+        classes = analytics.abc_classification(self.lines)['class']
+        # Hammer 73%, saw takes the total past 80% (still A), nail past 95% (still B)
+        self.assertEqual(classes.to_dict(), {self.hammer.pk: 'A', self.saw.pk: 'A', self.nail.pk: 'B'})
+
+    def test_sell_through(self):
+        frame = analytics.sell_through(self.lines)
+        self.assertEqual(frame.loc[self.hammer.pk, 'sell_through'], 8 / 20)
+        # Nothing received in the period and no opening stock: undefined
+        self.assertTrue(frame['sell_through'].isna()[self.saw.pk])
+
+    def test_bad_parameters(self):
+        with self.assertRaises(ValueError):
+            analytics.revenue_by(self.lines, by='warehouse')
+        with self.assertRaises(ValueError):
+            analytics.analytics_report('forecast')
+
+
+class AnalyticsViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_report_is_json(self):
+        response = self.client.get(reverse('reportin:analytics', args=['revenue']), {'by': 'period'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rows'], [])
+
+    def test_bad_parameters_are_rejected(self):
+        url = reverse('reportin:analytics', args=['revenue'])
+        self.assertEqual(self.client.get(url, {'date_from': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'by': 'warehouse'}).status_code, 400)
+
+
+class ReportViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        tools = Category.objects.create(name='Tools')
+        Product.objects.create(sku='HAM', name='Hammer', category=tools, cost_price=5, selling_price=10, current_stock=3)
+        Product.objects.create(sku='SAW', name='Saw', category=tools, cost_price=8, selling_price=10, current_stock=40)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('reportin:dashboard')).status_code, 302)
+        self.assertEqual(self.client.get(reverse('reportin:valuation')).status_code, 302)
+
+    def test_dashboard(self):
+        response = self.client.get(reverse('reportin:dashboard'), {'threshold': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['sku'] for product in response.context['low_stock']['products']], ['HAM'])
+        self.assertContains(response, 'Hammer')
+
+    def test_json_reports(self):
+        valuation = self.client.get(reverse('reportin:valuation')).json()
+        self.assertEqual(valuation['totals']['units'], 43)
+
+        margins = self.client.get(reverse('reportin:margins'), {'limit': 1}).json()
+        self.assertEqual([product['sku'] for product in margins['lowest']], ['SAW'])
+        self.assertEqual([product['sku'] for product in margins['highest']], ['HAM'])
+
+    def test_out_of_range_parameters_are_clamped(self):
+        margins = self.client.get(reverse('reportin:margins'), {'limit': -1})
+        self.assertEqual(margins.status_code, 200)
+        self.assertEqual(len(margins.json()['lowest']), 1)
+
+        low_stock = self.client.get(reverse('reportin:low_stock'), {'limit': -1, 'threshold': -5})
+        self.assertEqual(low_stock.status_code, 200)
+        self.assertEqual(low_stock.json()['threshold'], 0)
+
+        low_stock = self.client.get(reverse('reportin:low_stock'), {'threshold': 10 ** 9, 'limit': 'all'})
+        self.assertEqual(low_stock.json()['threshold'], 100000)
+        self.assertEqual(len(low_stock.json()['products']), 2)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.product = Product.objects.create(sku='HAM', name='Hammer', cost_price=6, selling_price=10)
+        customer = Customer.objects.create(name='Customer')
+        supplier = Supplier.objects.create(name='Supplier')
+        cls.today = timezone.localdate()
+
+        orders = SalesOrder.objects.bulk_create([
+            SalesOrder(order_number='SO-E1', customer=customer, status='delivered'),
+            SalesOrder(order_number='SO-E2', customer=customer, status='draft'),
+        ])
+        SalesOrderItem.objects.bulk_create([
+            SalesOrderItem(order=order, product=cls.product, quantity=2, unit_price=10, subtotal=20)
+            for order in orders
+        ])
+        SalesOrder.objects.filter(order_number='SO-E1').update(order_date=timezone.now() - timedelta(days=7))
+
+        for status in ('sent', 'cancelled'):
+            purchase = PurchaseOrder.objects.create(supplier=supplier, status=status)
+            PurchaseOrderItem.objects.create(order=purchase, product=cls.product, quantity=5, unit_cost=6)
+
+        adjust_stock([(cls.product.pk, 10)], movement_type='purchase', reference='PO-E1')
+        adjust_stock([(cls.product.pk, -3)], movement_type='sale', reference='SO-E1')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _rows(self, name, **params):
+        response = self.client.get(reverse(f'reportin:{name}'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        return [line.split(',') for line in content.splitlines()]
+
+    def test_sales_export(self):
+        rows = self._rows('export_sales')
+        self.assertEqual(rows[0][0], 'Order Number')
+        self.assertEqual([row[0] for row in rows[1:]], ['SO-E1', 'SO-E2'])
+
+        rows = self._rows('export_sales', date_from=self.today.isoformat())
+        self.assertEqual([row[0] for row in rows[1:]], ['SO-E2'])
+        rows = self._rows('export_sales', status='delivered')
+        self.assertEqual([row[0] for row in rows[1:]], ['SO-E1'])
+
+    def test_purchases_export(self):
+        rows = self._rows('export_purchases', status='sent', date_to=self.today.isoformat())
+        self.assertEqual(rows[0][0], 'PO Number')
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][2], 'sent')
+
+    def test_stock_movements_export(self):
+        rows = self._rows('export_stock_movements', movement_type='sale')
+        self.assertEqual(rows[0][0], 'Date')
+        self.assertEqual([(row[3], row[4], row[5]) for row in rows[1:]], [('sale', '-3', 'SO-E1')])
+
+    def test_bad_dates_are_client_errors(self):
+        for name in ('export_sales', 'export_purchases', 'export_stock_movements'):
+            for value in ('yesterday', '2020-13-01', '2021-02-30'):
+                response = self.client.get(reverse(f'reportin:{name}'), {'date_from': value})
+                self.assertEqual(response.status_code, 400, (name, value))
+                self.assertIn(b'date_from', response.content)
+
+
+class RollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(sku='HAM', name='Hammer', cost_price=6, selling_price=10)
+        cls.customer = Customer.objects.create(name='Customer')
+        cls.supplier = Supplier.objects.create(name='Supplier')
+        cls.today = timezone.localdate()
+        cls.last_week = cls.today - timedelta(days=7)
+
+        orders = SalesOrder.objects.bulk_create([
+            SalesOrder(order_number='SO-R1', customer=cls.customer, status='delivered'),
+            SalesOrder(order_number='SO-R2', customer=cls.customer, status='confirmed'),
+            SalesOrder(order_number='SO-R3', customer=cls.customer, status='draft'), # Not a sale
+        ])
+        SalesOrderItem.objects.bulk_create([
+            SalesOrderItem(order=order, product=cls.product, quantity=2, unit_price=10, subtotal=20)
+            for order in orders
+        ])
+        # SO-R1 was placed last week and hasn't changed since
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        SalesOrder.objects.filter(order_number='SO-R1').update(
+            order_date=timezone.now() - timedelta(days=7), updated_at=an_hour_ago,
+        )
+
+        purchase = PurchaseOrder.objects.create(supplier=cls.supplier, status='sent')
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(order=purchase, product=cls.product, quantity=5, unit_cost=6, subtotal=30),
+        ])
+
+    def test_rollups_match_the_orders(self):
+        refresh_rollups()
+
+        today = DailyProductSales.objects.get(date=self.today, product=self.product)
+        self.assertEqual((today.quantity, today.revenue, today.cost, today.order_count), (2, 20, 12, 1))
+        self.assertEqual(DailyProductSales.objects.get(date=self.last_week).revenue, 20)
+        self.assertEqual(DailyCustomerSales.objects.get(date=self.today, customer=self.customer).order_count, 1)
+        purchases = DailySupplierPurchases.objects.get(supplier=self.supplier)
+        self.assertEqual((purchases.quantity, purchases.cost, purchases.order_count), (5, 30, 1))
+
+    def test_only_changed_days_are_rebuilt(self):
+        refresh_rollups()
+        days, rows = refresh_rollups()
+        # Today's orders are still inside the overlap window; last week's order is not
+        self.assertEqual(days, 1)
+
+        order = SalesOrder.objects.get(order_number='SO-R1')
+        order.status = 'cancelled'
+        order.save()
+        refresh_rollups()
+        self.assertFalse(DailyProductSales.objects.filter(date=self.last_week).exists())
+        self.assertTrue(DailyProductSales.objects.filter(date=self.today).exists())
 
-# Create your tests here.
+    def test_sales_trend_reads_the_rollups(self):
+        refresh_rollups()
+        trend = services.compute_sales_trend(days=3)
+        self.assertEqual(trend['comparison']['current_revenue'], 20)
+        self.assertEqual(trend['comparison']['current_orders'], 1)
+        self.assertEqual([row['date'] for row in trend['by_day']], [self.today])
@@ -0,0 +1,16 @@
+from django.urls import path
+from . import views
+
+app_name = 'reportin'
+
+urlpatterns = [
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('reports/valuation/', views.valuation_report, name='valuation'),
+    path('reports/margins/', views.margin_report, name='margins'),
+    path('reports/low-stock/', views.low_stock_report, name='low_stock'),
+    path('reports/sales-trend/', views.sales_trend_report, name='sales_trend'),
+    path('reports/analytics/<str:report>/', views.analytics_report, name='analytics'),
+    path('reports/export/sales.csv', views.export_sales, name='export_sales'),
+    path('reports/export/purchases.csv', views.export_purchases, name='export_purchases'),
+    path('reports/export/stock-movements.csv', views.export_stock_movements, name='export_stock_movements'),
+]
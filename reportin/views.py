@@ -1,3 +1,98 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 
-# Create your views here.
+from . import exports, services
+
+
+# Bounds of the numeric parameters: nothing negative, and a limited set of cache keys
+MAX_ROWS = 1000
+MAX_THRESHOLD = 100000
+MAX_DAYS = 366
+
+
+def _int_param(request, name, default, low, high):
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return min(max(value, low), high)
+
+
+@staff_member_required
+def dashboard(request):
+    threshold = _int_param(request, 'threshold', 10, 0, MAX_THRESHOLD)
+    context = {
+        'valuation': services.inventory_valuation(),
+        'margins': services.margin_summary(limit=10),
+        'low_stock': services.low_stock(threshold=threshold, limit=50),
+    }
+    return render(request, 'reportin/dashboard.html', context)
+
+
+@staff_member_required
+def valuation_report(request):
+    return JsonResponse(services.inventory_valuation())
+
+
+@staff_member_required
+def margin_report(request):
+    limit = _int_param(request, 'limit', 20, 1, MAX_ROWS)
+    return JsonResponse(services.margin_summary(limit=limit))
+
+
+@staff_member_required
+def low_stock_report(request):
+    threshold = _int_param(request, 'threshold', 10, 0, MAX_THRESHOLD)
+    limit = _int_param(request, 'limit', 100, 1, MAX_ROWS)
+    return JsonResponse(services.low_stock(threshold=threshold, limit=limit))
+
+
+@staff_member_required
+def sales_trend_report(request):
+    days = _int_param(request, 'days', 30, 1, MAX_DAYS)
+    return JsonResponse(services.sales_trend(days=days))
+
+
+@staff_member_required
+def analytics_report(request, report):
+    try:
+        data = services.sales_analytics(
+            report,
+            date_from=request.GET.get('date_from', ''),
+            date_to=request.GET.get('date_to', ''),
+            by=request.GET.get('by', 'product'),
+            period=request.GET.get('period', 'month'),
+            limit=_int_param(request, 'limit', 100, 1, MAX_ROWS),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return JsonResponse(data)
+
+
+def _csv_download(request, name, export):
+    try:
+        rows = export(request.GET)
+    except exports.ExportFilterError as error:
+        return HttpResponseBadRequest(str(error))
+
+    response = StreamingHttpResponse(rows, content_type='text/csv')
+    filename = f"{name}-{timezone.localdate():%Y%m%d}.csv"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_member_required
+def export_sales(request):
+    return _csv_download(request, 'sales', exports.sales_export)
+
+
+@staff_member_required
+def export_purchases(request):
+    return _csv_download(request, 'purchases', exports.purchases_export)
+
+
+@staff_member_required
+def export_stock_movements(request):
+    return _csv_download(request, 'stock-movements', exports.stock_movements_export)
@@ -1,11 +1,15 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from core.admin import LargeTableAdminMixin, SearchIndexAdminMixin
+from inventory.reservations import ReservationFailed
 from .models import Customer
 from .models import SalesOrderItem, SalesOrder
+from .search import customers as customer_search
+from .services import reserve_order_stock
 
 # Register your models here.
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = (
         'name',
         'contact_person',
@@ -16,8 +20,9 @@ class CustomerAdmin(admin.ModelAdmin):
         'is_active'
     )
 
-    # Search box
+    # Search box, answered from the search index (core.search)
     search_fields = ('name', 'email', 'phone', 'contact_person')
+    search_index = customer_search
 
     # Filter in sidebar
     list_filter = ('is_business', 'is_active')
@@ -36,7 +41,7 @@ class CustomerAdmin(admin.ModelAdmin):
         }),
         ('Credit Management', {
 
-            'fields':('credit_limit', 'current_balance')
+            'fields':('credit_limit', 'current_balance', 'open_orders_amount')
         }),
         ('Status', {
 
@@ -44,7 +49,7 @@ class CustomerAdmin(admin.ModelAdmin):
         }),
 
     )
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'open_orders_amount')
     list_per_page = 20
 
 
@@ -55,9 +60,14 @@ class SalesOrderItemInline(admin.TabularInline):
     extra = 1
     fields = ('product', 'quantity', 'unit_price', 'subtotal')
     readonly_fields = ('subtotal', )
+    autocomplete_fields = ('product',) # Search box instead of a <select> with every product
+
+    def get_queryset(self, request):
+        # Each row's title shows the product name
+        return super().get_queryset(request).select_related('product')
 
 @admin.register(SalesOrder)
-class SalesOrderAdmin(admin.ModelAdmin):
+class SalesOrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = (
         'order_number',
         'customer',
@@ -71,6 +81,11 @@ class SalesOrderAdmin(admin.ModelAdmin):
     # Filters
     list_filter = ('status', 'order_date')
 
+    # Load the customer in the same query, and only the columns shown in the list
+    list_select_related = ('customer',)
+    list_only_fields = ('order_number', 'customer', 'customer__name', 'customer__is_business', 'order_date', 'status', 'total_amount')
+    autocomplete_fields = ('customer',)
+
 
     readonly_fields = (
         'order_number',
@@ -82,6 +97,18 @@ class SalesOrderAdmin(admin.ModelAdmin):
     )
 
     inlines = [SalesOrderItemInline]
+    actions = ['reserve_stock']
+
+    @admin.action(description='Reserve stock for selected draft orders')
+    def reserve_stock(self, request, queryset):
+        reserved = 0
+        for order in queryset.filter(status='draft'):
+            try:
+                reserve_order_stock(order)
+                reserved += 1
+            except ReservationFailed as error:
+                self.message_user(request, f'{order.order_number}: not enough stock for {len(error.failed)} products', messages.WARNING)
+        self.message_user(request, f'Reserved stock for {reserved} orders')
 
 
     fieldsets = (
@@ -0,0 +1,45 @@
+from django.db.models import Prefetch
+from rest_framework import viewsets
+
+from core.api import ConditionalGetMixin, IdCursorPagination, TypeAheadMixin, id_param, requested_fields
+from .models import Customer, SalesOrder, SalesOrderItem
+from .search import customers as customer_search
+from .serializers import CustomerSerializer, SalesOrderSerializer
+
+
+class CustomerViewSet(TypeAheadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Customers, newest first. Filter with ?is_active=true|false. Type-ahead: /customers/search/?q="""
+    serializer_class = CustomerSerializer
+    pagination_class = IdCursorPagination
+    search_index = customer_search
+    typeahead_fields = ('id', 'name', 'email', 'phone', 'is_active')
+
+    def get_queryset(self):
+        customers = Customer.objects.all()
+        if self.request.query_params.get('is_active') in ('true', 'false'):
+            customers = customers.filter(is_active=self.request.query_params['is_active'] == 'true')
+        return customers
+
+
+class SalesOrderViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Sales orders with their items, newest first. Filter with ?customer=<id>, ?status="""
+    serializer_class = SalesOrderSerializer
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        orders = SalesOrder.objects.all()
+        params = self.request.query_params
+
+        customer_id = id_param(self.request, 'customer')
+        if customer_id is not None:
+            orders = orders.filter(customer_id=customer_id)
+        if params.get('status'):
+            orders = orders.filter(status=params['status'])
+
+        # Items (and their SKUs) in one extra query per page, and only when asked for
+        fields = requested_fields(self.request)
+        if fields is None or 'items' in fields:
+            orders = orders.prefetch_related(
+                Prefetch('items', queryset=SalesOrderItem.objects.select_related('product').order_by('id'))
+            )
+        return orders
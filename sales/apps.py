@@ -8,4 +8,5 @@ class SalesConfig(AppConfig):
 
 
     def ready(self):
-        import sales.signals
\ No newline at end of file
+        import sales.signals
+        import sales.services  # Registers the background job handlers
@@ -0,0 +1,53 @@
+"""
+Recompute Customer.open_orders_amount from the orders themselves.
+
+The figure is maintained incrementally as orders are saved; run this after
+data fixes or imports, or nightly as a safety net.
+
+    python manage.py reconcile_customer_exposure
+    python manage.py reconcile_customer_exposure --dry-run
+"""
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from sales.models import Customer, SalesOrder
+
+
+class Command(BaseCommand):
+    help = "Recompute customers' open order exposure with one grouped aggregate"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report differences')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = dict(
+                SalesOrder.objects.filter(status__in=SalesOrder.OPEN_STATUSES)
+                .values('customer_id')
+                .annotate(total=Sum('total_amount'))
+                .values_list('customer_id', 'total')
+            )
+
+            # Customers whose stored figure is off: anyone with open orders, or a non-zero figure
+            wrong = []
+            now = timezone.now()
+            customers = Customer.objects.only('id', 'open_orders_amount').iterator(chunk_size=options['batch_size'])
+            for customer in customers:
+                total = Decimal(str(expected.get(customer.id) or 0)).quantize(Decimal('0.01'))
+                if Decimal(str(customer.open_orders_amount)) != total:
+                    self.stdout.write(f"Customer {customer.id}: {customer.open_orders_amount} -> {total}")
+                    customer.open_orders_amount = total
+                    customer.updated_at = now
+                    wrong.append(customer)
+
+            if not options['dry_run']:
+                Customer.objects.bulk_update(wrong, ['open_orders_amount', 'updated_at'], batch_size=options['batch_size'])
+
+        action = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f"{action} {len(wrong)} customers with a wrong open order amount"))
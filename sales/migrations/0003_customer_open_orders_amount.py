@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_salesorder_salesorderitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='open_orders_amount',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, help_text='Total of confirmed orders not yet delivered (kept up to date on status changes)', max_digits=12),
+        ),
+    ]
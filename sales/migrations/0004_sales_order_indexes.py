@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_customer_open_orders_amount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['order_date'], name='sales_sales_order_d_55e46c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['status', 'order_date'], name='sales_sales_status_fc0419_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['customer', 'order_date'], name='sales_sales_custome_23226b_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_sales_order_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['updated_at'], name='sales_sales_updated_df8d5a_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Full-text index of sales_customer for core.search (the SQL is frozen here, so
+# later changes to core.search don't change what this migration did)
+CREATE = {
+    # FTS5 table over the columns, kept in sync by triggers, then filled from the table
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS sales_customer_search USING fts5("
+        "name, contact_person, email, phone, content='sales_customer', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6')",
+
+        "CREATE TRIGGER IF NOT EXISTS sales_customer_search_insert AFTER INSERT ON sales_customer BEGIN "
+        "INSERT INTO sales_customer_search(rowid, name, contact_person, email, phone) "
+        "VALUES (new.id, new.name, new.contact_person, new.email, new.phone); END",
+
+        "CREATE TRIGGER IF NOT EXISTS sales_customer_search_delete AFTER DELETE ON sales_customer BEGIN "
+        "INSERT INTO sales_customer_search(sales_customer_search, rowid, name, contact_person, email, phone) "
+        "VALUES ('delete', old.id, old.name, old.contact_person, old.email, old.phone); END",
+
+        "CREATE TRIGGER IF NOT EXISTS sales_customer_search_update "
+        "AFTER UPDATE OF name, contact_person, email, phone ON sales_customer BEGIN "
+        "INSERT INTO sales_customer_search(sales_customer_search, rowid, name, contact_person, email, phone) "
+        "VALUES ('delete', old.id, old.name, old.contact_person, old.email, old.phone); "
+        "INSERT INTO sales_customer_search(rowid, name, contact_person, email, phone) "
+        "VALUES (new.id, new.name, new.contact_person, new.email, new.phone); END",
+
+        "INSERT INTO sales_customer_search(sales_customer_search) VALUES ('rebuild')",
+    ],
+    # Trigram index on the columns joined together
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS sales_customer_search ON sales_customer USING gin (("
+        "coalesce(\"name\", '') || ' ' || coalesce(\"contact_person\", '') || ' ' || "
+        "coalesce(\"email\", '') || ' ' || coalesce(\"phone\", '')"
+        ") gin_trgm_ops)",
+    ],
+}
+
+DROP = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS sales_customer_search_insert",
+        "DROP TRIGGER IF EXISTS sales_customer_search_delete",
+        "DROP TRIGGER IF EXISTS sales_customer_search_update",
+        "DROP TABLE IF EXISTS sales_customer_search",
+    ],
+    'postgresql': [
+        "DROP INDEX IF EXISTS sales_customer_search",
+    ],
+}
+
+
+def run_for_vendor(statements):
+    # Other databases have no index: core.search falls back to icontains
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_sales_order_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_for_vendor(CREATE), run_for_vendor(DROP)),
+    ]
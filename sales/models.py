@@ -1,6 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, EmailValidator
+from django.utils import timezone
 from decimal import Decimal
+from core.models import TrackedFieldsModel
+from core.sequences import next_value, next_values
 # Create your models here.
 
 class Customer(models.Model):
@@ -13,6 +18,7 @@ class Customer(models.Model):
     is_business = models.BooleanField(default=False, verbose_name='Business Customer', help_text="Check if this is a business (not individual)")
     credit_limit = models.DecimalField(max_digits=12, decimal_places=2, default=10000.00, validators=[MinValueValidator(Decimal('0.00'))], help_text="Maximum amount customer can owe")
     current_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text="Amount currently owed by customer")
+    open_orders_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, editable=False, help_text="Total of confirmed orders not yet delivered (kept up to date on status changes)")
     is_active = models.BooleanField(default=True, help_text="Deactivate instead of deleting")
     created_at = models.DateTimeField(auto_now_add=True, editable=False) # Set when created, and can't edit maually
     updated_at = models.DateTimeField(auto_now=True, editable=False)
@@ -23,11 +29,23 @@ class Customer(models.Model):
             return f"{self.name} (Business)"
         return f"{self.name} (Individual)"
 
+    def credit_exposure(self):
+        # What the customer owes plus what is committed in open orders
+        return Decimal(str(self.current_balance)) + Decimal(str(self.open_orders_amount))
+
     def available_credit(self):
-        return self.credit_limit - self.current_balance
+        return Decimal(str(self.credit_limit)) - self.credit_exposure()
     
     def can_purchase(self, amount):
         return (self.is_active and self.available_credit() >= amount)
+
+    @classmethod
+    def move_open_orders_amount(cls, customer_id, amount):
+        """Add `amount` to a customer's open_orders_amount in the database (and touch updated_at, for the API ETags)"""
+        cls.objects.filter(pk=customer_id).update(
+            open_orders_amount=F('open_orders_amount') + amount,
+            updated_at=timezone.now(),
+        )
     
     class Meta:
         verbose_name = 'Customer'
@@ -40,7 +58,7 @@ class Customer(models.Model):
         ]
 
 
-class SalesOrder(models.Model):
+class SalesOrder(TrackedFieldsModel):
     STATUS_CHOICES = [
         ('draft', 'Draft'),          # Just created, not finalized
         ('confirmed', 'Confirmed'),  # Order is confirmed
@@ -49,6 +67,10 @@ class SalesOrder(models.Model):
         ('delivered', 'Delivered'),  # Customer received
         ('cancelled', 'Cancelled')
     ]
+    NUMBER_SEQUENCE = 'sales_order' # Name of the core.Sequence row used for order numbers
+    OPEN_STATUSES = ('confirmed', 'processing', 'shipped') # Count towards the customer's credit exposure
+    SOLD_STATUSES = OPEN_STATUSES + ('delivered',) # Count as sales in reports
+    tracked_fields = ('status', 'customer_id', 'total_amount') # What the customer's exposure depends on
 
     order_number = models.CharField(max_length=20, unique=True, editable=False, verbose_name='Order Number')
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='orders')
@@ -63,36 +85,121 @@ class SalesOrder(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
-    def __srt__(self):
+    def __str__(self):
         return f"{self.order_number} - {self.customer.name}"
     
     def save(self, *args, **kwargs):
         if not self.order_number:
-            last_order = SalesOrder.objects.order_by('id').last() # Get the last order num
-            if last_order:
-                try:
-                    last_num = int(last_order.order_number.split('-')[1])
-                    new_num = last_num + 1
-                except (ValueError, IndexError):
-                    new_num = 1
-                
-            else:
-                new_num = 1
-            
-            self.order_number = f"SO-{new_num:03d}"
-
-        super().save(*args, **kwargs)
+            self.order_number = self.format_order_number(next_value(self.NUMBER_SEQUENCE))
+
+        with transaction.atomic():
+            self._update_customer_exposure(kwargs.get('update_fields'))
+            super().save(*args, **kwargs)
+
+    def _update_customer_exposure(self, update_fields=None):
+        # Customer.open_orders_amount holds the stored totals of the open orders: move it by
+        # what this save changes (status, total or customer) since the order was loaded
+        old = self.get_loaded_values()
+        if old and not all(name in old for name in self.tracked_fields):
+            # Loaded with only()/defer(): read the rest
+            stored = SalesOrder.objects.filter(pk=self.pk).values(*self.tracked_fields).get()
+            old = {**stored, **old}
+
+        new = {'customer_id': self.customer_id, 'status': self.status, 'total_amount': self.total_amount}
+        if old and update_fields is not None:
+            written = set(update_fields)
+            for key, name in (('customer_id', 'customer'), ('status', 'status'), ('total_amount', 'total_amount')):
+                if key not in written and name not in written:
+                    new[key] = old[key]
+
+        changes = {}
+        if old and old['status'] in self.OPEN_STATUSES:
+            changes[old['customer_id']] = -Decimal(str(old['total_amount']))
+        if new['status'] in self.OPEN_STATUSES:
+            changes[new['customer_id']] = changes.get(new['customer_id'], 0) + Decimal(str(new['total_amount']))
+
+        for customer_id, amount in changes.items():
+            if amount:
+                Customer.move_open_orders_amount(customer_id, amount)
     
+    @classmethod
+    def format_order_number(cls, number):
+        return f"SO-{number:03d}"
+
+    @classmethod
+    def allocate_order_numbers(cls, count):
+        """Reserve `count` order numbers at once (for bulk creation)"""
+        return [cls.format_order_number(number) for number in next_values(cls.NUMBER_SEQUENCE, count)]
+
     def calculate_totals(self):
-        items = self.items.all()
-        self.subtotal = sum(item.subtotal for item in items)
-        self.total_amount = self.subtotal + self.tax_amount
-        self.save()
+        # Let the database add up the lines instead of loading every item
+        self.subtotal = self.items.aggregate(total=Sum('subtotal'))['total'] or Decimal('0.00')
+        self.total_amount = self.subtotal + Decimal(str(self.tax_amount))
+        self.updated_at = timezone.now()
+
+        with transaction.atomic():
+            if self.status in self.OPEN_STATUSES:
+                # Lines changed on an open order: move the customer's exposure by the difference
+                old_total = SalesOrder.objects.select_for_update().filter(pk=self.pk).values_list('total_amount', flat=True).get()
+                Customer.move_open_orders_amount(self.customer_id, self.total_amount - old_total)
+
+            # Write only the totals, without firing the header save signals again
+            SalesOrder.objects.filter(pk=self.pk).update(
+                subtotal=self.subtotal,
+                total_amount=self.total_amount,
+                updated_at=self.updated_at,
+            )
+        # The stored total is the new one now, so a later save doesn't count the change again
+        self._snapshot_tracked_fields(['total_amount'])
+
+    def add_items(self, lines, batch_size=500):
+        """
+        Add many lines to the order at once (EDI imports, etc).
+
+        `lines` is an iterable of dicts with `product`, `quantity` and an
+        optional `unit_price` (defaults to the product's selling price).
+        All lines are inserted with bulk_create and the totals are
+        recalculated a single time at the end.
+        """
+        items = []
+        for index, line in enumerate(lines):
+            product = line['product']
+            quantity = line.get('quantity', 1)
+            unit_price = line.get('unit_price')
+            if unit_price is None:
+                unit_price = product.selling_price
+            unit_price = Decimal(str(unit_price))
+
+            # bulk_create skips the field validators, so check them here
+            if quantity < 1:
+                raise ValidationError(f"Line {index + 1}: quantity must be at least 1")
+            if unit_price < Decimal('0.01'):
+                raise ValidationError(f"Line {index + 1}: unit price must be at least 0.01")
+
+            items.append(SalesOrderItem(
+                order=self,
+                product=product,
+                quantity=quantity,
+                unit_price=unit_price,
+                subtotal=quantity * unit_price,
+            ))
+
+        with transaction.atomic():
+            created = SalesOrderItem.objects.bulk_create(items, batch_size=batch_size)
+            self.calculate_totals()
+
+        return created
 
     class Meta:
         verbose_name = 'Sales Order'
         verbose_name_plural = 'Sales Orders'
         ordering = ['-order_date']
+        indexes = [
+            models.Index(fields=['order_date']), # Default ordering / date hierarchy
+            models.Index(fields=['status', 'order_date']), # Admin status filter, open orders
+            models.Index(fields=['customer', 'order_date']), # Per-customer order history
+            models.Index(fields=['updated_at']), # Orders changed since the rollups last ran
+        ]
 
 class SalesOrderItem(models.Model):
     order = models.ForeignKey(SalesOrder, on_delete=models.CASCADE, related_name='items')
@@ -0,0 +1,9 @@
+"""
+Search index of the customers (see core.search): name, contact, email and phone
+"""
+
+from core.search import SearchIndex
+from .models import Customer
+
+# Same columns, in the same order, as migration 0006_customer_search_index
+customers = SearchIndex(Customer, {'name': 10.0, 'contact_person': 5.0, 'email': 3.0, 'phone': 3.0})
@@ -0,0 +1,34 @@
+from rest_framework import serializers
+
+from core.api import SparseFieldsSerializerMixin
+from .models import Customer, SalesOrder, SalesOrderItem
+
+
+class CustomerSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Customer
+        fields = (
+            'id', 'name', 'contact_person', 'email', 'phone', 'address', 'tax_id',
+            'is_business', 'credit_limit', 'current_balance', 'open_orders_amount', 'is_active',
+            'created_at', 'updated_at',
+        )
+
+
+class SalesOrderItemSerializer(serializers.ModelSerializer):
+    sku = serializers.CharField(source='product.sku', read_only=True)
+
+    class Meta:
+        model = SalesOrderItem
+        fields = ('id', 'product', 'sku', 'quantity', 'unit_price', 'subtotal')
+
+
+class SalesOrderSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    items = SalesOrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = SalesOrder
+        fields = (
+            'id', 'order_number', 'customer', 'order_date', 'status',
+            'subtotal', 'tax_amount', 'total_amount', 'notes',
+            'created_at', 'updated_at', 'items',
+        )
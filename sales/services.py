@@ -0,0 +1,105 @@
+"""
+Services for Sales app
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Sum
+
+from core.jobs import job
+from inventory import cache as product_cache, reservations
+from inventory.models import Product, StockMovement
+from inventory.services import adjust_stock
+from .models import Customer, SalesOrder
+
+logger = logging.getLogger(__name__)
+
+
+def place_order(customer_id, lines, notes='', created_by_id=None):
+    """
+    Create a draft sales order with all its lines in one transaction, and
+    reserve the stock for it (raises reservations.ReservationFailed, and
+    creates nothing, when the stock isn't available).
+
+    `lines` is a list of dicts with `product` (id), `quantity` and an
+    optional `unit_price`.
+    """
+    with transaction.atomic():
+        customer = Customer.objects.get(pk=customer_id)
+        # Names and prices only; the stock is checked by reserve_order_stock()
+        products, _ = product_cache.get_many(ids=[line['product'] for line in lines])
+
+        order = SalesOrder.objects.create(customer=customer, notes=notes, created_by_id=created_by_id)
+        order.add_items([
+            {
+                'product': products[line['product']],
+                'quantity': line['quantity'],
+                'unit_price': line.get('unit_price'),
+            }
+            for line in lines
+        ])
+        reserve_order_stock(order)
+    return order
+
+
+def reserve_order_stock(order, ttl=None):
+    """Reserve the stock for every line of a (draft) order in one batch"""
+    lines = order.items.values_list('product_id', 'quantity')
+    return reservations.reserve(lines, reference=order.order_number, ttl=ttl)
+
+
+@job('sales.order_status_changed')
+def apply_order_status_change(order_id, old_status, new_status):
+    """Adjust stock for a sales order status change (runs as a background job)"""
+    with transaction.atomic():
+        # Re-read under lock: if the order has moved on since, the later job applies its own change
+        order = SalesOrder.objects.select_for_update().get(pk=order_id)
+        if order.status != new_status:
+            logger.info("Order %s: skipping %s -> %s, the order is now %s", order.order_number, old_status, new_status, order.status)
+            return
+
+        lines = list(order.items.values_list('product_id', 'quantity'))
+
+        if new_status == 'confirmed' and old_status != 'confirmed':
+            logger.info("Order %s: reducing stock for %d items", order.order_number, len(lines))
+
+            # Stock held for this order becomes available to it again right before it is taken
+            reservations.consume(order.order_number)
+
+            failed = adjust_stock(
+                [(product_id, -quantity) for product_id, quantity in lines],
+                movement_type='sale',
+                reference=order.order_number,
+                notes=f'Sales Order {order.order_number}',
+            )
+
+            if failed:
+                names = Product.objects.filter(pk__in=[product_id for product_id, quantity in failed]).values_list('name', flat=True)
+                for name in names:
+                    logger.warning("Order %s: not enough %s in stock", order.order_number, name)
+
+        elif old_status == 'confirmed' and new_status == 'cancelled':
+            # Only give back what this order actually took out (lines that
+            # failed for lack of stock at confirmation were never removed)
+            taken = (
+                StockMovement.objects
+                .filter(reference=order.order_number, movement_type__in=['sale', 'return'])
+                .values('product_id')
+                .annotate(net=Sum('quantity'))
+                .filter(net__lt=0)
+                .values_list('product_id', 'net')
+            )
+            returns = [(product_id, -net) for product_id, net in taken]
+            logger.info("Order %s: adding back stock for %d items", order.order_number, len(returns))
+
+            adjust_stock(
+                returns,
+                movement_type='return',
+                reference=order.order_number,
+                notes=f'Order cancelled: {order.order_number}',
+            )
+
+        if new_status == 'cancelled':
+            # Whatever the order still holds (e.g. its confirmation was skipped as stale)
+            reservations.release(order.order_number)
@@ -3,77 +3,33 @@ SIGNALS FOR Sales app
 Auto update inventory when orders change
 """
 
-from django.db.models.signals import post_save, pre_save
+import logging
+from decimal import Decimal
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import SalesOrder
-from inventory.models import Product, StockMovement
+from .models import Customer, SalesOrder
+from core.jobs import enqueue_status_change
+from core.metrics import timed_receiver
+from core.signals import status_changed
 
-@receiver(pre_save, sender=SalesOrder)
-def update_inventory_on_status_change(sender, instance, **kwargs):
-    if not instance.pk:
-        return 
-    
-    try:
+logger = logging.getLogger(__name__)
 
-        old_order = SalesOrder.objects.get(pk=instance.pk)
-        old_status = old_order.status
-        new_status = instance.status
-
-    except SalesOrder.DoesNotExist:
-        return
-    
-    if old_order != new_status:
-        print(f"Order {instance.order_number} changed from {old_status} to {new_status}")
-        items = instance.items.all()
-
-        if new_status == 'confirmed' and old_status != 'confirmed':
-            print(f" -> Reducing stock for {items.count()} items")
-
-            for item in items:
-                product = items.product
-                old_stock = product.current_stock
-
-                if product.current_stock >= item.quantity:
-                    # Reduce stock
-                    product.current_stock -= item.quantity
-                    product.save()
-
-
-                    StockMovement.objects.create(
-                        product=product,
-                        warehouse = product.warehouse if hasattr(product, 'warehouse') else None,
-                        movement_type = 'sale',
-                        quantity = -item.quantity,
-                        reference =instance.order_number,
-                        notes = f'Sales Order {instance.order_number}'
-                    )
-                    print(f"        -{product.name}: {old_stock} -> {product.current_stock}")
-                else:
-                    print(f"    ERROR: Not enough {product.name} in stock!")
-        elif old_status == 'confirmed' and new_status == 'cancelled':
-            print(f"    -> Adding back stock for {items.count()} items")
-
-            for item in items:
-                product = item.product
-                old_stock = product.current_stock
-
-                
-                product.current_stock += item.quantity
-                product.save()
-
-
-                StockMovement.objects.create(
-                    product = product,
-                    warehouse = product.warehouse if hasattr(product, 'warehouse') else None,
-                    movement_type = 'return',
-                    quantity = item.quantity ,
-                    reference = instance.order_number,
-                    notes = f'Order cancelled: {instance.order_number}'
-                )
-
-                print(f"    + {product.name}: {old_stock} -> {product.current_stock}")
+@receiver(status_changed, sender=SalesOrder)
+@timed_receiver
+def queue_inventory_update_on_status_change(sender, instance, old_status, new_status, **kwargs):
+    # Stock is adjusted by a background job (manage.py run_jobs), so saving returns right away
+    logger.info("Order %s changed from %s to %s", instance.order_number, old_status, new_status)
+    enqueue_status_change('sales.order_status_changed', instance, old_status, new_status)
 
 @receiver(post_save, sender=SalesOrder)
+@timed_receiver
 def update_order_totals(sender, instance, created, **kwargs):
     if created or instance.status == 'draft':
-        instance.calculate_totals()
\ No newline at end of file
+        instance.calculate_totals()
+
+@receiver(post_delete, sender=SalesOrder)
+@timed_receiver
+def update_customer_exposure_on_delete(sender, instance, **kwargs):
+    # A deleted open order no longer counts towards the customer's exposure
+    if instance.status in SalesOrder.OPEN_STATUSES and instance.total_amount:
+        Customer.move_open_orders_amount(instance.customer_id, -Decimal(str(instance.total_amount)))
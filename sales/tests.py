@@ -1,3 +1,418 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipIf
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomerUser
+from core.jobs import run_pending_jobs
+from core.models import Job
+from core.testing import QueryPlanTestMixin
+from inventory import cache as product_cache
+from inventory.models import Product, StockMovement
+from inventory.services import adjust_stock
+from .models import Customer, SalesOrder
+from .services import place_order
+from . import views
+from .views import PayloadError, _parse_payload
+
+# Session, user, count, page of rows
+SALES_ORDER_CHANGELIST_QUERY_BUDGET = 5
+
+
+class SalesOrderAdminQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        customers = Customer.objects.bulk_create([Customer(name=f'Customer {i}') for i in range(10)])
+        numbers = SalesOrder.allocate_order_numbers(120)
+        SalesOrder.objects.bulk_create([
+            SalesOrder(order_number=number, customer=customers[i % 10])
+            for i, number in enumerate(numbers)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_changelist_stays_within_query_budget(self):
+        url = reverse('admin:sales_salesorder_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), SALES_ORDER_CHANGELIST_QUERY_BUDGET, [q['sql'] for q in queries])
+
+
+class SalesOrderQueryPlanTest(QueryPlanTestMixin, TestCase):
+    """The hot order queries must stay on an index as the table grows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        customers = Customer.objects.bulk_create([Customer(name=f'Customer {i}') for i in range(20)])
+        statuses = [status for status, _ in SalesOrder.STATUS_CHOICES]
+        numbers = SalesOrder.allocate_order_numbers(500)
+        SalesOrder.objects.bulk_create([
+            SalesOrder(order_number=number, customer=customers[i % 20], status=statuses[i % len(statuses)])
+            for i, number in enumerate(numbers)
+        ])
+        cls.customer = customers[0]
+        cls.now = timezone.now()
+
+    def test_changelist_page(self):
+        queryset = SalesOrder.objects.order_by('-order_date', '-pk')[:100]
+        self.assertNoFullScan(queryset)
+        self.assertNoSort(queryset)
+
+    def test_status_filter(self):
+        queryset = SalesOrder.objects.filter(status='confirmed').order_by('-order_date', '-pk')[:100]
+        self.assertNoFullScan(queryset)
+        self.assertNoSort(queryset)
+
+    def test_date_range_filter(self):
+        queryset = SalesOrder.objects.filter(order_date__gte=self.now - timedelta(days=30), order_date__lt=self.now)
+        self.assertNoFullScan(queryset)
+
+    def test_customer_history(self):
+        queryset = SalesOrder.objects.filter(customer=self.customer).order_by('-order_date', '-pk')
+        self.assertNoFullScan(queryset)
+        self.assertNoSort(queryset)
+
+    def test_open_orders_per_customer(self):
+        queryset = (
+            SalesOrder.objects.filter(status__in=SalesOrder.OPEN_STATUSES)
+            .values('customer').annotate(total=Sum('total_amount')).order_by()
+        )
+        self.assertNoFullScan(queryset)
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and connection.is_in_memory_db(),
+    'The writer threads need a database file they can share',
+)
+class ConcurrentWritersTest(TransactionTestCase):
+    """Orders and stock changes written from several threads at once must neither fail nor lose updates."""
+
+    WRITERS = 4
+    ROUNDS = 5
+    INITIAL_STOCK = 1000
+
+    def setUp(self):
+        # bulk_create sends no post_save, and the flushed tables hand out the same ids again
+        product_cache.clear()
+        self.customer = Customer.objects.create(name='Customer', credit_limit=10 ** 6)
+        self.products = Product.objects.bulk_create([
+            Product(sku=f'SKU-{i}', name=f'Product {i}', selling_price=10, current_stock=self.INITIAL_STOCK)
+            for i in range(5)
+        ])
+
+    def run_threads(self, targets):
+        errors = []
+
+        def run(target, writer):
+            try:
+                target(writer)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=(target, writer))
+            for target in targets for writer in range(self.WRITERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def place_orders(self, writer):
+        for _ in range(self.ROUNDS):
+            place_order(self.customer.pk, [{'product': product.pk, 'quantity': 2} for product in self.products])
+
+    def restock(self, writer):
+        for round in range(self.ROUNDS):
+            adjust_stock(
+                [(product.pk, 1) for product in self.products],
+                movement_type='adjustment',
+                reference=f'ADJ-{writer}-{round}',
+            )
+
+    def test_parallel_orders_and_stock_adjustments(self):
+        self.run_threads([self.place_orders, self.restock])
+
+        writes = self.WRITERS * self.ROUNDS
+        self.assertEqual(SalesOrder.objects.count(), writes)
+        self.assertEqual(SalesOrder.objects.values('order_number').distinct().count(), writes)
+        for product in Product.objects.filter(pk__in=[product.pk for product in self.products]):
+            self.assertEqual(product.reserved_stock, 2 * writes)
+            self.assertEqual(product.current_stock, self.INITIAL_STOCK + writes)
+            ledger = sum(StockMovement.objects.filter(product=product).values_list('quantity', flat=True))
+            self.assertEqual(ledger, writes)
+
+
+class OrderStatusJobTest(TestCase):
+    """Status change jobs are queued once per transition and skipped once the order has moved on"""
+
+    def setUp(self):
+        product_cache.clear()
+        self.product = Product.objects.create(sku='JOB-1', name='Product', selling_price=10, current_stock=10)
+        self.order = SalesOrder.objects.create(customer=Customer.objects.create(name='Customer', credit_limit=10 ** 6))
+        self.order.add_items([{'product': self.product, 'quantity': 2}])
+
+    def test_same_change_saved_twice_queues_one_job(self):
+        first, second = SalesOrder.objects.get(pk=self.order.pk), SalesOrder.objects.get(pk=self.order.pk)
+        for order in (first, second):
+            order.status = 'confirmed'
+            order.save()
+
+        self.assertEqual(Job.objects.filter(group=self.order.order_number).count(), 1)
+        run_pending_jobs()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 8)
+
+    def test_repeated_transition_queues_a_new_job(self):
+        for status in ('confirmed', 'draft', 'confirmed'):
+            self.order.status = status
+            self.order.save()
+        self.assertEqual(Job.objects.filter(group=self.order.order_number).count(), 3)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_inline_jobs_run_after_the_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.status = 'confirmed'
+            self.order.save()
+
+        self.assertFalse(Job.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 8)
+
+    def test_cancel_releases_the_reservation_after_a_skipped_confirmation(self):
+        order = place_order(self.order.customer_id, [{'product': self.product.pk, 'quantity': 4}])
+        for status in ('confirmed', 'cancelled'):
+            order.status = status
+            order.save()
+
+        run_pending_jobs()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.current_stock, self.product.reserved_stock), (10, 0))
+
+    def test_stale_change_is_skipped(self):
+        for status in ('confirmed', 'cancelled'):
+            self.order.status = status
+            self.order.save()
+
+        self.assertEqual(run_pending_jobs(), (2, 0))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 10)
+        self.assertFalse(StockMovement.objects.filter(reference=self.order.order_number).exists())
+
+
+class CustomerExposureTest(TestCase):
+    """Customer.open_orders_amount follows the totals of the customer's open orders"""
+
+    def setUp(self):
+        product_cache.clear()
+        self.first = Customer.objects.create(name='First', credit_limit=10 ** 6)
+        self.second = Customer.objects.create(name='Second', credit_limit=10 ** 6)
+        self.product = Product.objects.create(sku='EXP-1', name='Product', selling_price=10, current_stock=100)
+
+    def exposure(self):
+        return [customer.open_orders_amount for customer in Customer.objects.filter(pk__in=[self.first.pk, self.second.pk]).order_by('pk')]
+
+    def test_open_order_changes(self):
+        order = SalesOrder.objects.create(customer=self.first)
+        order.add_items([{'product': self.product, 'quantity': 2}])
+        order.status = 'confirmed'
+        order.save()
+        self.assertEqual(self.exposure(), [Decimal('20.00'), Decimal('0.00')])
+
+        order.tax_amount = Decimal('5.00')
+        order.total_amount = Decimal('25.00')
+        order.save()
+        self.assertEqual(self.exposure(), [Decimal('25.00'), Decimal('0.00')])
+
+        order.customer = self.second
+        order.save()
+        self.assertEqual(self.exposure(), [Decimal('0.00'), Decimal('25.00')])
+
+        order.status = 'delivered'
+        order.save()
+        self.assertEqual(self.exposure(), [Decimal('0.00'), Decimal('0.00')])
+
+    def test_order_created_open(self):
+        # The total comes from the lines, none yet
+        order = SalesOrder.objects.create(customer=self.first, status='confirmed', total_amount=Decimal('40.00'))
+        self.assertEqual(self.exposure(), [Decimal('0.00'), Decimal('0.00')])
+
+        order.add_items([{'product': self.product, 'quantity': 4}])
+        self.assertEqual(self.exposure(), [Decimal('40.00'), Decimal('0.00')])
+
+    def test_deleting_an_open_order(self):
+        order = SalesOrder.objects.create(customer=self.first, status='confirmed')
+        order.add_items([{'product': self.product, 'quantity': 3}])
+        SalesOrder.objects.get(pk=order.pk).delete()
+        self.assertEqual(self.exposure(), [Decimal('0.00'), Decimal('0.00')])
+
+    def test_saves_that_change_nothing_read_no_row(self):
+        order = SalesOrder.objects.create(customer=self.first, status='confirmed')
+        order.add_items([{'product': self.product, 'quantity': 1}])
+        order = SalesOrder.objects.get(pk=order.pk)
+
+        order.notes = 'Leave at the door'
+        with CaptureQueriesContext(connection) as captured:
+            order.save()
+        sql = ' '.join(query['sql'] for query in captured)
+        self.assertNotIn('sales_customer', sql)
+        self.assertNotIn('FOR UPDATE', sql)
+        self.assertEqual(self.exposure(), [Decimal('10.00'), Decimal('0.00')])
+
+    def test_exposure_change_refreshes_the_customer_etag(self):
+        user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        url = f'/api/v1/customers/{self.first.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        order = SalesOrder.objects.create(customer=self.first)
+        order.add_items([{'product': self.product, 'quantity': 1}])
+        order.status = 'confirmed'
+        order.save()
+
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['open_orders_amount'], '10.00')
+
+    def test_reconcile_command(self):
+        order = SalesOrder.objects.create(customer=self.first, status='confirmed')
+        order.add_items([{'product': self.product, 'quantity': 2}])
+        Customer.objects.filter(pk=self.first.pk).update(open_orders_amount=5)
+        Customer.objects.filter(pk=self.second.pk).update(open_orders_amount=7)
+
+        out = StringIO()
+        call_command('reconcile_customer_exposure', dry_run=True, stdout=out)
+        self.assertIn('Found 2 customers', out.getvalue())
+        self.assertEqual(self.exposure(), [Decimal('5.00'), Decimal('7.00')])
+
+        call_command('reconcile_customer_exposure', stdout=StringIO())
+        self.assertEqual(self.exposure(), [Decimal('20.00'), Decimal('0.00')])
+
+
+class OrderPayloadTest(TestCase):
+    def payload(self, line, customer=1):
+        return json.dumps({'customer': customer, 'lines': [{'product': 1, 'quantity': 1, **line}]})
+
+    def test_rejects_non_finite_prices_and_booleans(self):
+        for body in (
+            self.payload({'unit_price': 'NaN'}),
+            self.payload({'unit_price': 'Infinity'}),
+            self.payload({'quantity': True}),
+            self.payload({'product': True}),
+            self.payload({}, customer=True),
+        ):
+            with self.subTest(body=body), self.assertRaises(PayloadError):
+                _parse_payload(body)
+
+        customer, lines, notes = _parse_payload(self.payload({'unit_price': '2.50'}))
+        self.assertEqual(lines[0]['unit_price'], Decimal('2.50'))
+
+
+class CreateOrderViewTest(TransactionTestCase):
+    """The order is written by a pool thread, which only sees committed rows"""
+
+    def setUp(self):
+        product_cache.clear()
+        self.user = CustomerUser.objects.create_user('clerk', 'clerk@example.com', 'password', is_staff=True)
+        self.customer = Customer.objects.create(name='Customer', credit_limit=100)
+        self.hammer = Product.objects.create(sku='HAM', name='Hammer', selling_price=10, current_stock=5)
+        self.url = reverse('sales:create_order')
+
+    def post(self, payload, token=True):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'} if token else {}
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json', **headers)
+
+    def order(self, quantity=2, **line):
+        return {'customer': self.customer.pk, 'lines': [{'product': self.hammer.pk, 'quantity': quantity, **line}]}
+
+    def test_authentication_required(self):
+        self.assertEqual(self.post(self.order(), token=False).status_code, 401)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.post(self.order()).status_code, 401)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.post({'customer': self.customer.pk, 'lines': []}).status_code, 400)
+        self.assertEqual(self.post({**self.order(), 'customer': 0}).status_code, 400)
+        response = self.post({'customer': self.customer.pk, 'lines': [{'product': 0, 'quantity': 1}]})
+        self.assertEqual((response.status_code, response.json()['products']), (400, [0]))
+
+    def test_conflicts(self):
+        response = self.post(self.order(quantity=6))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['lines'], [{'product': self.hammer.pk, 'requested': 6, 'available': 5}])
+
+        response = self.post(self.order(unit_price='60.00'))
+        self.assertEqual((response.status_code, response.json()['error']), (409, 'Credit limit exceeded'))
+
+        Product.objects.filter(pk=self.hammer.pk).update(is_active=False)
+        response = self.post(self.order())
+        self.assertEqual((response.status_code, response.json()['products']), (409, [self.hammer.pk]))
+        self.assertFalse(SalesOrder.objects.exists())
+
+    def test_order_created(self):
+        response = self.post(self.order(quantity=3))
+        self.assertEqual(response.status_code, 201)
+        order = SalesOrder.objects.get(pk=response.json()['id'])
+        self.assertEqual(response.json(), {
+            'id': order.pk, 'order_number': order.order_number, 'status': 'draft', 'total_amount': '30.00',
+        })
+        self.assertEqual(order.created_by, self.user)
+        self.hammer.refresh_from_db()
+        self.assertEqual((self.hammer.current_stock, self.hammer.reserved_stock), (5, 3))
+
+    def test_busy_when_every_slot_is_taken(self):
+        slots = views.PENDING_SLOTS
+        views.PENDING_SLOTS = threading.BoundedSemaphore(1)
+        try:
+            views.PENDING_SLOTS.acquire()
+            response = self.post(self.order())
+            self.assertEqual((response.status_code, response['Retry-After']), (503, '1'))
+            views.PENDING_SLOTS.release()
+            self.assertEqual(self.post(self.order()).status_code, 201)
+        finally:
+            views.PENDING_SLOTS = slots
+
+
+class CustomerSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        Customer.objects.create(name='Müller Bau GmbH', contact_person='Anna Schmidt', email='anna@mueller-bau.example')
+        Customer.objects.create(name='Schmidt & Sons', email='office@schmidt.example', phone='+49 30 1234')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_typeahead_ranks_name_before_contact(self):
+        response = self.client.get('/api/v1/customers/search/', {'q': 'schmi'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Schmidt & Sons', 'Müller Bau GmbH'])
+
+    def test_typeahead_ignores_accents_and_checks_limit(self):
+        response = self.client.get('/api/v1/customers/search/', {'q': 'muller', 'limit': 5})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Müller Bau GmbH'])
+        self.assertEqual(self.client.get('/api/v1/customers/search/', {'q': 'x', 'limit': 'all'}).status_code, 400)
+
+    def test_admin_search_uses_index(self):
+        response = self.client.get(reverse('admin:sales_customer_changelist'), {'q': '1234'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([customer.name for customer in response.context['cl'].result_list], ['Schmidt & Sons'])
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'sales'
+
+urlpatterns = [
+    path('orders/', views.create_order, name='create_order'),
+]
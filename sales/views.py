@@ -1,3 +1,192 @@
-from django.shortcuts import render
+"""
+Async order intake (served by the ASGI application)
 
-# Create your views here.
+Validation, credit and stock (available to promise) checks run on the
+event loop with the async ORM. The write itself is handed to a small, bounded thread pool; when the
+pool's queue is full the endpoint answers 503 straight away instead of
+piling up requests.
+"""
+
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from inventory.models import Product
+from inventory.reservations import ReservationFailed
+from .models import Customer
+from .services import place_order
+
+ORDER_WRITE_POOL = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ORDER_INTAKE_WORKERS', 4),
+    thread_name_prefix='order-intake',
+)
+
+# Orders waiting for the pool, counted across every event loop and thread of the process
+PENDING_SLOTS = threading.BoundedSemaphore(getattr(settings, 'ORDER_INTAKE_MAX_PENDING', 64))
+
+
+def _place_order_in_worker(*args):
+    # Pool threads live outside the request cycle, so they look after their own connection
+    close_old_connections()
+    try:
+        return place_order(*args)
+    finally:
+        close_old_connections()
+
+
+class PayloadError(ValueError):
+    pass
+
+
+def _is_whole_number(value):
+    # JSON true/false arrive as bool, which is a subclass of int
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_payload(body):
+    """Validate the JSON body: {"customer": id, "lines": [{"product": id, "quantity": n, "unit_price": "1.00"?}], "notes": ""}"""
+    try:
+        data = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise PayloadError("Body must be valid JSON")
+    if not isinstance(data, dict):
+        raise PayloadError("Body must be a JSON object")
+
+    customer_id = data.get('customer')
+    if not _is_whole_number(customer_id):
+        raise PayloadError("'customer' must be a customer id")
+
+    raw_lines = data.get('lines')
+    if not isinstance(raw_lines, list) or not raw_lines:
+        raise PayloadError("'lines' must be a non-empty list")
+
+    lines = []
+    for index, line in enumerate(raw_lines, start=1):
+        if not isinstance(line, dict):
+            raise PayloadError(f"Line {index} must be an object")
+        product_id = line.get('product')
+        quantity = line.get('quantity')
+        if not _is_whole_number(product_id):
+            raise PayloadError(f"Line {index}: 'product' must be a product id")
+        if not _is_whole_number(quantity) or quantity < 1:
+            raise PayloadError(f"Line {index}: 'quantity' must be a whole number of at least 1")
+
+        unit_price = line.get('unit_price')
+        if unit_price is not None:
+            try:
+                unit_price = Decimal(str(unit_price))
+            except InvalidOperation:
+                raise PayloadError(f"Line {index}: 'unit_price' is not a number")
+            if not unit_price.is_finite():
+                raise PayloadError(f"Line {index}: 'unit_price' is not a number") # NaN, Infinity
+            if unit_price < Decimal('0.01'):
+                raise PayloadError(f"Line {index}: 'unit_price' must be at least 0.01")
+
+        lines.append({'product': product_id, 'quantity': quantity, 'unit_price': unit_price})
+
+    notes = data.get('notes', '')
+    if not isinstance(notes, str):
+        raise PayloadError("'notes' must be text")
+
+    return customer_id, lines, notes
+
+
+async def _authenticate(request):
+    """Integrations authenticate with a JWT (Authorization: Bearer ...)"""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    if result is None:
+        return None
+    user, token = result
+    return user if user.is_active and user.is_staff else None
+
+
+@csrf_exempt # Token auth only, no cookies involved
+@require_POST
+async def create_order(request):
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    try:
+        customer_id, lines, notes = _parse_payload(request.body)
+    except PayloadError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    customer = await Customer.objects.filter(pk=customer_id).afirst()
+    if customer is None:
+        return JsonResponse({'error': f'Customer {customer_id} not found'}, status=400)
+
+    # One query for every product in the order
+    wanted = {}
+    for line in lines:
+        wanted[line['product']] = wanted.get(line['product'], 0) + line['quantity']
+    products = {
+        product_id: (available, price, active)
+        async for product_id, available, price, active in Product.objects.filter(pk__in=list(wanted)).annotate(
+            available=F('current_stock') - F('reserved_stock'),
+        ).values_list('id', 'available', 'selling_price', 'is_active')
+    }
+
+    missing = sorted(set(wanted) - set(products))
+    if missing:
+        return JsonResponse({'error': 'Unknown products', 'products': missing}, status=400)
+
+    inactive = sorted(product_id for product_id, (stock, price, active) in products.items() if not active)
+    if inactive:
+        return JsonResponse({'error': 'Products are not active', 'products': inactive}, status=409)
+
+    short = [
+        {'product': product_id, 'requested': quantity, 'available': products[product_id][0]}
+        for product_id, quantity in wanted.items()
+        if products[product_id][0] < quantity
+    ]
+    if short:
+        return JsonResponse({'error': 'Not enough stock', 'lines': short}, status=409)
+
+    total = sum(
+        (line['unit_price'] if line['unit_price'] is not None else products[line['product']][1]) * line['quantity']
+        for line in lines
+    )
+    if not customer.can_purchase(total):
+        return JsonResponse({'error': 'Credit limit exceeded', 'available_credit': str(customer.available_credit())}, status=409)
+
+    if not PENDING_SLOTS.acquire(blocking=False):
+        return JsonResponse({'error': 'Too many orders in progress, retry shortly'}, status=503, headers={'Retry-After': '1'})
+
+    loop = asyncio.get_running_loop()
+    try:
+        order = await loop.run_in_executor(ORDER_WRITE_POOL, _place_order_in_worker, customer_id, lines, notes, user.pk)
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages}, status=400)
+    except ReservationFailed as error:
+        # Stock was taken by another order between the check and the write
+        short = [
+            {'product': product_id, 'requested': requested, 'available': available}
+            for product_id, requested, available in error.failed
+        ]
+        return JsonResponse({'error': 'Not enough stock', 'lines': short}, status=409)
+    finally:
+        PENDING_SLOTS.release()
+
+    return JsonResponse({
+        'id': order.pk,
+        'order_number': order.order_number,
+        'status': order.status,
+        'total_amount': f'{order.total_amount:.2f}',
+    }, status=201)